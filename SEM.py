@@ -1,607 +1,1495 @@
-import os
-
-try:
-    from autoscript_sdb_microscope_client import SdbMicroscopeClient
-    from autoscript_sdb_microscope_client.structures import (AdornedImage,
-                                                             GrabFrameSettings,
-                                                             Rectangle,
-                                                             RunAutoCbSettings,
-                                                             Point,
-                                                             MoveSettings,
-                                                             StagePosition)
-    from autoscript_sdb_microscope_client.enumerations import (CoordinateSystem,
-                                                               ScanningResolution)
-
-    resolutions = {'1024x884'  : ScanningResolution.PRESET_1024X884,
-                   '1536x1024' : ScanningResolution.PRESET_1536X1024,
-                   '2048x1768' : ScanningResolution.PRESET_2048X1768,
-                   '3072x2048' : ScanningResolution.PRESET_3072X2048,
-                   '4096x3536' : ScanningResolution.PRESET_4096X3536,
-                   '512x442'   : ScanningResolution.PRESET_512X442,
-                   '6144x4096' : ScanningResolution.PRESET_6144X4096,
-                   '768x512'   : ScanningResolution.PRESET_768X512}
-
-except:
-    print('Autoscript module not found')
-
-import numpy as np
-import utils
-
-from importlib import reload  # Python 3.4+
-reload(utils)
-
-from utils import BeamType
-from utils import MicroscopeState
-from utils import ImageSettings
-
-class Microscope():
-    def __init__(self, settings: dict = None, log_path: str = None,
-                 ip_address: str = "192.168.0.1", demo: bool=True):
-        self.settings = settings
-        self.demo = demo
-        self.ip_address = ip_address
-        self.log_path = log_path
-        self.microscope_state = MicroscopeState()
-
-        try:
-            print('initialising microscope')
-            self.microscope = SdbMicroscopeClient()
-        except:
-            print('Autoscript not installed on the computer, using demo mode')
-            self.demo = True
-            self.microscope = ['no Autoscript found']
-
-
-    def establish_connection(self):
-        """Connect to the SEM microscope."""
-        try:
-            # TODO: get the port
-            print('connecting to microscope...')
-            #logging.info(f"Microscope client connecting to [{ip_address}]")
-            self.microscope = SdbMicroscopeClient()
-            self.microscope.connect(self.ip_address)
-            self.microscope.specimen.stage.set_default_coordinate_system(CoordinateSystem.SPECIMEN)
-            #logging.info(f"Microscope client connected to [{ip_address}]")
-        except Exception as e:
-            print(f"AutoLiftout is unavailable. Unable to connect to microscope: {e}")
-            self.microscope = ['could not connect to microscope']
-
-        return self.microscope
-
-
-    def autocontrast(self, quadrant: int = 1) -> None:
-        """Automatically adjust the microscope image contrast."""
-        if not self.demo:
-            self.microscope.imaging.set_active_view(quadrant)
-            settings = RunAutoCbSettings(
-                            method="MaxContrast",
-                            resolution="768x512",  # low resolution, so as not to damage the sample
-                            number_of_frames=5)
-            #logging.info("automatically adjusting contrast...")
-            self.microscope.auto_functions.run_auto_cb(settings)
-        else:
-            print('demo: automatically adjusting contrast...')
-
-
-    def set_beam_point(self,
-                       beam_x : int = 0,
-                       beam_y : int = 0):
-        """
-        API requires:
-        x : float,  X coordinate of the spot. The valid range of the coordinate is [0, 1].
-        y : float,  Y coordinate of the spot. The valid range of the coordinate is [0, 1].
-        ----------
-        Parameters
-        ----------
-        beam_x : int coordinate in pixels
-        beam_y : int coordinate in pixels
-        convert to
-        x, y = beam_x / pixels_in_x, beam_y / pixels_in_y
-
-        Returns None
-        -------
-        """
-        if not self.demo:
-            """ current screen resolution """
-            resolution = self.microscope.beams.electron_beam.scanning.resolution.value
-            [width, height] = np.array(resolution.split("x")).astype(int)
-            if beam_x > width  : beam_x = width
-            if beam_y > height : beam_y = height
-            x = float(beam_x) / float(width)
-            y = float(beam_y) / float(height)
-            self.microscope.beams.electron_beam.scanning.mode.set_spot(x, y)
-        else:
-            print(f'demo: setting beam spot coordinates to ({beam_x}, {beam_y})')
-
-
-    def set_full_frame(self):
-        if not self.demo:
-            self.microscope.beams.electron_beam.scanning.mode.set_full_frame()
-        elif self.demo:
-            print('setting scanning mode to full frame...   ')
-
-
-    def beam_blank(self):
-        if not self.demo:
-            _state = self.microscope.beams.electron_beam.is_blanked
-            if _state == True:
-                """ beam state is blanked, unblank it """
-                self.microscope.beams.electron_beam.unblank()
-            elif _state == False:
-                """beam state is not blanked, blank it"""
-                self.microscope.beams.electron_beam.blank()
-            return self.microscope.beams.electron_beam.is_blanked
-
-        elif self.demo:
-            print('demo mode: beam blank/unblank function called...   ')
-            return 'demo blank'
-
-
-    def blank(self):
-        if not self.demo:
-            self.microscope.beams.electron_beam.blank()
-            return self.microscope.beams.electron_beam.is_blanked
-
-        elif self.demo:
-            print('demo mode: beam blank...   ')
-            return 'demo blank'
-
-    def unblank(self):
-        if not self.demo:
-            self.microscope.beams.electron_beam.unblank()
-            return self.microscope.beams.electron_beam.is_blanked
-
-        elif self.demo:
-            print('demo mode: beam unblank...   ')
-            return 'demo blank'
-
-
-    def acquire_image(self, all_settings: dict,
-                      hfw = None):
-        """Take new electron or ion beam image.
-        Returns
-        -------
-        AdornedImage
-            If the returned AdornedImage is named 'image', then:
-            image.data = a numpy array of the image pixels
-            image.metadata.binary_result.pixel_size.x = image pixel size in x
-            image.metadata.binary_result.pixel_size.y = image pixel size in y
-            dwell_time in microseconds! x1e-6 coversion to seconds
-        """
-        print('acquiring image...')
-        # logging.info(f"acquiring new {beam_type.name} image.")
-
-        if not self.demo:
-            if all_settings is not None:
-                settings = self.update_image_settings(all_settings)
-
-                self.microscope.imaging.set_active_view(settings.quadrant)
-
-                if hfw is not None:
-                    hfw = hfw
-                else:
-                    hfw = settings.horizontal_field_width
-
-                if hfw > self.microscope.beams.electron_beam.horizontal_field_width.limits.max:
-                    hfw = self.microscope.beams.electron_beam.horizontal_field_width.limits.max
-                self.microscope.beams.electron_beam.horizontal_field_width.value = hfw
-
-                if settings.autocontrast==True:
-                    self.autocontrast(quadrant=settings.quadrant)
-
-                if settings.frame_integration <= 0:
-                    settings.frame_integration = 1
-
-                grab_frame_settings = GrabFrameSettings(resolution=resolutions[settings.resolution],
-                                                        dwell_time=settings.dwell_time,
-                                                        bit_depth=settings.bit_depth,
-                                                        drift_correctiion=settings.drift_correction,
-                                                        frame_integration=settings.frame_integration)
-                image = self.microscope.imaging.grab_frame(grab_frame_settings)
-            else:
-                image = self.microscope.imaging.grab_frame()
-
-
-            return image
-
-        else:
-            print('demo mode   ')
-            if all_settings is not None:
-                settings = self.update_image_settings(all_settings)
-                print('settings = ', settings)
-                resolution = settings.resolution
-                [width, height] = np.array(resolution.split("x")).astype(int)
-            else:
-                height, width = 768, 512
-            simulated_image = np.random.randint(0, 255, [height,width])
-            return simulated_image
-
-    def acquire_multiple_frames(self, all_settings: dict,
-                                hfw = None):
-        """Take new electron image from several quadrants.
-        Returns
-        -------
-        array of AdornedImages
-        """
-        print('acquiring images...')
-
-        if not self.demo:
-            settings = self.update_image_settings(all_settings)
-
-            if hfw is not None:
-                hfw = hfw
-            else:
-                hfw = settings.horizontal_field_width
-
-            if hfw > self.microscope.beams.electron_beam.horizontal_field_width.limits.max:
-                hfw = self.microscope.beams.electron_beam.horizontal_field_width.limits.max
-
-            self.microscope.beams.electron_beam.horizontal_field_width.value = hfw
-
-            if settings.autocontrast == True:
-                self.autocontrast(quadrant=1)
-                self.autocontrast(quadrant=2)
-
-            if settings.frame_integration <= 0:
-                settings.frame_integration = 1
-
-            grab_frame_settings = GrabFrameSettings(resolution=resolutions[settings.resolution],
-                                                    dwell_time=settings.dwell_time,
-                                                    bit_depth=settings.bit_depth,
-                                                    frame_integration=settings.frame_integration)
-            images = self.microscope.imaging.grab_multiple_frames(grab_frame_settings)
-
-            return images
-
-        else:
-            print('demo mode multiple frames  ')
-            if all_settings is not None:
-                settings = self.update_image_settings(all_settings)
-                print('settings = ', settings)
-                resolution = settings.resolution
-                [width, height] = np.array(resolution.split("x")).astype(int)
-            else:
-                height, width = 768, 512
-            simulated_image = np.random.randint(0, 255, [height, width])
-            return [simulated_image, simulated_image]
-
-
-
-    def last_image(self,  quadrant : int, save : bool = False):
-        """Get the last previously acquired ion or electron beam image.
-        Parameters
-        ----------
-        microscope : Autoscript microscope object.
-        beam_type :
-
-        Returns
-        -------
-        AdornedImage
-            If the returned AdornedImage is named 'image', then:
-            image.data = a numpy array of the image pixels
-            image.metadata.binary_result.pixel_size.x = image pixel size in x
-            image.metadata.binary_result.pixel_size.y = image pixel size in y
-        """
-        if not self.demo:
-            self.microscope.imaging.set_active_view(quadrant)
-            image = self.microscope.imaging.get_image()
-            return image
-
-        else:
-            simulated_image = np.random.randint(0, 255, [512,768])
-            print(simulated_image.shape)
-            return simulated_image
-
-
-    def update_stage_position(self):
-        try:
-            position = \
-                self.microscope.specimen.stage.current_position
-            MicroscopeState.update_stage_position(self.microscope_state,
-                                                  x=position.x, y=position.y, z=position.z,
-                                                  t=position.t, r=position.r)
-            return (position.x, position.y, position.z,
-                    position.t, position.r)
-
-        except Exception as e:
-            print(f'stage position, error {e}, simulated coordinates are:')
-            #[x, y, z, t, r] = np.random.randint( 0,5, [5,1] ).astype(float)
-            [x, y, z, t, r] = np.random.rand(5, 1)
-            MicroscopeState.update_stage_position(self.microscope_state,
-                                                  x=x[0]*1e-3, y=y[0]*1e-3, z=z[0]*1e-3,
-                                                  t=t[0], r=r[0])
-            print(MicroscopeState.get_stage_position(self.microscope_state))
-            return (x[0]*1e-3, y[0]*1e-3, z[0]*1e-3, t[0], r[0])
-
-
-
-    def set_scan_rotation(self, rotation_angle : float = 0, type="Absolute") -> float:
-        """Set scan rotation angle
-        Args:
-            rotation_angle (float): angle of scan rotation in degrees,
-            needs conversion to rad
-        Returns
-        -------
-        float: system-level scan rotation angle in degrees
-        """
-        try:
-            rot_min = self.microscope.beams.electron_beam.scanning.rotation.limits.min
-            rot_max = self.microscope.beams.electron_beam.scanning.rotation.limits.max
-
-            if type=="Relative":
-                """
-                    Change the current scan rotation by the specified value
-                    Check that targety scan_rot does not exceed (-2pi, +2pi)
-                    Otherwise divide module to stay within the (-2pi, +2pi) range
-                """
-                current_scan_rot = \
-                    self.microscope.beams.electron_beam.scanning.rotation.value
-
-                target_rot_angle = current_scan_rot + rotation_angle
-
-                if target_rot_angle >=rot_max:
-                    target_rot_angle = target_rot_angle % (2*np.pi)
-                elif target_rot_angle <=rot_min:
-                    target_rot_angle = target_rot_angle % (2*np.pi)
-
-                print(f"setting scan rotation {type} to {np.rad2deg(target_rot_angle)}")
-                # TODO backend from from frontend separation
-                self.microscope.beams.electron_beam.scanning.rotation.value = target_rot_angle
-
-            elif type=="Absolute":
-                """Absolute value of the scan rotation"""
-                if rotation_angle >=rot_max:
-                    rotation_angle = rotation_angle % (2*np.pi)
-                elif rotation_angle <=rot_min:
-                    rotation_angle = rotation_angle % (2*np.pi)
-
-                print(f"setting scan rotation {type} to {np.rad2deg(rotation_angle)}")
-                # TODO backend from from frontend separation
-                self.microscope.beams.electron_beam.scanning.rotation.value = rotation_angle
-
-            self._get_current_microscope_state()
-            return self.microscope.beams.electron_beam.scanning.rotation.value
-
-        except Exception as e:
-            print(f'Failed to set scan rotation {type} by {np.rad2deg(rotation_angle)} deg, error {e}')
-            return rotation_angle
-
-
-    def set_beam_shift(self,
-                       beam_shift_x : float = 0.0,
-                       beam_shift_y : float = 0.0) -> None:
-        """Adjusting the beam shift
-        Args:
-            beam_shift_x: in metres, shift along x-axis
-            beam_shift_y: in metres, shift along y-axis
-        Returns
-        -------
-        None. Update the microscope state with the new beam shift values
-        """
-        # adjust beamshift
-        try:
-            self.microscope.beams.electron_beam.beam_shift.value = Point(beam_shift_x, beam_shift_y)
-            self._get_current_microscope_state()
-        except Exception as e:
-            print(f"Could not apply beam shift, error {e}")
-
-
-    def reset_beam_shifts(self):
-        """Set the beam shift to zero for the electron beam
-        Args:
-            None
-        """
-        # logging.info(
-        #     f"reseting ebeam shift to (0, 0) from: {microscope.beams.electron_beam.beam_shift.value} "
-        # )
-        try:
-            print(f"reseting e-beam shift to (0, 0) from: {self.microscope.beams.electron_beam.beam_shift.value}")
-            self.microscope.beams.electron_beam.beam_shift.value = Point(0, 0)
-            print(f"reset beam shifts to zero complete")
-        except Exception as e:
-            print(f"Could not reset the beam shift, error {e}")
-        self._get_current_microscope_state()
-        # logging.info(f"reset beam shifts to zero complete")
-
-
-    def _get_current_microscope_state(self) -> MicroscopeState:
-        """Acquires the current microscope state to store
-         if necessary it is possible to return to this stored state later
-         Returns the state in MicroscopeState dataclass variable
-        Args:
-            None
-        Returns
-        -------
-        MicroscopeState
-        """
-        try:
-            (x,y,z,t,r) = self.update_stage_position()
-            self.microscope_state.x = x
-            self.microscope_state.y = y
-            self.microscope_state.z = z
-            self.microscope_state.t = t
-            self.microscope_state.r = r
-            self.microscope_state.working_distance = \
-                self.microscope.beams.electron_beam.working_distance.value
-
-            self.microscope_state.horizontal_field_width = \
-                self.microscope.beams.electron_beam.horizontal_field_width.value
-            self.microscope_state.resolution = self.microscope.beams.electron_beam.scanning.resolution.value
-
-            self.microscope_state.hv = self.microscope.beams.electron_beam.high_voltage.value
-            self.microscope_state.beam_current = self.microscope.beams.electron_beam.beam_current.value
-
-            self.microscope_state.scan_rotation_angle = \
-                self.microscope.beams.electron_beam.scanning.rotation.value
-            self.microscope_state.brightness = self.microscope.detector.brightness.value
-            self.microscope_state.contrast = self.microscope.detector.contrast.value
-
-            beam_shift = self.microscope.beams.electron_beam.beam_shift.value # returns Point()
-            self.microscope_state.beam_shift_x = beam_shift.x
-            self.microscope_state.beam_shift_y = beam_shift.y
-
-        except Exception as e:
-            print(f"Could not get the microscope state, error {e}")
-            self.microscope_state.x = 2
-            self.microscope_state.y = 1
-            self.microscope_state.z = 0
-            self.microscope_state.t = 0
-            self.microscope_state.r = 0
-            self.microscope_state.scan_rotation_angle = 0
-
-        return self.microscope_state
-
-
-    def _restore_microscope_state(self, state : MicroscopeState) -> None:
-        """Restores the microscope state from the stored MicroscopeState variable
-        Args:
-            state : MicroscopeState
-            TODO basic restore (state position, imaging conditions),
-            full restore (volage, beam current etc)
-        Returns
-        -------
-        None
-        """
-        try:
-            """move function take x,y,z in micrometres and r,t in degrees
-            the stored values are straight from the microscope in metres and rad
-            """
-            # self.move_stage(x=state.x, y=state.y, z=state.z,
-            #                 t=state.t, r=state.r,
-            #                 move_type='Absolute')
-            self.microscope.beams.electron_beam.horizontal_field_width.value = \
-                state.horizontal_field_width
-            self.microscope.beams.electron_beam.scanning.resolution = state.resolution
-            self.microscope.beams.electron_beam.scanning.rotation.value =\
-                state.scan_rotation_angle
-            self.microscope.detector.brightness.value = state.brighness
-            self.microscope.detector.contrast.value = state.contrast
-            self.microscope.beams.electron_beam.beam_shift.value = Point(state.beam_shift_x,
-                                                                         state.beam_shift_y)
-        except:
-            print('Could not restore the microscope state')
-
-
-    def update_image_settings(self,
-                              all_settings: dict,
-                              resolution=None,
-                              dwell_time=None,
-                              horizontal_field_width=None,
-                              autocontrast=None,
-                              beam_type=None,
-                              quadrant=None,
-                              sample_name=None,
-                              path=None,
-                              bit_depth=None,
-                              drift_correction=None,
-                              frame_integration=None,
-                              q1=None,
-                              q2=None
-                              ):
-        """Update image settings. Uses default values if not supplied
-        Args:
-            settings (dict): the settings dictionary from GUI
-            resolution (str, optional): image resolution. Defaults to None.
-            dwell_time (float, optional): image dwell time. Defaults to None.
-            hfw (float, optional): image horizontal field width. Defaults to None.
-            autocontrast (bool, optional): use autocontrast. Defaults to None.
-            beam_type (BeamType, optional): beam type to image with (Electron, Ion). Defaults to None.
-            gamma (GammaSettings, optional): gamma correction settings. Defaults to None.
-            save (bool, optional): save the image. Defaults to None.
-            label (str, optional): image filename . Defaults to None.
-            save_path (Path, optional): directory to save image. Defaults to None.
-        """
-
-        # new image_settings
-        if resolution:
-            self.resolution = resolution
-        else:
-            self.resolution = all_settings["imaging"]["resolution"]
-
-        if dwell_time:
-            self.dwell_time = dwell_time
-        else:
-            self.dwell_time = all_settings["imaging"]["dwell_time"]
-
-        if horizontal_field_width:
-            self.horizontal_field_width = horizontal_field_width
-        else:
-            self.horizontal_field_width = all_settings["imaging"]["horizontal_field_width"]
-
-        if autocontrast:
-            self.__autocontrast = autocontrast
-        else:
-            self.__autocontrast = all_settings["imaging"]["autocontrast"]
-
-        if beam_type:
-            self.beam_type = beam_type
-        else:
-            self.beam_type = all_settings["imaging"]["beam_type"]
-
-        if quadrant:
-            self.quadrant = quadrant
-        else:
-            self.quadrant = all_settings["imaging"]["quadrant"]
-
-        if path:
-            self.path = path
-        else:
-            self.path = all_settings["imaging"]["path"]
-
-        if bit_depth:
-            self.bit_depth = bit_depth
-        else:
-            self.bit_depth = all_settings["imaging"]["bit_depth"]
-
-        if sample_name:
-            self.sample_name = sample_name
-        else:
-            self.sample_name = all_settings["imaging"]["sample_name"]
-
-        if drift_correction:
-            self.drift_correction = drift_correction
-        else:
-            self.drift_correction = all_settings["imaging"]["drift_correction"]
-
-        if frame_integration:
-            self.frame_integration = frame_integration
-        else:
-            self.frame_integration = all_settings["imaging"]["frame_integration"]
-
-        if frame_integration:
-            self.frame_integration = frame_integration
-        else:
-            self.frame_integration = all_settings["imaging"]["frame_integration"]
-
-        self.image_settings = ImageSettings(
-            resolution=self.resolution,
-            dwell_time=self.dwell_time,
-            horizontal_field_width=self.horizontal_field_width,
-            quadrant=self.quadrant,
-            autocontrast=self.__autocontrast,
-            beam_type=BeamType.ELECTRON if beam_type is None else beam_type,
-            path=self.path,
-            sample_name=self.sample_name,
-            bit_depth=self.bit_depth,
-            drift_correction=self.drift_correction,
-            frame_integration=self.frame_integration
-        )
-
-        return self.image_settings
-
-
-    def disconnect(self):
-        try:
-            self.microscope.disconnect()
-        except:
-            pass # probably demo mode, no microscope connected, continue shutting down
-
-
-
-
-
-if __name__ == '__main__':
-    pass
-
-
-
+import os
+import time
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+
+"""scanning resolution presets, WIDTHxHEIGHT, also known without the SDK (demo mode)"""
+resolution_names = ('1024x884', '1536x1024', '2048x1768', '3072x2048',
+                    '4096x3536', '512x442', '6144x4096', '768x512')
+
+try:
+    from autoscript_sdb_microscope_client import SdbMicroscopeClient
+    from autoscript_sdb_microscope_client.structures import (AdornedImage,
+                                                             GrabFrameSettings,
+                                                             Rectangle,
+                                                             RunAutoCbSettings,
+                                                             Point,
+                                                             MoveSettings,
+                                                             StagePosition)
+    from autoscript_sdb_microscope_client.enumerations import (CoordinateSystem,
+                                                               ScanningResolution)
+
+    resolutions = {name : getattr(ScanningResolution, 'PRESET_' + name.upper())
+                   for name in resolution_names}
+
+except:
+    print('Autoscript module not found')
+
+import numpy as np
+import cv2
+import utils
+import mosaic
+import connection
+
+from importlib import reload  # Python 3.4+
+reload(utils)
+
+from utils import BeamType
+from utils import MicroscopeState
+from utils import ImageSettings
+
+class Microscope():
+    def __init__(self, settings: dict = None, log_path: str = None,
+                 ip_address: str = "192.168.0.1", demo: bool=True):
+        self.settings = settings
+        self.demo = demo
+        self.ip_address = ip_address
+        self.log_path = log_path
+        self.microscope_state = MicroscopeState()
+        self.drift_tracker = utils.DriftTracker()
+        self.beam_shift_calibration = utils.BeamShiftCalibration()
+        self.autocontrast_cache = utils.AutocontrastCache()
+        self.buffer_pool = utils.buffer_pool
+        """demo mode: in-focus working distance of the simulated specimen"""
+        self._demo_focus = 4.0e-3
+        self._demo_specimen = None
+        self._demo_mosaic_specimen = None
+        self.connection = connection.ConnectionManager(connect=self._connect,
+                                                       health_check=self._health_check)
+
+        try:
+            print('initialising microscope')
+            self.microscope = SdbMicroscopeClient()
+        except:
+            print('Autoscript not installed on the computer, using demo mode')
+            self.demo = True
+            self.microscope = ['no Autoscript found']
+
+
+    def establish_connection(self):
+        """Connect to the SEM microscope, retried with exponential backoff.
+        Later calls going through self._call reconnect on their own."""
+        try:
+            print('connecting to microscope...')
+            self._connect()
+        except Exception as e:
+            if self.demo or not self.connection.reconnect():
+                print(f"AutoLiftout is unavailable. Unable to connect to microscope: {e}")
+                if self.demo:
+                    self.microscope = ['could not connect to microscope']
+
+        return self.microscope
+
+
+    def _connect(self):
+        """(Re)create the client and connect, raises on failure"""
+        # TODO: get the port
+        #logging.info(f"Microscope client connecting to [{ip_address}]")
+        self.microscope = SdbMicroscopeClient()
+        self.microscope.connect(self.ip_address)
+        self.microscope.specimen.stage.set_default_coordinate_system(CoordinateSystem.SPECIMEN)
+        #logging.info(f"Microscope client connected to [{ip_address}]")
+
+
+    def _health_check(self) -> bool:
+        """Cheap read answered by a working connection"""
+        return self.microscope.beams.electron_beam.high_voltage.value is not None
+
+
+    def _call(self, func, idempotent : bool = True):
+        """Run func() (a callable looking up self.microscope when it runs) through the
+        connection manager: transient failures reconnect, idempotent calls are re-issued.
+        In demo mode func is called directly."""
+        if self.demo:
+            return func()
+        return self.connection.call(func, idempotent=idempotent)
+
+
+    def connection_stats(self) -> dict:
+        return self.connection.get_stats()
+
+
+    def autocontrast(self, quadrant: int = 1, hfw : float = None, force : bool = False) -> bool:
+        """Automatically adjust the microscope image contrast.
+        The brightness and contrast found by auto-CB are cached per imaging conditions
+        (self.autocontrast_cache), under the same conditions the cached values are applied
+        instead of running the routine again, unless force is set.
+        Returns
+        -------
+        bool: True if the auto-CB routine ran, False if the cached values were applied
+        """
+        key = self._autocontrast_key(quadrant, hfw)
+        cached = None if force else self.autocontrast_cache.get(key)
+        if cached is not None:
+            self._set_detector_levels(quadrant, *cached)
+            return False
+
+        if not self.demo:
+            self._call(lambda: self.microscope.imaging.set_active_view(quadrant))
+            settings = RunAutoCbSettings(
+                            method="MaxContrast",
+                            resolution="768x512",  # low resolution, so as not to damage the sample
+                            number_of_frames=5)
+            #logging.info("automatically adjusting contrast...")
+            """auto-CB is not re-run by itself after a reconnect, it scans the sample"""
+            self._call(lambda: self.microscope.auto_functions.run_auto_cb(settings),
+                       idempotent=False)
+        else:
+            print('demo: automatically adjusting contrast...')
+        self.autocontrast_cache.store(key, *self._get_detector_levels(quadrant))
+        return True
+
+
+    def _autocontrast_key(self, quadrant : int, hfw : float = None) -> tuple:
+        """Imaging conditions of the autocontrast cache, read from the microscope"""
+        state = self.microscope_state
+        detector, hv, beam_current = state.detector, state.hv, state.beam_current
+        if hfw is None:
+            hfw = state.horizontal_field_width
+        if not self.demo:
+            def _read():
+                self.microscope.imaging.set_active_view(quadrant)
+                electron_beam = self.microscope.beams.electron_beam
+                return (self.microscope.detector.type.value,
+                        electron_beam.high_voltage.value,
+                        electron_beam.beam_current.value,
+                        electron_beam.horizontal_field_width.value if hfw is None else hfw)
+            try:
+                detector, hv, beam_current, hfw = self._call(_read)
+            except Exception as e:
+                print(f'Could not read the imaging conditions, error {e}')
+        return self.autocontrast_cache.key(detector, quadrant, hv, beam_current, hfw)
+
+
+    def _get_detector_levels(self, quadrant : int) -> tuple:
+        if not self.demo:
+            def _read():
+                self.microscope.imaging.set_active_view(quadrant)
+                return (self.microscope.detector.brightness.value,
+                        self.microscope.detector.contrast.value)
+            try:
+                return self._call(_read)
+            except Exception as e:
+                print(f'Could not read the detector brightness and contrast, error {e}')
+        return self.microscope_state.brightness, self.microscope_state.contrast
+
+
+    def _set_detector_levels(self, quadrant : int, brightness : float, contrast : float) -> None:
+        if not self.demo:
+            def _set():
+                self.microscope.imaging.set_active_view(quadrant)
+                self.microscope.detector.brightness.value = brightness
+                self.microscope.detector.contrast.value = contrast
+            try:
+                self._call(_set)
+            except Exception as e:
+                print(f'Could not set the detector brightness and contrast, error {e}')
+        self.microscope_state.brightness = brightness
+        self.microscope_state.contrast = contrast
+
+
+    def _check_autocontrast(self, image, quadrant : int, hfw : float = None) -> bool:
+        """True if the frame shows that the cached brightness and contrast no longer fit,
+        the cache entry is dropped and the next autocontrast runs auto-CB"""
+        key = self._autocontrast_key(quadrant, hfw)
+        if self.autocontrast_cache.check(key, image):
+            print(f'autocontrast: intensities drifted at quadrant {quadrant}, re-running auto-CB')
+            return True
+        return False
+
+
+    def set_beam_point(self,
+                       beam_x : int = 0,
+                       beam_y : int = 0):
+        """
+        API requires:
+        x : float,  X coordinate of the spot. The valid range of the coordinate is [0, 1].
+        y : float,  Y coordinate of the spot. The valid range of the coordinate is [0, 1].
+        ----------
+        Parameters
+        ----------
+        beam_x : int coordinate in pixels
+        beam_y : int coordinate in pixels
+        convert to
+        x, y = beam_x / pixels_in_x, beam_y / pixels_in_y
+
+        Returns None
+        -------
+        """
+        if not self.demo:
+            """ current screen resolution """
+            resolution = self._call(lambda: self.microscope.beams.electron_beam.scanning.resolution.value)
+            [width, height] = np.array(resolution.split("x")).astype(int)
+            if beam_x > width  : beam_x = width
+            if beam_y > height : beam_y = height
+            x = float(beam_x) / float(width)
+            y = float(beam_y) / float(height)
+            self._call(lambda: self.microscope.beams.electron_beam.scanning.mode.set_spot(x, y))
+        else:
+            print(f'demo: setting beam spot coordinates to ({beam_x}, {beam_y})')
+
+
+    def set_full_frame(self):
+        if not self.demo:
+            self._call(lambda: self.microscope.beams.electron_beam.scanning.mode.set_full_frame())
+        elif self.demo:
+            print('setting scanning mode to full frame...   ')
+
+
+    def beam_blank(self):
+        if not self.demo:
+            _state = self._call(lambda: self.microscope.beams.electron_beam.is_blanked)
+            if _state == True:
+                """ beam state is blanked, unblank it """
+                self._call(lambda: self.microscope.beams.electron_beam.unblank())
+            elif _state == False:
+                """beam state is not blanked, blank it"""
+                self._call(lambda: self.microscope.beams.electron_beam.blank())
+            return self._call(lambda: self.microscope.beams.electron_beam.is_blanked)
+
+        elif self.demo:
+            print('demo mode: beam blank/unblank function called...   ')
+            return 'demo blank'
+
+
+    def blank(self):
+        if not self.demo:
+            self._call(lambda: self.microscope.beams.electron_beam.blank())
+            return self._call(lambda: self.microscope.beams.electron_beam.is_blanked)
+
+        elif self.demo:
+            print('demo mode: beam blank...   ')
+            return 'demo blank'
+
+    def unblank(self):
+        if not self.demo:
+            self._call(lambda: self.microscope.beams.electron_beam.unblank())
+            return self._call(lambda: self.microscope.beams.electron_beam.is_blanked)
+
+        elif self.demo:
+            print('demo mode: beam unblank...   ')
+            return 'demo blank'
+
+
+    def acquire_image(self, all_settings: dict,
+                      hfw = None):
+        """Take new electron or ion beam image.
+        Returns
+        -------
+        utils.Frame
+            frame.data = a numpy array of the image pixels (the AdornedImage buffer, not copied)
+            frame.metadata = the AdornedImage metadata, None in demo mode
+            frame.pixel_size, frame.horizontal_field_width in metres, frame.dwell_time in seconds
+        """
+        print('acquiring image...')
+        # logging.info(f"acquiring new {beam_type.name} image.")
+
+        if not self.demo:
+            if all_settings is not None:
+                settings = self.update_image_settings(all_settings)
+
+                self._call(lambda: self.microscope.imaging.set_active_view(settings.quadrant))
+
+                if hfw is not None:
+                    hfw = hfw
+                else:
+                    hfw = settings.horizontal_field_width
+
+                hfw = self.set_horizontal_field_width(hfw)
+
+                if settings.autocontrast==True:
+                    autocontrast_ran = self.autocontrast(quadrant=settings.quadrant, hfw=hfw)
+
+                if settings.frame_integration <= 0:
+                    print(f'frame integration {settings.frame_integration} is not valid, using 1')
+                    settings.frame_integration = 1
+
+                grab_frame_settings = GrabFrameSettings(resolution=resolutions[settings.resolution],
+                                                        dwell_time=settings.dwell_time,
+                                                        bit_depth=settings.bit_depth,
+                                                        drift_correction=settings.drift_correction,
+                                                        frame_integration=settings.frame_integration)
+                image = self._call(lambda: self.microscope.imaging.grab_frame(grab_frame_settings))
+                """cached brightness and contrast: one more grab if the frame shows they drifted"""
+                if settings.autocontrast==True and \
+                        self._check_autocontrast(image, quadrant=settings.quadrant, hfw=hfw) and \
+                        not autocontrast_ran:
+                    self.autocontrast(quadrant=settings.quadrant, hfw=hfw, force=True)
+                    image = self._call(lambda: self.microscope.imaging.grab_frame(grab_frame_settings))
+                    self._check_autocontrast(image, quadrant=settings.quadrant, hfw=hfw)
+            else:
+                image = self._call(lambda: self.microscope.imaging.grab_frame())
+
+            return utils.Frame.from_image(image, horizontal_field_width=hfw,
+                                          dwell_time=None if all_settings is None else settings.dwell_time,
+                                          state=dataclasses.replace(self.microscope_state))
+
+        else:
+            print('demo mode   ')
+            if all_settings is not None:
+                settings = self.update_image_settings(all_settings)
+                print('settings = ', settings)
+                resolution = settings.resolution
+                [width, height] = np.array(resolution.split("x")).astype(int)
+            else:
+                height, width = 768, 512
+            return self._demo_frame(height, width, all_settings, hfw)
+
+
+    def _demo_frame(self, height : int, width : int, all_settings : dict = None, hfw : float = None):
+        """utils.Frame of random pixels in an array leased from self.buffer_pool
+        (8 or 16 bit as the settings), HFW and dwell time from the settings"""
+        dwell_time, bit_depth = None, 8
+        if all_settings is not None:
+            imaging = all_settings["imaging"]
+            hfw = hfw if hfw is not None else imaging.get("horizontal_field_width")
+            dwell_time = imaging.get("dwell_time")
+            bit_depth = imaging.get("bit_depth", 8)
+        data = self.buffer_pool.lease((int(height), int(width)),
+                                      np.uint16 if bit_depth == 16 else np.uint8)
+        """the full range of the bit depth, the upper bound of randu is exclusive"""
+        cv2.randu(data, 0, np.iinfo(data.dtype).max + 1)
+        return utils.Frame(data, horizontal_field_width=hfw, dwell_time=dwell_time,
+                           state=dataclasses.replace(self.microscope_state), pool=self.buffer_pool)
+
+    def acquire_averaged_image(self, all_settings: dict,
+                               hfw = None,
+                               n_frames : int = 2,
+                               register : bool = False,
+                               preview = None):
+        """Software frame integration: grab n_frames short-dwell frames and average them
+        in a single streaming accumulator with sigma-clipping of outliers (charging flashes).
+        Frames are not kept in memory, each one is added to the running mean and discarded.
+        Args:
+            all_settings: the settings dictionary from GUI
+            hfw: horizontal field width in metres
+            n_frames: number of frames to average
+            register: align every frame to the first one with phase correlation before adding
+            preview: callable(image : np.ndarray, frame_number : int), called with
+                the running average after every frame
+        Returns
+        -------
+        utils.Frame with the metadata of the last frame
+        Raises ValueError if n_frames is smaller than 1
+        """
+        if int(n_frames) < 1:
+            raise ValueError(f'at least one frame is needed for averaging, got {n_frames}')
+        accumulator = None
+        tracker = utils.DriftTracker() if register else None
+        shifted = None
+        """autocontrast only once, before the first frame"""
+        frame_settings = dict(all_settings, imaging=dict(all_settings["imaging"]))
+
+        for ii in range(int(n_frames)):
+            image = self.acquire_image(all_settings=frame_settings, hfw=hfw)
+            frame_settings["imaging"]["autocontrast"] = False
+            frame = utils.image_data(image)
+
+            if accumulator is None:
+                accumulator = utils.FrameAccumulator(frame.shape)
+                dtype = frame.dtype
+                if register:
+                    tracker.set_reference(frame, hfw=hfw)
+            elif register:
+                shift_x, shift_y = tracker.shift_to_reference(frame)
+                shifted = utils.shift_image(frame, -shift_x, -shift_y, out=shifted)
+                frame = shifted
+
+            accumulator.add(frame)
+            if preview is not None:
+                preview(accumulator.mean, ii + 1)
+            """the metadata of the last frame is taken before its lease is given up"""
+            last = utils.Frame.from_image(image)
+            last_metadata = dict(metadata=last.metadata, pixel_size=last.pixel_size,
+                                 horizontal_field_width=last.horizontal_field_width,
+                                 dwell_time=last.dwell_time, state=last.state)
+            image.release()
+
+        averaged = accumulator.result(dtype=dtype)
+        print(f'averaged {accumulator.n_frames} frames, '
+              f'rejected {accumulator.n_rejected_frames}')
+        return utils.Frame(averaged, **last_metadata)
+
+
+    def set_horizontal_field_width(self, hfw : float) -> float:
+        """Set the horizontal field width in metres, clipped to the maximum"""
+        if not self.demo:
+            def _set():
+                horizontal_field_width = self.microscope.beams.electron_beam.horizontal_field_width
+                value = min(hfw, horizontal_field_width.limits.max)
+                horizontal_field_width.value = value
+                return value
+            hfw = self._call(_set)
+        self.microscope_state.horizontal_field_width = hfw
+        return hfw
+
+
+    def get_working_distance(self) -> float:
+        if not self.demo:
+            self.microscope_state.working_distance = \
+                self._call(lambda: self.microscope.beams.electron_beam.working_distance.value)
+        elif self.microscope_state.working_distance == 0:
+            self.microscope_state.working_distance = self._demo_focus + 20e-6
+        return self.microscope_state.working_distance
+
+
+    def set_working_distance(self, working_distance : float) -> float:
+        """Set the working distance (focus) in metres, clipped to the limits"""
+        if not self.demo:
+            def _set():
+                limits = self.microscope.beams.electron_beam.working_distance.limits
+                value = min(max(working_distance, limits.min), limits.max)
+                self.microscope.beams.electron_beam.working_distance.value = value
+                return value
+            working_distance = self._call(_set)
+        self.microscope_state.working_distance = working_distance
+        return working_distance
+
+
+    def grab_focus_frame(self, hfw : float,
+                         dwell_time : float = 1e-6,
+                         resolution : str = '768x512',
+                         reduced_area : tuple = (0.25, 0.25, 0.5, 0.5)):
+        """Fast low-resolution reduced-area frame for the focus measurements
+        reduced_area : (left, top, width, height) as fractions of the field of view
+        Returns numpy array
+        """
+        if not self.demo:
+            grab_frame_settings = GrabFrameSettings(resolution=resolutions[resolution],
+                                                    dwell_time=dwell_time,
+                                                    reduced_area=Rectangle(*reduced_area))
+            image = self._call(lambda: self.microscope.imaging.grab_frame(grab_frame_settings))
+            return image.data
+
+        else:
+            """defocus model: gaussian blur proportional to the distance from the focal plane"""
+            if self._demo_specimen is None:
+                self._demo_specimen = utils.simulated_specimen()
+            height, width = self._demo_specimen.shape
+            left, top, w, h = reduced_area
+            specimen = self._demo_specimen[int(top * height):int((top + h) * height),
+                                           int(left * width):int((left + w) * width)]
+            convergence_angle = 5e-3
+            pixel_size = hfw / width
+            blur = abs(self.microscope_state.working_distance - self._demo_focus) * \
+                   2 * convergence_angle / pixel_size
+            if blur > 0.3:
+                specimen = cv2.GaussianBlur(specimen, (0, 0), blur)
+            noise = np.random.normal(0, 0.02, specimen.shape).astype(np.float32)
+            return np.clip((specimen + noise) * 255, 0, 255).astype(np.uint8)
+
+
+    def autofocus(self, hfw : float = None,
+                  search_range : float = None,
+                  n_steps : int = 5,
+                  n_iterations : int = 3,
+                  max_edge_moves : int = 4,
+                  dwell_time : float = 1e-6) -> float:
+        """Coarse-to-fine working distance sweep around the current working distance.
+        Every point is scored with utils.sharpness on a reduced-area low-resolution frame,
+        a parabola through the best point and its neighbours gives the next centre,
+        the range shrinks to half the step size each iteration (grabs at repeated
+        working distances are reused). The first sweep takes n_steps frames,
+        the following sweeps take at most 2 new frames each. If the best point is
+        at the edge of the sweep the window is moved there (at most max_edge_moves times).
+        Args:
+            hfw: horizontal field width in metres, defaults to the current one
+            search_range: full width of the first sweep in metres, defaults to 2*hfw
+        Returns
+        -------
+        float: the new working distance in metres
+        """
+        if hfw is None:
+            hfw = self.microscope_state.horizontal_field_width
+        else:
+            hfw = self.set_horizontal_field_width(hfw)
+        if search_range is None:
+            search_range = min(max(2 * hfw, 5e-6), 1e-3)
+
+        start_wd = self.get_working_distance()
+        centre, half_range = start_wd, search_range / 2
+        scores = {}
+
+        def _score(wd):
+            key = round(wd, 12)
+            if key not in scores:
+                self.set_working_distance(wd)
+                scores[key] = utils.sharpness(self.grab_focus_frame(hfw=hfw, dwell_time=dwell_time))
+            return scores[key]
+
+        iteration, edge_moves = 0, 0
+        while iteration < n_iterations:
+            points = np.linspace(centre - half_range, centre + half_range,
+                                 n_steps if iteration == 0 else 3)
+            values = [_score(wd) for wd in points]
+            best = int(np.argmax(values))
+
+            if (best == 0 or best == len(points) - 1) and edge_moves < max_edge_moves:
+                """the maximum is at the edge of the sweep, move the window there"""
+                centre = points[best]
+                edge_moves += 1
+                continue
+
+            vertex = None
+            if 0 < best < len(points) - 1:
+                vertex = utils.fit_parabola_vertex(points[best - 1:best + 2],
+                                                   values[best - 1:best + 2])
+            centre = points[best] if vertex is None else \
+                min(max(vertex, points[0]), points[-1])
+            half_range = (points[1] - points[0]) / 2
+            iteration += 1
+
+        working_distance = self.set_working_distance(centre)
+        print(f'autofocus: working distance {start_wd / 1e-3:.4f} -> {working_distance / 1e-3:.4f} mm, '
+              f'{len(scores)} frames')
+        return working_distance
+
+
+    def acquire_multiple_frames(self, all_settings: dict,
+                                hfw = None):
+        """Take new electron image from several quadrants.
+        Returns
+        -------
+        list of utils.Frame, one per quadrant
+        """
+        print('acquiring images...')
+
+        if not self.demo:
+            settings = self.update_image_settings(all_settings)
+
+            if hfw is not None:
+                hfw = hfw
+            else:
+                hfw = settings.horizontal_field_width
+
+            hfw = self.set_horizontal_field_width(hfw)
+
+            if settings.autocontrast == True:
+                self.autocontrast(quadrant=1, hfw=hfw)
+                self.autocontrast(quadrant=2, hfw=hfw)
+
+            if settings.frame_integration <= 0:
+                print(f'frame integration {settings.frame_integration} is not valid, using 1')
+                settings.frame_integration = 1
+
+            grab_frame_settings = GrabFrameSettings(resolution=resolutions[settings.resolution],
+                                                    dwell_time=settings.dwell_time,
+                                                    bit_depth=settings.bit_depth,
+                                                    drift_correction=settings.drift_correction,
+                                                    frame_integration=settings.frame_integration)
+            images = self._call(lambda: self.microscope.imaging.grab_multiple_frames(grab_frame_settings))
+            if settings.autocontrast == True:
+                """drifted quadrants are re-run by the autocontrast of the next grab"""
+                for quadrant, image in zip((1, 2), images):
+                    self._check_autocontrast(image, quadrant=quadrant, hfw=hfw)
+
+            state = dataclasses.replace(self.microscope_state)
+            return [utils.Frame.from_image(image, horizontal_field_width=hfw,
+                                           dwell_time=settings.dwell_time, state=state)
+                    for image in images]
+
+        else:
+            print('demo mode multiple frames  ')
+            if all_settings is not None:
+                settings = self.update_image_settings(all_settings)
+                print('settings = ', settings)
+                resolution = settings.resolution
+                [width, height] = np.array(resolution.split("x")).astype(int)
+            else:
+                height, width = 768, 512
+            frame = self._demo_frame(height, width, all_settings, hfw)
+            return [frame, utils.Frame(frame.data, horizontal_field_width=frame.horizontal_field_width,
+                                       dwell_time=frame.dwell_time, state=frame.state)]
+
+
+
+    def last_image(self,  quadrant : int, save : bool = False):
+        """Get the last previously acquired ion or electron beam image.
+        Parameters
+        ----------
+        microscope : Autoscript microscope object.
+        beam_type :
+
+        Returns
+        -------
+        utils.Frame, see acquire_image
+        """
+        if not self.demo:
+            def _get():
+                self.microscope.imaging.set_active_view(quadrant)
+                return self.microscope.imaging.get_image()
+            return utils.Frame.from_image(self._call(_get))
+
+        else:
+            return self._demo_frame(512, 768)
+
+
+    def grab_live_frame(self, resolution : str = '768x512',
+                        dwell_time : float = 0.3e-6,
+                        quadrant : int = 1,
+                        follow_microscope : bool = False):
+        """Single frame for the live view, no autocontrast, no HFW changes
+        follow_microscope: return the last image of the microscope's own live scan
+            (get_image) instead of grabbing a new frame
+        Returns
+        -------
+        numpy array
+        """
+        if not self.demo:
+            if follow_microscope:
+                return self.last_image(quadrant=quadrant).data
+            grab_frame_settings = GrabFrameSettings(resolution=resolutions[resolution],
+                                                    dwell_time=dwell_time)
+            return self._call(lambda: self.microscope.imaging.grab_frame(grab_frame_settings)).data
+
+        else:
+            """simulated specimen with shot noise and a slow drift, takes the scan time"""
+            [width, height] = np.array(resolution.split("x")).astype(int)
+            if self._demo_specimen is None:
+                self._demo_specimen = utils.simulated_specimen()
+            offset = 20 * np.sin(time.time() / 5)
+            matrix = np.float32([[self._demo_specimen.shape[1] / width / 1.2, 0, offset + 60],
+                                 [0, self._demo_specimen.shape[0] / height / 1.2, 40]])
+            frame = cv2.warpAffine(self._demo_specimen, matrix, (int(width), int(height)),
+                                   flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP)
+            frame = np.random.poisson(frame * 100).astype(np.float32) * 2.5
+            time.sleep(width * height * dwell_time)
+            return self._demo_output(frame)
+
+
+    def grab_tile(self, all_settings : dict, hfw : float, positioning_error : float = 0.0):
+        """Grab a mosaic tile at the current stage position and beam shift.
+        demo mode: a view of a large periodic simulated specimen at the stage + beam shift
+        position (see _render_demo_view), positioning_error (pixels, sd) simulates the
+        inaccuracy of the move, takes the scan time
+        Returns
+        -------
+        utils.Frame
+        """
+        if not self.demo:
+            return self.acquire_image(all_settings=all_settings, hfw=hfw)
+
+        settings = self.update_image_settings(all_settings)
+        [width, height] = np.array(settings.resolution.split("x")).astype(int)
+        return utils.Frame(self._render_demo_view(width, height, hfw, settings.dwell_time,
+                                                  positioning_error=positioning_error),
+                           horizontal_field_width=hfw, dwell_time=settings.dwell_time,
+                           state=dataclasses.replace(self.microscope_state), pool=self.buffer_pool)
+
+
+    def _render_demo_view(self, width : int, height : int, hfw : float, dwell_time : float,
+                          positioning_error : float = 0.0) -> np.ndarray:
+        """demo mode: the field of view on a large periodic simulated specimen at the stage +
+        beam shift position and the scan rotation (1 pixel = hfw / width), with shot noise of
+        1000 detected electrons per microsecond at full brightness, takes the scan time"""
+        if self._demo_mosaic_specimen is None:
+            self._demo_mosaic_specimen = utils.simulated_specimen((2048, 2048), seed=1)
+        specimen_height, specimen_width = self._demo_mosaic_specimen.shape
+        pixel_size = hfw / width
+        """image y-axis points down, stage and beam shift y-axes point up"""
+        x = (self.microscope_state.x + self.microscope_state.beam_shift_x) / pixel_size
+        y = -(self.microscope_state.y + self.microscope_state.beam_shift_y) / pixel_size
+        x += np.random.normal(0, positioning_error) - width / 2
+        y += np.random.normal(0, positioning_error) - height / 2
+        """the scan rotation turns the image content by -angle about the image centre"""
+        angle = self.microscope_state.scan_rotation_angle
+        rotation = np.array([[np.cos(angle), np.sin(angle)], [-np.sin(angle), np.cos(angle)]])
+        centre = np.array([(width - 1) / 2, (height - 1) / 2])
+        offset = np.array([x, y]) + centre - rotation @ centre
+        matrix = np.float32(np.column_stack([rotation, [offset[0] % specimen_width,
+                                                        offset[1] % specimen_height]]))
+        frame = cv2.warpAffine(self._demo_mosaic_specimen, matrix, (int(width), int(height)),
+                               flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                               borderMode=cv2.BORDER_WRAP)
+        electrons = max(1000 * dwell_time / 1e-6, 1e-3)
+        frame = np.random.poisson(frame * electrons).astype(np.float32) * (250 / electrons)
+        time.sleep(width * height * dwell_time)
+        return self._demo_output(frame)
+
+
+    def _demo_output(self, frame : np.ndarray) -> np.ndarray:
+        """8-bit copy of a simulated float frame in an array leased from self.buffer_pool"""
+        output = self.buffer_pool.lease(frame.shape, np.uint8)
+        cv2.convertScaleAbs(frame, dst=output)
+        return output
+
+
+    def get_dwell_times(self) -> list:
+        """Dwell times accepted by the microscope in seconds, utils.DWELL_TIMES within the
+        dwell time limits if the SDK does not list them"""
+        if not self.demo:
+            def _read():
+                dwell_time = self.microscope.beams.electron_beam.scanning.dwell_time
+                try:
+                    return sorted(dwell_time.available_values)
+                except Exception:
+                    limits = dwell_time.limits
+                    return [value for value in utils.DWELL_TIMES
+                            if limits.min <= value <= limits.max]
+            try:
+                return self._call(_read)
+            except Exception as e:
+                print(f'Could not read the dwell times, error {e}')
+        return list(utils.DWELL_TIMES)
+
+
+    def adaptive_dwell_time(self, hfw : float, target_snr : float,
+                            probe_dwell_time : float = 100e-9,
+                            resolution : str = '768x512') -> tuple:
+        """Shortest accepted dwell time reaching target_snr at the HFW, estimated from one
+        short low-resolution probe frame (utils.estimate_snr, shot-noise scaling).
+        The pixel noise depends on the dwell time, not on the resolution.
+        Returns
+        -------
+        (dwell time in seconds, snr of the probe frame)
+        """
+        dwell_times = self.get_dwell_times()
+        probe_dwell_time = min([value for value in dwell_times if value >= probe_dwell_time],
+                               default=dwell_times[-1])
+        self.set_horizontal_field_width(hfw)
+        if not self.demo:
+            grab_frame_settings = GrabFrameSettings(resolution=resolutions[resolution],
+                                                    dwell_time=probe_dwell_time)
+            probe = self._call(lambda: self.microscope.imaging.grab_frame(grab_frame_settings)).data
+        else:
+            [width, height] = np.array(resolution.split("x")).astype(int)
+            probe = self._render_demo_view(width, height, hfw, probe_dwell_time)
+        snr, _ = utils.estimate_snr(probe)
+        dwell_time = utils.choose_dwell_time(snr, probe_dwell_time, target_snr, dwell_times)
+        print(f'adaptive dwell: snr {snr:.1f} at {probe_dwell_time / 1e-9:g} ns, '
+              f'{dwell_time / 1e-9:g} ns for snr {target_snr:g}')
+        return dwell_time, snr
+
+
+    def acquire_mosaic(self, all_settings : dict,
+                       n_rows : int = 3, n_cols : int = 3,
+                       overlap : float = 0.1,
+                       hfw : float = None,
+                       mode : str = "stage",
+                       path : str = None,
+                       file_name : str = 'mosaic',
+                       preview=None,
+                       abort=None) -> dict:
+        """Acquire an n_rows x n_cols grid of overlapping tiles centred on the current
+        field of view, stepping the stage or, for small grids, the beam shift, and stitch
+        it on the fly (mosaic.MosaicStitcher). Tiles are placed on a worker thread while
+        the next tile is acquired. The stage and beam shift are restored afterwards.
+        The grid axes follow the image axes at zero scan rotation.
+        Args:
+            overlap: fraction of the tile shared with each neighbour
+            hfw: tile horizontal field width in metres, default from the settings
+            mode: "stage" or "beam" (beam shift, falls back to stage beyond its limit)
+            preview: callable(image, row, col), called after every tile
+            abort: callable() -> bool, checked before every tile
+        Returns
+        -------
+        dict: mosaic metadata (mosaic.json)
+        """
+        settings = self.update_image_settings(all_settings)
+        if hfw is None:
+            hfw = settings.horizontal_field_width
+        [width, height] = np.array(settings.resolution.split("x")).astype(int)
+        step_x = hfw * (1 - overlap)
+        step_y = hfw * height / width * (1 - overlap)
+
+        if mode == "beam":
+            extent = max((n_cols - 1) * step_x, (n_rows - 1) * step_y) / 2
+            limit = self.get_beam_shift_limit()
+            if extent + max(abs(self.microscope_state.beam_shift_x),
+                            abs(self.microscope_state.beam_shift_y)) > limit:
+                print(f'mosaic: beam shift of {extent / 1e-6:.1f} um exceeds the limit '
+                      f'{limit / 1e-6:.1f} um, stepping the stage')
+                mode = "stage"
+
+        (x0, y0, z0, t0, r0) = self.update_stage_position()
+        beam_shift_x0 = self.microscope_state.beam_shift_x
+        beam_shift_y0 = self.microscope_state.beam_shift_y
+
+        stitcher = mosaic.MosaicStitcher(path=path if path else os.getcwd(),
+                                         n_rows=n_rows, n_cols=n_cols,
+                                         tile_shape=(height, width),
+                                         overlap=overlap, file_name=file_name,
+                                         pixel_size=hfw / width)
+        """autocontrast only before the first tile, all tiles share the detector settings"""
+        tile_settings = dict(all_settings, imaging=dict(all_settings["imaging"]))
+        n_tiles = 0
+        try:
+            for row, col in mosaic.grid_order(n_rows, n_cols):
+                if abort is not None and abort():
+                    print('mosaic: aborted')
+                    break
+                dx = (col - (n_cols - 1) / 2) * step_x
+                dy = -(row - (n_rows - 1) / 2) * step_y
+                if mode == "beam":
+                    self.set_beam_shift(beam_shift_x=beam_shift_x0 + dx,
+                                        beam_shift_y=beam_shift_y0 + dy)
+                else:
+                    self.move_stage(x=x0 + dx, y=y0 + dy, z=z0, r=r0, t=t0, move_type="Absolute")
+                image = self.grab_tile(tile_settings, hfw=hfw,
+                                       positioning_error=3.0 if mode == "stage" else 0.5)
+                try:
+                    tile_settings["imaging"]["autocontrast"] = False
+                    stitcher.add(image, row, col)
+                    n_tiles += 1
+                    if preview is not None:
+                        preview(image, row, col)
+                finally:
+                    """recycled once the stitcher has placed and saved the tile"""
+                    image.release()
+        finally:
+            """the queued tiles are placed (and their leases released) before the worker stops"""
+            stitcher.close()
+            if mode == "beam":
+                self.set_beam_shift(beam_shift_x=beam_shift_x0, beam_shift_y=beam_shift_y0)
+            else:
+                self.move_stage(x=x0, y=y0, z=z0, r=r0, t=t0, move_type="Absolute")
+
+        if n_tiles == 0:
+            return {}
+        return stitcher.finish()
+
+
+    def acquire_rotation_series(self, all_settings : dict, angles : list,
+                                hfw : float = None,
+                                path : str = None,
+                                sample_name : str = 'rotation',
+                                preview=None,
+                                abort=None,
+                                n_workers : int = 4) -> str:
+        """Grab a frame at every scan rotation angle (degrees, absolute) and de-rotate the
+        frames into the orientation of the first one. De-rotation (cv2.warpAffine with
+        cached maps, utils.derotate), saving and the residual misalignment measurement run
+        in a pool of n_workers threads while the next angles are acquired.
+        The raw frames and the de-rotated ones (_derotated) are saved as .tif, the summary
+        records per frame the angle, the residual shift to the first de-rotated frame
+        (pixels) and its correlation peak. The scan rotation is restored afterwards.
+            preview: callable(image, angle), called after every frame
+            abort: callable() -> bool, checked before every frame
+        Returns
+        -------
+        str : the summary .csv file name, None if no frame was acquired
+        """
+        path = path if path else os.getcwd()
+        os.makedirs(path, exist_ok=True)
+        if hfw is None:
+            hfw = self.update_image_settings(all_settings).horizontal_field_width
+        rotation0 = self.microscope_state.scan_rotation_angle
+        """autocontrast only before the first frame, the contrast is part of the study"""
+        frame_settings = dict(all_settings, imaging=dict(all_settings["imaging"]))
+
+        keys = ('x', 'y', 'z', 't', 'r',
+                'horizontal_field_width', 'scan_rotation_angle',
+                'brightness', 'contrast',
+                'beam_shift_x', 'beam_shift_y')
+        experiment_data = {element: [] for element in keys}
+        experiment_data['file_name'] = []
+        experiment_data['timestamp'] = []
+
+        def _save_and_derotate(image, angle, file_name):
+            utils.save_image(image, path=path, file_name=file_name + '.tif')
+            derotated = utils.derotate(utils.image_data(image), angle)
+            if derotated.dtype == np.float32:
+                derotated = np.clip(derotated, 0, 255).astype(np.uint8)
+            utils.save_image(derotated, path=path, file_name=file_name + '_derotated.tif')
+            return utils.rotation_invariant_spectrum(derotated)
+
+        futures, angles_done = [], []
+        executor = ThreadPoolExecutor(max_workers=n_workers)
+        try:
+            reference_angle = None
+            for counter, angle in enumerate(angles):
+                if abort is not None and abort():
+                    print('rotation series: aborted')
+                    break
+                rotation = self.set_scan_rotation(np.deg2rad(angle), type="Absolute")
+                if reference_angle is None:
+                    reference_angle = rotation
+                image = self.grab_tile(frame_settings, hfw=hfw)
+                frame_settings["imaging"]["autocontrast"] = False
+                try:
+                    state = self.read_state()
+                except Exception as e:
+                    print(f'Could not read the microscope state, error {e}')
+                    state = self.microscope_state
+
+                timestamp = utils.current_timestamp()
+                file_name = '%06d_' % counter + sample_name + '_rot%g' % angle + '_' + timestamp
+                future = executor.submit(_save_and_derotate, image,
+                                         rotation - reference_angle, file_name)
+                angles_done.append(angle)
+                experiment_data = utils.populate_experiment_data_frame(
+                    data_frame=experiment_data, microscope_state=state,
+                    file_name=file_name + '.tif', timestamp=timestamp, keys=keys,
+                    extra={'angle' : angle,
+                           'derotation' : np.rad2deg(rotation - reference_angle),
+                           'derotated_file_name' : file_name + '_derotated.tif'})
+                if preview is not None:
+                    preview(image, angle)
+                """the pooled frame goes back once the worker has saved and de-rotated it"""
+                future.add_done_callback(lambda _, image=image: image.release())
+                futures.append(future)
+            spectra = [future.result() for future in futures]
+        finally:
+            executor.shutdown()
+            self.set_scan_rotation(rotation0, type="Absolute")
+
+        if not spectra:
+            return None
+        reference_spectrum, shape, binning = spectra[0]
+        for spectrum, _, _ in spectra:
+            shift_x, shift_y, peak = utils.phase_correlation(spectrum, reference_spectrum, shape)
+            experiment_data.setdefault('residual_x', []).append(shift_x * binning)
+            experiment_data.setdefault('residual_y', []).append(shift_y * binning)
+            experiment_data.setdefault('residual_peak', []).append(peak)
+        print('rotation series: residual shifts (px) ' +
+              ', '.join(f'{angle:g} deg ({x:.2f}, {y:.2f})' for angle, x, y in
+                        zip(angles_done, experiment_data['residual_x'], experiment_data['residual_y'])))
+        return utils.save_data_frame(data_frame=experiment_data, path=path,
+                                     file_name=sample_name + '_summary')
+
+
+    def update_stage_position(self):
+        try:
+            position = \
+                self._call(lambda: self.microscope.specimen.stage.current_position)
+            MicroscopeState.update_stage_position(self.microscope_state,
+                                                  x=position.x, y=position.y, z=position.z,
+                                                  t=position.t, r=position.r)
+            return (position.x, position.y, position.z,
+                    position.t, position.r)
+
+        except Exception as e:
+            print(f'stage position, error {e}, simulated coordinates are:')
+            #[x, y, z, t, r] = np.random.randint( 0,5, [5,1] ).astype(float)
+            [x, y, z, t, r] = np.random.rand(5, 1)
+            MicroscopeState.update_stage_position(self.microscope_state,
+                                                  x=x[0]*1e-3, y=y[0]*1e-3, z=z[0]*1e-3,
+                                                  t=t[0], r=r[0])
+            print(MicroscopeState.get_stage_position(self.microscope_state))
+            return (x[0]*1e-3, y[0]*1e-3, z[0]*1e-3, t[0], r[0])
+
+
+    def move_stage(self, x : float = 0, y : float = 0, z : float = 0,
+                   r : float = 0, t : float = 0,
+                   move_type : str = "Absolute",
+                   compucentric : bool = True) -> tuple:
+        """Move the stage, x, y, z in metres and r, t in rad as in MicroscopeState
+        Args:
+            move_type: "Absolute", "Relative" (offsets from the current position)
+                or "Raw coordinates" (absolute, in the raw stage coordinate system)
+            compucentric: rotate about the beam position in absolute moves
+        Returns
+        -------
+        tuple: stage position after the move (x, y, z, t, r)
+        """
+        if not self.demo:
+            try:
+                position = StagePosition(x=x, y=y, z=z, r=r, t=t)
+                if move_type == "Relative":
+                    """a relative move is not repeated after a reconnect, it may have run"""
+                    self._call(lambda: self.microscope.specimen.stage.relative_move(position),
+                               idempotent=False)
+                else:
+                    if move_type == "Raw coordinates":
+                        position.coordinate_system = CoordinateSystem.RAW
+                    self._call(lambda: self.microscope.specimen.stage.absolute_move(
+                        position, MoveSettings(rotate_compucentric=compucentric)))
+            except Exception as e:
+                print(f'Could not move the stage, error {e}')
+            return self.update_stage_position()
+        else:
+            if move_type == "Relative":
+                x, y, z = self.microscope_state.x + x, self.microscope_state.y + y, self.microscope_state.z + z
+                r, t = self.microscope_state.r + r, self.microscope_state.t + t
+            MicroscopeState.update_stage_position(self.microscope_state, x=x, y=y, z=z, r=r, t=t)
+            self.microscope_state.rotate_compucentric = compucentric
+            print(f'demo: moving the stage to x={x:.6f}, y={y:.6f}, z={z:.6f}, r={r:.3f}, t={t:.3f}')
+            return (x, y, z, t, r)
+
+
+
+    def set_scan_rotation(self, rotation_angle : float = 0, type="Absolute") -> float:
+        """Set scan rotation angle
+        Args:
+            rotation_angle (float): angle of scan rotation in degrees,
+            needs conversion to rad
+        Returns
+        -------
+        float: system-level scan rotation angle in degrees
+        """
+        if self.demo:
+            if type == "Relative":
+                rotation_angle = self.microscope_state.scan_rotation_angle + rotation_angle
+            self.microscope_state.scan_rotation_angle = rotation_angle % (2 * np.pi)
+            return self.microscope_state.scan_rotation_angle
+        try:
+            limits = self._call(lambda: self.microscope.beams.electron_beam.scanning.rotation.limits)
+            rot_min, rot_max = limits.min, limits.max
+
+            if type=="Relative":
+                """
+                    Change the current scan rotation by the specified value
+                    Check that targety scan_rot does not exceed (-2pi, +2pi)
+                    Otherwise divide module to stay within the (-2pi, +2pi) range
+                """
+                current_scan_rot = \
+                    self._call(lambda: self.microscope.beams.electron_beam.scanning.rotation.value)
+
+                target_rot_angle = current_scan_rot + rotation_angle
+
+                if target_rot_angle >=rot_max:
+                    target_rot_angle = target_rot_angle % (2*np.pi)
+                elif target_rot_angle <=rot_min:
+                    target_rot_angle = target_rot_angle % (2*np.pi)
+
+                print(f"setting scan rotation {type} to {np.rad2deg(target_rot_angle)}")
+                # TODO backend from from frontend separation
+                """the absolute target is computed once, setting it again is safe"""
+                self._call(lambda: setattr(self.microscope.beams.electron_beam.scanning.rotation,
+                                           'value', target_rot_angle))
+
+            elif type=="Absolute":
+                """Absolute value of the scan rotation"""
+                if rotation_angle >=rot_max:
+                    rotation_angle = rotation_angle % (2*np.pi)
+                elif rotation_angle <=rot_min:
+                    rotation_angle = rotation_angle % (2*np.pi)
+
+                print(f"setting scan rotation {type} to {np.rad2deg(rotation_angle)}")
+                # TODO backend from from frontend separation
+                self._call(lambda: setattr(self.microscope.beams.electron_beam.scanning.rotation,
+                                           'value', rotation_angle))
+
+            self._get_current_microscope_state()
+            return self._call(lambda: self.microscope.beams.electron_beam.scanning.rotation.value)
+
+        except Exception as e:
+            print(f'Failed to set scan rotation {type} by {np.rad2deg(rotation_angle)} deg, error {e}')
+            return rotation_angle
+
+
+    def set_beam_shift(self,
+                       beam_shift_x : float = 0.0,
+                       beam_shift_y : float = 0.0) -> None:
+        """Adjusting the beam shift
+        Args:
+            beam_shift_x: in metres, shift along x-axis
+            beam_shift_y: in metres, shift along y-axis
+        Returns
+        -------
+        None. Update the microscope state with the new beam shift values
+        """
+        if self.demo:
+            self.microscope_state.beam_shift_x = beam_shift_x
+            self.microscope_state.beam_shift_y = beam_shift_y
+            return
+        # adjust beamshift
+        try:
+            self._call(lambda: setattr(self.microscope.beams.electron_beam.beam_shift, 'value',
+                                       Point(beam_shift_x, beam_shift_y)))
+            self._get_current_microscope_state()
+        except Exception as e:
+            print(f"Could not apply beam shift, error {e}")
+
+
+    def correct_drift(self, image, hfw : float = None) -> tuple:
+        """Measure the drift of the image relative to the first frame of the series
+        (phase correlation) and re-centre the field of view using the beam shift.
+        Call self.drift_tracker.reset() at the start of every new series.
+        Args:
+            image: AdornedImage or numpy array, the frame just acquired
+            hfw: horizontal field width of the frame in metres
+        Returns
+        -------
+        (drift_x, drift_y) in metres, measured in the image coordinates
+        """
+        if hfw is None:
+            hfw = self.microscope_state.horizontal_field_width
+
+        drift_x, drift_y = self.drift_tracker.measure(image, hfw=hfw)
+        print(f"measured drift ({drift_x / 1e-9:.1f}, {drift_y / 1e-9:.1f}) nm")
+
+        if drift_x != 0 or drift_y != 0:
+            """image y-axis points down, beam shift y-axis points up"""
+            beam_shift_x = self.microscope_state.beam_shift_x + drift_x
+            beam_shift_y = self.microscope_state.beam_shift_y - drift_y
+            if not self.demo:
+                self.set_beam_shift(beam_shift_x=beam_shift_x,
+                                    beam_shift_y=beam_shift_y)
+            else:
+                print(f'demo: setting beam shift to ({beam_shift_x}, {beam_shift_y})')
+                self.microscope_state.beam_shift_x = beam_shift_x
+                self.microscope_state.beam_shift_y = beam_shift_y
+
+        return drift_x, drift_y
+
+
+    def get_beam_shift_limit(self) -> float:
+        """Largest beam shift along x and y in metres, 10 um in demo mode"""
+        try:
+            limits = self._call(lambda: self.microscope.beams.electron_beam.beam_shift.limits)
+            return min(limits.limits_x.max, limits.limits_y.max)
+        except Exception as e:
+            if not self.demo:
+                print(f'Could not read the beam shift limits, error {e}')
+            return 10e-6
+
+
+    def calibrate_beam_shift(self, all_settings : dict, hfw : float = None,
+                             step : float = 0.1, min_peak : float = 0.03):
+        """Measure the beam shift to image displacement mapping at the HFW and the current
+        scan rotation: frames are grabbed with the beam shifted by step field widths along
+        x and along y and phase-correlated with a reference frame. The mapping is cached
+        in self.beam_shift_calibration, the beam shift is restored.
+        Returns
+        -------
+        2x2 numpy array (see utils.BeamShiftCalibration) or None if the correlation failed
+        """
+        if hfw is None:
+            hfw = self.microscope_state.horizontal_field_width
+        rotation = self.microscope_state.scan_rotation_angle
+        beam_shift_x0 = self.microscope_state.beam_shift_x
+        beam_shift_y0 = self.microscope_state.beam_shift_y
+        """stay within the beam shift range around the current shift"""
+        headroom = self.get_beam_shift_limit() - max(abs(beam_shift_x0), abs(beam_shift_y0))
+        delta = min(step * hfw, 0.9 * headroom)
+        if delta <= 0:
+            print('Could not calibrate the beam shift, the beam shift is at its limit')
+            return None
+
+        settings = dict(all_settings, imaging=dict(all_settings["imaging"], autocontrast=False))
+        reference = self.grab_tile(settings, hfw=hfw)
+        small, binning = utils.downsample_for_analysis(reference)
+        reference_spectrum = utils.windowed_spectrum(small)
+        field_width = utils.image_data(reference).shape[1]
+
+        shifts = []
+        try:
+            for shift_x, shift_y in ((delta, 0.0), (0.0, delta)):
+                self.set_beam_shift(beam_shift_x=beam_shift_x0 + shift_x,
+                                    beam_shift_y=beam_shift_y0 + shift_y)
+                image = self.grab_tile(settings, hfw=hfw)
+                small, _ = utils.downsample_for_analysis(image)
+                dx, dy, peak = utils.phase_correlation(utils.windowed_spectrum(small),
+                                                       reference_spectrum, small.shape)
+                if peak < min_peak:
+                    print(f'Could not calibrate the beam shift, correlation peak {peak:.3f}')
+                    return None
+                shifts.append(np.array([dx, dy]) * binning / field_width)
+        finally:
+            self.set_beam_shift(beam_shift_x=beam_shift_x0, beam_shift_y=beam_shift_y0)
+
+        """columns: image displacement (field widths) per beam shift delta along x and y"""
+        displacements = np.column_stack(shifts)
+        if abs(np.linalg.det(displacements)) < 1e-3 * step ** 2:
+            print('Could not calibrate the beam shift, the measured displacements are degenerate')
+            return None
+        matrix = delta * np.linalg.inv(displacements)
+        self.beam_shift_calibration.store(hfw, rotation, matrix)
+        print(f'beam shift calibrated at hfw {hfw / 1e-6:g} um, '
+              f'rotation {np.rad2deg(rotation):.1f} deg: {matrix.round(9).tolist()}')
+        return matrix
+
+
+    def centre_on(self, pixel_x : float, pixel_y : float, image_shape : tuple,
+                  hfw : float = None) -> str:
+        """Bring the image point (pixel_x, pixel_y) to the centre of the field of view
+        with the beam shift, or with a relative stage move when the shift would exceed
+        the beam shift limit.
+        Args:
+            image_shape: (height, width) of the image the point was picked in
+            hfw: horizontal field width of that image in metres, default the current one
+        Returns
+        -------
+        str: "beam" or "stage", the way the field of view was moved
+        """
+        if hfw is None:
+            hfw = self.microscope_state.horizontal_field_width
+        rotation = self.microscope_state.scan_rotation_angle
+        height, width = image_shape[:2]
+        """the features at the point move to the centre"""
+        displacement = np.array([width / 2 - pixel_x, height / 2 - pixel_y])
+        shift = self.beam_shift_calibration.beam_shift_for(displacement, width, hfw, rotation)
+        beam_shift_x = self.microscope_state.beam_shift_x + shift[0]
+        beam_shift_y = self.microscope_state.beam_shift_y + shift[1]
+
+        limit = self.get_beam_shift_limit()
+        if max(abs(beam_shift_x), abs(beam_shift_y)) <= limit:
+            self.set_beam_shift(beam_shift_x=beam_shift_x, beam_shift_y=beam_shift_y)
+            return "beam"
+
+        """stage axes taken along the unrotated image axes, as the nominal beam shift"""
+        move = utils.BeamShiftCalibration.nominal(hfw, rotation) @ (displacement / width)
+        print(f'beam shift ({beam_shift_x / 1e-6:.2f}, {beam_shift_y / 1e-6:.2f}) um exceeds '
+              f'the limit {limit / 1e-6:.2f} um, moving the stage')
+        self.move_stage(x=move[0], y=move[1], move_type="Relative")
+        return "stage"
+
+
+    def reset_beam_shifts(self):
+        """Set the beam shift to zero for the electron beam
+        Args:
+            None
+        """
+        # logging.info(
+        #     f"reseting ebeam shift to (0, 0) from: {microscope.beams.electron_beam.beam_shift.value} "
+        # )
+        try:
+            beam_shift = self._call(lambda: self.microscope.beams.electron_beam.beam_shift.value)
+            print(f"reseting e-beam shift to (0, 0) from: {beam_shift}")
+            self._call(lambda: setattr(self.microscope.beams.electron_beam.beam_shift, 'value',
+                                       Point(0, 0)))
+            print(f"reset beam shifts to zero complete")
+        except Exception as e:
+            print(f"Could not reset the beam shift, error {e}")
+        self._get_current_microscope_state()
+        # logging.info(f"reset beam shifts to zero complete")
+
+
+    def _get_current_microscope_state(self) -> MicroscopeState:
+        """Acquires the current microscope state to store
+         if necessary it is possible to return to this stored state later
+         Returns the state in MicroscopeState dataclass variable
+        Args:
+            None
+        Returns
+        -------
+        MicroscopeState
+        """
+        def _read():
+            """re-issued as a whole by self._call after a reconnect"""
+            (x,y,z,t,r) = self.update_stage_position()
+            self.microscope_state.x = x
+            self.microscope_state.y = y
+            self.microscope_state.z = z
+            self.microscope_state.t = t
+            self.microscope_state.r = r
+            self.microscope_state.working_distance = \
+                self.microscope.beams.electron_beam.working_distance.value
+
+            self.microscope_state.horizontal_field_width = \
+                self.microscope.beams.electron_beam.horizontal_field_width.value
+            self.microscope_state.resolution = self.microscope.beams.electron_beam.scanning.resolution.value
+
+            self.microscope_state.hv = self.microscope.beams.electron_beam.high_voltage.value
+            self.microscope_state.beam_current = self.microscope.beams.electron_beam.beam_current.value
+
+            self.microscope_state.scan_rotation_angle = \
+                self.microscope.beams.electron_beam.scanning.rotation.value
+            self.microscope_state.brightness = self.microscope.detector.brightness.value
+            self.microscope_state.contrast = self.microscope.detector.contrast.value
+
+            beam_shift = self.microscope.beams.electron_beam.beam_shift.value # returns Point()
+            self.microscope_state.beam_shift_x = beam_shift.x
+            self.microscope_state.beam_shift_y = beam_shift.y
+
+        try:
+            self._call(_read)
+
+        except Exception as e:
+            print(f"Could not get the microscope state, error {e}")
+            self.microscope_state.x = 2
+            self.microscope_state.y = 1
+            self.microscope_state.z = 0
+            self.microscope_state.t = 0
+            self.microscope_state.r = 0
+            self.microscope_state.scan_rotation_angle = 0
+
+        return self.microscope_state
+
+
+    def read_state(self) -> MicroscopeState:
+        """Reads the stage position and the beam and detector state into a new
+        MicroscopeState, the stored self.microscope_state is not modified.
+        Used for background polling, errors are raised to the caller after the retries
+        of the connection manager.
+        demo mode: a copy of the stored state
+        """
+        if self.demo:
+            return dataclasses.replace(self.microscope_state)
+        return self._call(self._read_state)
+
+
+    def _read_state(self) -> MicroscopeState:
+        position = self.microscope.specimen.stage.current_position
+        electron_beam = self.microscope.beams.electron_beam
+        beam_shift = electron_beam.beam_shift.value
+        return MicroscopeState(
+            hv=electron_beam.high_voltage.value,
+            beam_current=electron_beam.beam_current.value,
+            x=position.x, y=position.y, z=position.z,
+            t=position.t, r=position.r,
+            horizontal_field_width=electron_beam.horizontal_field_width.value,
+            scan_rotation_angle=electron_beam.scanning.rotation.value,
+            brightness=self.microscope.detector.brightness.value,
+            contrast=self.microscope.detector.contrast.value,
+            beam_shift_x=beam_shift.x,
+            beam_shift_y=beam_shift.y,
+            working_distance=electron_beam.working_distance.value)
+
+
+    def _restore_microscope_state(self, state : MicroscopeState,
+                                  move_stage : bool = True) -> None:
+        """Restores the microscope state from the stored MicroscopeState variable:
+        stage position (if move_stage), HFW, resolution, scan rotation, detector brightness
+        and contrast, beam shift. HV and beam current are not changed.
+        Args:
+            state : MicroscopeState
+        Returns
+        -------
+        None
+        """
+        if self.demo:
+            if move_stage:
+                self.move_stage(x=state.x, y=state.y, z=state.z, r=state.r, t=state.t,
+                                move_type="Absolute", compucentric=state.rotate_compucentric)
+            for key in ('horizontal_field_width', 'resolution', 'scan_rotation_angle',
+                        'brightness', 'contrast', 'beam_shift_x', 'beam_shift_y'):
+                setattr(self.microscope_state, key, getattr(state, key))
+            return
+        try:
+            """the stored values are straight from the microscope in metres and rad"""
+            if move_stage:
+                self.move_stage(x=state.x, y=state.y, z=state.z,
+                                t=state.t, r=state.r,
+                                move_type="Absolute", compucentric=state.rotate_compucentric)
+            def _restore():
+                self.microscope.beams.electron_beam.horizontal_field_width.value = \
+                    state.horizontal_field_width
+                self.microscope.beams.electron_beam.scanning.resolution.value = state.resolution
+                self.microscope.beams.electron_beam.scanning.rotation.value =\
+                    state.scan_rotation_angle
+                self.microscope.detector.brightness.value = state.brightness
+                self.microscope.detector.contrast.value = state.contrast
+                self.microscope.beams.electron_beam.beam_shift.value = Point(state.beam_shift_x,
+                                                                             state.beam_shift_y)
+            """absolute set-points, re-issued as a whole after a reconnect"""
+            self._call(_restore)
+        except Exception as e:
+            print(f'Could not restore the microscope state, error {e}')
+        self._get_current_microscope_state()
+
+
+    def update_image_settings(self,
+                              all_settings: dict,
+                              resolution=None,
+                              dwell_time=None,
+                              horizontal_field_width=None,
+                              autocontrast=None,
+                              beam_type=None,
+                              quadrant=None,
+                              sample_name=None,
+                              path=None,
+                              bit_depth=None,
+                              drift_correction=None,
+                              frame_integration=None,
+                              q1=None,
+                              q2=None
+                              ):
+        """Update image settings. Uses default values if not supplied
+        Args:
+            settings (dict): the settings dictionary from GUI
+            resolution (str, optional): image resolution. Defaults to None.
+            dwell_time (float, optional): image dwell time. Defaults to None.
+            hfw (float, optional): image horizontal field width. Defaults to None.
+            autocontrast (bool, optional): use autocontrast. Defaults to None.
+            beam_type (BeamType, optional): beam type to image with (Electron, Ion). Defaults to None.
+            gamma (GammaSettings, optional): gamma correction settings. Defaults to None.
+            save (bool, optional): save the image. Defaults to None.
+            label (str, optional): image filename . Defaults to None.
+            save_path (Path, optional): directory to save image. Defaults to None.
+        """
+
+        # new image_settings
+        if resolution:
+            self.resolution = resolution
+        else:
+            self.resolution = all_settings["imaging"]["resolution"]
+
+        if dwell_time:
+            self.dwell_time = dwell_time
+        else:
+            self.dwell_time = all_settings["imaging"]["dwell_time"]
+
+        if horizontal_field_width:
+            self.horizontal_field_width = horizontal_field_width
+        else:
+            self.horizontal_field_width = all_settings["imaging"]["horizontal_field_width"]
+
+        if autocontrast:
+            self.__autocontrast = autocontrast
+        else:
+            self.__autocontrast = all_settings["imaging"]["autocontrast"]
+
+        if beam_type:
+            self.beam_type = beam_type
+        else:
+            self.beam_type = all_settings["imaging"]["beam_type"]
+
+        if quadrant:
+            self.quadrant = quadrant
+        else:
+            self.quadrant = all_settings["imaging"]["quadrant"]
+
+        if path:
+            self.path = path
+        else:
+            self.path = all_settings["imaging"]["path"]
+
+        if bit_depth:
+            self.bit_depth = bit_depth
+        else:
+            self.bit_depth = all_settings["imaging"]["bit_depth"]
+
+        if sample_name:
+            self.sample_name = sample_name
+        else:
+            self.sample_name = all_settings["imaging"]["sample_name"]
+
+        if drift_correction:
+            self.drift_correction = drift_correction
+        else:
+            self.drift_correction = all_settings["imaging"]["drift_correction"]
+
+        if frame_integration:
+            self.frame_integration = frame_integration
+        else:
+            self.frame_integration = all_settings["imaging"]["frame_integration"]
+
+        if frame_integration:
+            self.frame_integration = frame_integration
+        else:
+            self.frame_integration = all_settings["imaging"]["frame_integration"]
+
+        self.image_settings = ImageSettings(
+            resolution=self.resolution,
+            dwell_time=self.dwell_time,
+            horizontal_field_width=self.horizontal_field_width,
+            quadrant=self.quadrant,
+            autocontrast=self.__autocontrast,
+            beam_type=BeamType.ELECTRON if beam_type is None else beam_type,
+            path=self.path,
+            sample_name=self.sample_name,
+            bit_depth=self.bit_depth,
+            drift_correction=self.drift_correction,
+            frame_integration=self.frame_integration
+        )
+
+        return self.image_settings
+
+
+    def disconnect(self):
+        try:
+            self.microscope.disconnect()
+        except:
+            pass # probably demo mode, no microscope connected, continue shutting down
+
+
+
+
+
+if __name__ == '__main__':
+    pass
+
+
+
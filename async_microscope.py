@@ -0,0 +1,118 @@
+"""asyncio front-end for SEM.Microscope.
+
+The blocking Microscope methods and SDK reads run on a bounded thread pool. Independent
+reads (HV, beam current, detector, stage position...) are issued together with
+asyncio.gather, writes and acquisitions are ordered: they wait for each other through
+one asyncio.Lock, in the order they were awaited, while reads go on concurrently.
+
+    async def main():
+        async with AsyncMicroscope(SEM.Microscope(demo=True)) as microscope:
+            state, image = await asyncio.gather(microscope.read_state(),
+                                                microscope.acquire_image(all_settings, hfw=50e-6))
+
+Every SDK call goes through Microscope._call, so reconnects and retries apply as for the
+blocking calls. max_workers bounds the calls in flight at the microscope server.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import MicroscopeState
+
+"""MicroscopeState attribute, read from the client (SdbMicroscopeClient)"""
+_READS = (('hv', lambda client: client.beams.electron_beam.high_voltage.value),
+          ('beam_current', lambda client: client.beams.electron_beam.beam_current.value),
+          ('horizontal_field_width',
+           lambda client: client.beams.electron_beam.horizontal_field_width.value),
+          ('working_distance', lambda client: client.beams.electron_beam.working_distance.value),
+          ('scan_rotation_angle', lambda client: client.beams.electron_beam.scanning.rotation.value),
+          ('brightness', lambda client: client.detector.brightness.value),
+          ('contrast', lambda client: client.detector.contrast.value))
+
+
+class AsyncMicroscope():
+    """Awaitable wrapper of an SEM.Microscope, see the module docstring"""
+    def __init__(self, microscope, max_workers : int = 4):
+        self.microscope = microscope
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='microscope')
+        self._write_lock = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    async def _run(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _write(self, func, *args, **kwargs):
+        """Ordered call: one write or acquisition at a time"""
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        async with self._write_lock:
+            return await self._run(func, *args, **kwargs)
+
+    async def read(self, getter):
+        """getter(client) on the pool, e.g. read(lambda client: client.detector.contrast.value)"""
+        return await self._run(self.microscope._call, lambda: getter(self.microscope.microscope))
+
+    async def read_state(self) -> MicroscopeState:
+        """New MicroscopeState from concurrent reads, as Microscope.read_state"""
+        if self.microscope.demo:
+            return await self._run(self.microscope.read_state)
+        position, beam_shift, *values = await asyncio.gather(
+            self.read(lambda client: client.specimen.stage.current_position),
+            self.read(lambda client: client.beams.electron_beam.beam_shift.value),
+            *(self.read(getter) for _, getter in _READS))
+        return MicroscopeState(x=position.x, y=position.y, z=position.z,
+                               t=position.t, r=position.r,
+                               beam_shift_x=beam_shift.x, beam_shift_y=beam_shift.y,
+                               **{name: value for (name, _), value in zip(_READS, values)})
+
+    async def get_working_distance(self) -> float:
+        return await self._run(self.microscope.get_working_distance)
+
+    async def update_stage_position(self) -> tuple:
+        return await self._run(self.microscope.update_stage_position)
+
+    async def acquire_image(self, all_settings : dict, hfw : float = None):
+        return await self._write(self.microscope.acquire_image, all_settings, hfw=hfw)
+
+    async def acquire_multiple_frames(self, all_settings : dict, hfw : float = None):
+        return await self._write(self.microscope.acquire_multiple_frames, all_settings, hfw=hfw)
+
+    async def set_horizontal_field_width(self, hfw : float) -> float:
+        return await self._write(self.microscope.set_horizontal_field_width, hfw)
+
+    async def set_working_distance(self, working_distance : float) -> float:
+        return await self._write(self.microscope.set_working_distance, working_distance)
+
+    async def move_stage(self, x : float = 0, y : float = 0, z : float = 0,
+                         r : float = 0, t : float = 0,
+                         move_type : str = "Absolute", compucentric : bool = True) -> tuple:
+        return await self._write(self.microscope.move_stage, x=x, y=y, z=z, r=r, t=t,
+                                 move_type=move_type, compucentric=compucentric)
+
+    async def autocontrast(self, quadrant : int = 1, hfw : float = None,
+                           force : bool = False) -> bool:
+        return await self._write(self.microscope.autocontrast, quadrant=quadrant, hfw=hfw,
+                                 force=force)
+
+    async def autofocus(self, hfw : float = None, **kwargs) -> float:
+        return await self._write(self.microscope.autofocus, hfw=hfw, **kwargs)
+
+    async def poll_state(self, interval : float, callback) -> None:
+        """callback(MicroscopeState) every interval seconds until cancelled, read errors
+        are printed and polling goes on"""
+        while True:
+            try:
+                callback(await self.read_state())
+            except Exception as e:
+                print(f'state polling: could not read the microscope state, error {e}')
+            await asyncio.sleep(interval)
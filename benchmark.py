@@ -0,0 +1,265 @@
+"""Benchmark suite, runs headless on the simulated microscope (demo mode), so it needs
+neither the microscope nor the SDK. Run it on the microscope PC before deploying and
+compare with the stored baseline:
+
+    python benchmark.py [--baseline benchmark_baseline.json] [--save-baseline]
+                        [--output benchmark_results.json] [--repeat 5] [--tolerance 0.25]
+                        [--only acquisition io processing metadata stack]
+
+Groups:
+    acquisition   acquire_image / acquire_multiple_frames per frame, at every scanning resolution
+    io            save_image / load_image throughput per bit depth and tiff compression
+    processing    enhance_contrast, equalise_histogram, resize
+    metadata      parse_metadata rate on a tif with an SEM metadata tag
+    stack         GUIMainWindow.collect_stack end-to-end frames/hour (needs PyQt5,
+                  the offscreen Qt platform is used without a display)
+
+Every timing is the median of --repeat runs after one warm-up run. The results file is JSON:
+{"environment": {...}, "results": {name: {"value": v, "unit": u, "better": "lower"|"higher"}}}
+A result more than --tolerance worse than its baseline is a regression, the exit code is then 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os, platform, shutil, sys, tempfile, time
+
+import numpy as np
+import cv2
+from PIL import Image
+
+import SEM
+import recipe
+import utils
+
+
+COMPRESSIONS = (None, 'packbits', 'tiff_lzw', 'tiff_adobe_deflate')
+GROUPS = ('acquisition', 'io', 'processing', 'metadata', 'stack')
+
+
+@contextlib.contextmanager
+def _quiet():
+    """the acquisitions print their settings, keep them out of the report"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def measure(func, repeat : int = 5) -> float:
+    """Median duration of func() in seconds, after one warm-up call"""
+    func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations))
+
+
+def _settings(resolution : str, bit_depth : int = 8) -> dict:
+    return recipe.Recipe(horizontal_field_widths=[],
+                         imaging={"resolution": resolution, "bit_depth": bit_depth}).settings_dict()
+
+
+def _pixels(resolution : str) -> int:
+    width, height = (int(n) for n in resolution.split('x'))
+    return width * height
+
+
+def _specimen(resolution : str, bit_depth : int) -> np.ndarray:
+    """simulated specimen texture, compresses like an SEM image unlike random pixels"""
+    width, height = (int(n) for n in resolution.split('x'))
+    dtype = np.uint16 if bit_depth == 16 else np.uint8
+    return (utils.simulated_specimen((height, width)) * np.iinfo(dtype).max).astype(dtype)
+
+
+class Benchmark():
+    """Collects the results, result(name, value, unit, better)"""
+    def __init__(self, repeat : int = 5, resolution : str = '1536x1024'):
+        self.repeat = repeat
+        self.resolution = resolution
+        self.results = {}
+
+    def result(self, name : str, value : float, unit : str, better : str = 'lower') -> None:
+        self.results[name] = {'value' : value, 'unit' : unit, 'better' : better}
+        print(f'{name:<45} {value:12.3f} {unit}')
+
+    def acquisition(self) -> None:
+        with _quiet():
+            microscope = SEM.Microscope(demo=True)
+
+        def acquire_image(settings):
+            with _quiet():
+                microscope.acquire_image(settings).release()
+
+        def acquire_multiple_frames(settings):
+            with _quiet():
+                frames = microscope.acquire_multiple_frames(settings)
+            frames[0].release()
+
+        for resolution in sorted(SEM.resolution_names, key=_pixels):
+            for bit_depth in (8, 16):
+                settings = _settings(resolution, bit_depth)
+                for func in (acquire_image, acquire_multiple_frames):
+                    seconds = measure(lambda: func(settings), self.repeat)
+                    self.result(f'{func.__name__}.{resolution}.{bit_depth}bit',
+                                seconds * 1e3, 'ms')
+
+    def io(self) -> None:
+        directory = tempfile.mkdtemp(prefix='sem_benchmark_')
+        try:
+            for bit_depth in (8, 16):
+                image = _specimen(self.resolution, bit_depth)
+                megabytes = image.nbytes / 1e6
+                for compression in COMPRESSIONS:
+                    name = f'{bit_depth}bit.{compression or "raw"}'
+                    file_name = name + '.tif'
+                    with _quiet():
+                        seconds = measure(lambda: utils.save_image(image, path=directory,
+                                                                   file_name=file_name,
+                                                                   compression=compression),
+                                          self.repeat)
+                    self.result(f'save_image.{name}', megabytes / seconds, 'MB/s', 'higher')
+                    file_path = os.path.join(directory, file_name)
+                    seconds = measure(lambda: utils.load_image(file_path), self.repeat)
+                    self.result(f'load_image.{name}', megabytes / seconds, 'MB/s', 'higher')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def processing(self) -> None:
+        for bit_depth in (8, 16):
+            image = _specimen(self.resolution, bit_depth)
+            seconds = measure(lambda: utils.enhance_contrast(image), self.repeat)
+            self.result(f'enhance_contrast.{bit_depth}bit', seconds * 1e3, 'ms')
+        image = _specimen(self.resolution, 8)
+        seconds = measure(lambda: utils.equalise_histogram(image), self.repeat)
+        self.result('equalise_histogram.8bit', seconds * 1e3, 'ms')
+        seconds = measure(lambda: utils.resize(image), self.repeat)
+        self.result('resize.200x200', seconds * 1e3, 'ms')
+
+    def metadata(self, n_files : int = 20) -> None:
+        """tifs with an SEM metadata tag (34682) of the usual size, ~20 sections of 15 keys"""
+        text = '\r\n'.join(f'[Section{section}]\r\n' +
+                           '\r\n'.join(f'Key{key}={section * key * 1.5e-6}' for key in range(15))
+                           for section in range(20)) + '\r\n'
+        directory = tempfile.mkdtemp(prefix='sem_benchmark_')
+        try:
+            files = [os.path.join(directory, f'{number:03d}.tif') for number in range(n_files)]
+            image = Image.fromarray(_specimen('768x512', 8))
+            for file_name in files:
+                image.save(file_name, tiffinfo={34682 : text})
+
+            def parse_all():
+                for file_name in files:
+                    utils.parse_metadata(file_name)
+
+            seconds = measure(parse_all, self.repeat)
+            self.result('parse_metadata', n_files / seconds, 'files/s', 'higher')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def stack(self, levels : int = 4) -> None:
+        """collect_stack of the first levels HFWs of the GUI in demo mode, saved as tif"""
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        try:
+            from PyQt5 import QtWidgets
+            import main
+        except ImportError as e:
+            print(f'stack benchmark skipped, error {e}')
+            return
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+        directory = tempfile.mkdtemp(prefix='sem_benchmark_')
+        try:
+            with _quiet():
+                window = main.GUIMainWindow(demo=True)
+                window.DIR = directory
+                for number in range(1, 13):
+                    getattr(window, 'checkBox_hfw_%02d' % number).setChecked(number <= levels)
+                seconds = measure(window.collect_stack, self.repeat)
+                window.disconnect()
+            resolution = window.create_settings_dict()["imaging"]["resolution"]
+            self.result(f'collect_stack.{resolution}', levels / seconds * 3600, 'frames/h', 'higher')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def environment(self) -> dict:
+        return {'timestamp' : utils.current_timestamp(),
+                'platform' : platform.platform(),
+                'processor' : platform.processor(),
+                'cpu_count' : os.cpu_count(),
+                'python' : platform.python_version(),
+                'numpy' : np.__version__,
+                'opencv' : cv2.__version__,
+                'pillow' : Image.__version__,
+                'resolution' : self.resolution,
+                'repeat' : self.repeat,
+                'peak_rss' : utils.peak_rss()}
+
+
+def compare(results : dict, baseline : dict, tolerance : float = 0.25) -> list:
+    """Print the change of every result against the baseline, returns the names of the
+    results more than tolerance worse (slower: value / baseline > 1 + tolerance)"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            print(f'{name:<45} new')
+            continue
+        value, reference = result['value'], baseline[name]['value']
+        if value <= 0 or reference <= 0:
+            continue
+        slowdown = value / reference if result['better'] == 'lower' else reference / value
+        flag = 'REGRESSION' if slowdown > 1 + tolerance else ''
+        print(f'{name:<45} {reference:12.3f} -> {value:12.3f} {result["unit"]:<9} '
+              f'{(1 / slowdown - 1) * 100:+6.1f}% {flag}')
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark acquisition, I/O and processing '
+                                                 'on the simulated microscope')
+    parser.add_argument('--output', default='benchmark_results.json', help='results file')
+    parser.add_argument('--baseline', default='benchmark_baseline.json',
+                        help='baseline file to compare with, if it exists')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of every benchmark')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='relative slowdown reported as a regression')
+    parser.add_argument('--resolution', default='1536x1024', choices=SEM.resolution_names,
+                        help='frame size of the io and processing benchmarks')
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=GROUPS,
+                        help='benchmark groups to run')
+    args = parser.parse_args(argv)
+
+    benchmark = Benchmark(repeat=args.repeat, resolution=args.resolution)
+    for group in GROUPS:
+        if group in args.only:
+            print(f'--- {group}')
+            getattr(benchmark, group)()
+    report = {'environment' : benchmark.environment(), 'results' : benchmark.results}
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'results saved to {args.output}')
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'baseline saved to {args.baseline}')
+    elif os.path.isfile(args.baseline):
+        try:
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f'Could not load the baseline {args.baseline}, error {e}')
+            return 1
+        print(f'--- comparison with {args.baseline} ({baseline["environment"]["timestamp"]})')
+        regressions = compare(benchmark.results, baseline['results'], args.tolerance)
+        print(f'{len(regressions)} regression(s)')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Connection manager for the microscope client: health checks, reconnects with
+exponential backoff and bounded retries of idempotent calls.
+
+Calls go through ConnectionManager.call(func), func is a callable without arguments that
+looks the client up when it runs (lambda: microscope.imaging.grab_frame(settings)), so a
+retry after a reconnect uses the new client. When a call fails the health check decides:
+a healthy connection means a genuine error (invalid value etc.) which is raised at once,
+otherwise the client reconnects and idempotent calls (reads, absolute set-points, frame
+grabs) are issued again, at most max_retries times.
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class ConnectionStats:
+    calls : int = 0
+    failures : int = 0
+    retries : int = 0
+    reconnects : int = 0
+    failed_reconnects : int = 0
+    latency_mean : float = 0.0
+    latency_max : float = 0.0
+    last_error : str = ''
+    last_reconnect : float = 0.0
+
+
+class ConnectionLost(ConnectionError):
+    """The microscope could not be reached within the reconnect attempts"""
+
+
+class ConnectionManager():
+    """connect: callable() that (re)creates and connects the client, raises on failure
+    health_check: callable() -> bool, a cheap read that succeeds on a working connection
+    Reconnect attempts wait base_delay * 2^attempt seconds (at most max_delay, with
+    jitter), latency_mean is a running average (weight latency_rate) of the call durations.
+    """
+    def __init__(self, connect, health_check,
+                 max_retries : int = 3,
+                 reconnect_attempts : int = 8,
+                 base_delay : float = 0.5,
+                 max_delay : float = 30.0,
+                 latency_rate : float = 0.1):
+        self.connect = connect
+        self.health_check = health_check
+        self.max_retries = max_retries
+        self.reconnect_attempts = reconnect_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.latency_rate = latency_rate
+        self.stats = ConnectionStats()
+        """reconnects are serialised, the generation tells a waiting thread that another
+        one has already reconnected"""
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def is_healthy(self) -> bool:
+        try:
+            return bool(self.health_check())
+        except Exception:
+            return False
+
+    def reconnect(self, generation : int = None) -> bool:
+        """Reconnect with exponential backoff, returns True once the connection is healthy"""
+        with self._lock:
+            if generation is not None and generation != self._generation and self.is_healthy():
+                return True
+            for attempt in range(self.reconnect_attempts):
+                try:
+                    self.connect()
+                    if self.is_healthy():
+                        self._generation += 1
+                        self.stats.reconnects += 1
+                        self.stats.last_reconnect = time.time()
+                        print(f'reconnected to the microscope after {attempt + 1} attempt(s)')
+                        return True
+                except Exception as e:
+                    self.stats.last_error = str(e)
+                self.stats.failed_reconnects += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                delay *= random.uniform(0.5, 1.0)
+                print(f'reconnect attempt {attempt + 1}/{self.reconnect_attempts} failed, '
+                      f'next in {delay:.1f} s')
+                time.sleep(delay)
+            return False
+
+    def call(self, func, idempotent : bool = True):
+        """Run func() with the retry policy, returns its result.
+        Raises the error of func if the connection is healthy (or the call is not
+        idempotent and has been attempted), ConnectionLost if it cannot be restored."""
+        retries = 0
+        while True:
+            generation = self._generation
+            start = time.perf_counter()
+            try:
+                result = func()
+            except Exception as e:
+                self.stats.failures += 1
+                self.stats.last_error = str(e)
+                if self.is_healthy():
+                    raise
+                print(f'microscope connection lost ({e}), reconnecting')
+                if not self.reconnect(generation):
+                    raise ConnectionLost(f'could not reconnect to the microscope: {e}') from e
+                if not idempotent or retries >= self.max_retries:
+                    raise
+                retries += 1
+                self.stats.retries += 1
+                continue
+            latency = time.perf_counter() - start
+            self.stats.calls += 1
+            self.stats.latency_mean += self.latency_rate * (latency - self.stats.latency_mean)
+            self.stats.latency_max = max(self.stats.latency_max, latency)
+            return result
+
+    def get_stats(self) -> dict:
+        return asdict(self.stats)
+
+    def summary(self) -> str:
+        stats = self.stats
+        return (f'{stats.calls} calls, latency {stats.latency_mean * 1e3:.0f} ms '
+                f'(max {stats.latency_max * 1e3:.0f} ms), {stats.failures} failures, '
+                f'{stats.retries} retries, {stats.reconnects} reconnects')
@@ -1,498 +1,1375 @@
-import qtdesigner_files.main_gui as gui_main
-from PyQt5 import QtWidgets, QtGui, QtCore
-from PyQt5.QtCore import QObject, QThread, QThreadPool, QTimer, pyqtSignal
-from PyQt5.QtWidgets import QFileDialog
-import qimage2ndarray
-
-from importlib import reload  # Python 3.4+
-from dataclasses import dataclass
-
-import sys, time, os, glob
-import numpy as np
-import SEM
-
-
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as _FigureCanvas
-from matplotlib.backends.backend_qt5agg import (
-    NavigationToolbar2QT as _NavigationToolbar,
-)
-
-import utils
-from utils import BeamType
-
-
-class GUIMainWindow(gui_main.Ui_MainWindow, QtWidgets.QMainWindow):
-    def __init__(self, demo):
-        super(GUIMainWindow, self).__init__()
-        self.setupUi(self)
-        self.demo = demo
-        self.time_counter = 0
-        print('mode demo is ', demo)
-        self.setStyleSheet("""QPushButton {
-        border: 1px solid lightgray;
-        border-radius: 5px;
-        background-color: #e3e3e3;
-        }""")
-
-        self.DIR = os.getcwd()
-
-        self.setup_connections()
-        self.initialise_image_frames()
-        self.initialise_hardware()
-
-        self._abort_clicked_status = False
-        self._blanked = False
-
-        self.image = None
-        self.image_mod = None
-        self.current_image = None
-
-        self._get_all_the_HFW_to_use()
-
-        try:
-            self.initialise_hardware()
-        except Exception as e:
-            print(f'Could not initialise the microscope, Error {e}')
-            self.label_messages.setText('Could not initialise the microscope: ' + str(e))
-
-
-    def setup_connections(self):
-        self.pushButton_acquire.clicked.connect(lambda: self.acquire_image())
-        self.pushButton_select_directory.clicked.connect(lambda: self.select_directory())
-        self.pushButton_initialise_microscope.clicked.connect(lambda: self.initialise_hardware())
-        self.pushButton_last_image.clicked.connect(lambda: self.last_image())
-        self.pushButton_update_stage_position.clicked.connect(lambda: self.update_stage_position())
-        self.pushButton_move_stage.clicked.connect(lambda: self.move_stage())
-        self.pushButton_abort_stack_collection.clicked.connect(lambda: self._abort_clicked())
-        self.pushButton_collect_stack.clicked.connect(lambda: self.collect_stack())
-        self.pushButton_update_SEM_state.clicked.connect(lambda: self.update_SEM_state())
-        #
-        self.pushButton_save_file.clicked.connect(lambda: self._save_SEM_image())
-        #
-        self.pushButton_open_file.clicked.connect(lambda: self._open_file())
-        self.pushButton_apply_clahe.clicked.connect(lambda: self._apply_clahe())
-        self.pushButton_restore.clicked.connect(lambda: self._restore_image())
-
-
-
-
-    def create_settings_dict(self) -> dict:
-        resolution = self.comboBox_resolution.currentText()
-        dwell_time = self.spinBox_dwell_time.value() * 1e-6
-        horizontal_field_width = self.spinBox_horizontal_field_width.value() * 1e-6
-        autocontrast = self.checkBox_autocontrast.isChecked()
-        beam_type = self.comboBox_beam_type.currentText()
-        if beam_type == "ELECTRON":
-            beam_type = BeamType.ELECTRON
-        elif beam_type == "ION":
-            beam_type = BeamType.ION
-        else:
-            beam_type = BeamType.ELECTRON
-
-        quadrant = int(self.comboBox_quadrant.currentText())
-        q1 = self.checkBox_q1.isChecked()
-        q2 = self.checkBox_q2.isChecked()
-
-        path = self.DIR
-        sample_name = self.plainTextEdit_sample_name.toPlainText()
-        bit_depth = int(self.comboBox_bit_depth.currentText())
-        drift_correction = self.checkBox_drift_correction.isChecked()
-        frame_integration = self.spinBox_frame_integration.value()
-
-        self.all_settings = {
-            "imaging": {
-                "resolution": resolution,
-                "horizontal_field_width": horizontal_field_width,
-                "dwell_time": dwell_time,
-                "autocontrast": autocontrast,
-                "beam_type": beam_type,
-                "quadrant": quadrant,
-                "path": path,
-                "sample_name": sample_name,
-                "bit_depth": bit_depth,
-                "drift_correction" : drift_correction,
-                'frame_integration' : frame_integration,
-                'q1' : q1,
-                'q2' : q2
-            }
-        }
-        return self.all_settings
-
-    ##############################################  HARDWARE ###########################################################
-
-    def initialise_hardware(self):
-        all_settings = self.create_settings_dict()
-        self.microscope = SEM.Microscope(settings=all_settings, log_path=None, demo=self.demo)
-        self.microscope.establish_connection()
-        self.label_messages.setText(str(self.microscope.microscope_state))
-
-
-
-    def acquire_image(self,
-                      hfw = None):
-        all_settings = self.create_settings_dict()
-        if hfw is not None:
-            all_settings["imaging"]["horizontal_field_width"] = hfw
-
-        self.image = \
-            self.microscope.acquire_image(all_settings=all_settings,
-                                          hfw=hfw)
-        try:
-            self.pixelsize_x = self.image.metadata.binary_result.pixel_size.x
-        except Exception as e:
-            self.pixelsize_x = 1
-            print(f'Cannot extract pixel size from the image metadata, error {e}')
-
-        self.doubleSpinBox_pixel_size.setValue(self.pixelsize_x / 1e-9)
-        self.update_display(image=self.image)
-        return self.image
-
-
-    def acquire_multiple_frames(self,
-                                hfw = None):
-        all_settings = self.create_settings_dict()
-        if hfw is not None:
-            all_settings["imaging"]["horizontal_field_width"] = hfw
-
-        self.images = \
-            self.microscope.acquire_multiple_frames(all_settings=all_settings,
-                                                    hfw=hfw)
-        try:
-            self.pixelsize_x = self.images[0].metadata.binary_result.pixel_size.x
-        except Exception as e:
-            self.pixelsize_x = 1
-            print(f'Cannot extract pixel size from the image metadata, error {e}')
-
-        self.doubleSpinBox_pixel_size.setValue(self.pixelsize_x / 1e-9)
-        self.update_display(image=self.images[0])
-        return self.images
-
-
-    def last_image(self):
-        quadrant = int(self.comboBox_quadrant.currentText())
-        self.image = \
-            self.microscope.last_image(quadrant=quadrant)
-        try:
-            image = self.image.data
-        except:
-            image = self.image
-        self.update_display(image=image)
-
-
-    def update_stage_position(self):
-        self.comboBox_move_type.setCurrentText("Absolute")
-        self.microscope.update_stage_position()
-        self.doubleSpinBox_stage_x.setValue(self.microscope.microscope_state.x / 1e-6)
-        self.doubleSpinBox_stage_y.setValue(self.microscope.microscope_state.y / 1e-6)
-        self.doubleSpinBox_stage_z.setValue(self.microscope.microscope_state.z / 1e-6)
-        r = np.rad2deg(self.microscope.microscope_state.r)
-        self.doubleSpinBox_stage_r.setValue(r)
-        t = np.rad2deg(self.microscope.microscope_state.t)
-        self.doubleSpinBox_stage_t.setValue(t)
-
-
-    def update_SEM_state(self):
-        self.microscope._get_current_microscope_state()
-        self.update_stage_position()
-        self.doubleSpinBox_working_distance.setValue(self.microscope.microscope_state.working_distance / 1e-3)
-
-        self.doubleSpinBox_high_voltage.setValue(self.microscope.microscope_state.hv)
-        self.doubleSpinBox_beam_current.setValue(self.microscope.microscope_state.beam_current / 1e-9)
-        self.doubleSpinBox_brightness.setValue(self.microscope.microscope_state.brightness)
-        self.doubleSpinBox_contrast.setValue(self.microscope.microscope_state.contrast)
-
-        self.spinBox_horizontal_field_width.setValue(
-            self.microscope.microscope_state.horizontal_field_width / 1e-6 )
-        self.doubleSpinBox_scan_rotation.setValue(
-            np.rad2deg(self.microscope.microscope_state.scan_rotation_angle)
-        )
-        self.doubleSpinBox_beam_shift_x.setValue(self.microscope.microscope_state.beam_shift_x / 1e-6)
-        self.doubleSpinBox_beam_shift_y.setValue(self.microscope.microscope_state.beam_shift_y / 1e-6)
-
-
-
-    def set_scan_rotation(self):
-        rotation_angle = self.doubleSpinBox_scan_rotation.value()
-        rotation_angle = np.deg2rad(rotation_angle)
-        self.microscope.set_scan_rotation(rotation_angle=rotation_angle)
-
-
-    def set_beam_shift(self):
-        beam_shift_x = self.doubleSpinBox_beam_shift_x.value() * 1e-6
-        beam_shift_y = self.doubleSpinBox_beam_shift_y.value() * 1e-6
-        self.microscope.set_beam_shift(beam_shift_x=beam_shift_x,
-                                       beam_shift_y=beam_shift_y)
-
-    def reset_beam_shift(self):
-        self.microscope.reset_beam_shifts()
-
-    ##########################################################################################
-
-    def select_directory(self):
-        directory = QFileDialog.getExistingDirectory(self, caption='Select a folder')
-        print(directory)
-        self.label_messages.setText(directory)
-        self.DIR = directory
-
-    # def update_image(self, quadrant, image, update_current_image=True):
-    #     if update_current_image:
-    #         self.data_in_quadrant[quadrant] = image
-    #     image_to_display = qimage2ndarray.array2qimage(image.copy())
-    #     if quadrant in range(0, 4):
-    #         self.label_image_frames[quadrant].setPixmap(QtGui.QPixmap(image_to_display))
-
-
-    # TODO fix pop-up plot bugs
-    def initialise_image_frames(self):
-        self.figure_SEM = plt.figure(10)
-        plt.axis("off")
-        plt.tight_layout()
-        plt.subplots_adjust(left=0.0, right=1.0, top=1.0, bottom=0.01)
-        self.canvas_SEM = _FigureCanvas(self.figure_SEM)
-        self.toolbar_SEM = _NavigationToolbar(self.canvas_SEM, self)
-        #
-        self.label_image_frame1.setLayout(QtWidgets.QVBoxLayout())
-        self.label_image_frame1.layout().addWidget(self.toolbar_SEM)
-        self.label_image_frame1.layout().addWidget(self.canvas_SEM)
-
-
-    """TODO fix bugs with plotting data and using pop-up plots"""
-    def update_display(self, image):
-        self.current_image = image
-        try:
-            image = image.data
-        except:
-            image = image
-
-        self.figure_SEM.clear()
-        self.figure_SEM.patch.set_facecolor(
-            (240 / 255, 240 / 255, 240 / 255))
-        self.ax = self.figure_SEM.add_subplot(111)
-        # ax.set_title("test")
-
-        self.ax.get_xaxis().set_visible(False)
-        self.ax.get_yaxis().set_visible(False)
-        self.ax.imshow(image, cmap='gray')
-        self.canvas_SEM.draw()
-
-
-
-    def collect_stack(self):
-        """ Update all the settings, store the current microscope state and
-            particularly the current position. After the stack acquisition
-            it is possible to return to the original position using move_absolute
-            stored state: self.microscope.stored_state : MicroscopeState
-            stack setting are stored in self.stack_settings : StackSettings
-        """
-        all_settings = self.create_settings_dict()
-        timestamp = utils.current_timestamp()
-        sample_name = self.plainTextEdit_sample_name.toPlainText()
-
-        HFW_and_selections = self._get_all_the_HFW_to_use()
-        print(HFW_and_selections)
-
-        self.pushButton_acquire.setEnabled(False)
-        self.pushButton_collect_stack.setEnabled(False)
-        self.pushButton_abort_stack_collection.setEnabled(True)
-
-        """Store the current microscope state, including the current position"""
-        stored_microscope_state = self.microscope._get_current_microscope_state()
-        # x0 = stored_microscope_state.x
-
-        """Create directory for saving the stack"""
-        if self.DIR is not None:
-            self.stack_dir = self.DIR
-        else:
-            self.stack_dir = os.getcwd()
-        # if self.DIR:
-        #     self.stack_dir = os.path.join(self.DIR, 'stack_' + sample_name + '_' + timestamp)
-        # else:
-        #     self.stack_dir = os.path.join(os.getcwd(), 'stack_' + sample_name + '_' + timestamp)
-        # if not os.path.isdir(self.stack_dir):
-        #     os.mkdir(self.stack_dir)
-
-        self.label_messages.setText(f"stack save dir {self.stack_dir}")
-
-        keys = ('x', 'y', 'z', 't', 'r',
-                'horizontal_field_width', 'scan_rotation_angle',
-                'brightness', 'contrast',
-                'beam_shift_x', 'beam_shift_y')
-        self.experiment_data = {element: [] for element in keys}
-        """add other data keys"""
-        self.experiment_data['file_name'] = []
-        self.experiment_data['timestamp'] = []
-
-
-        def _run_loop(all_settings):
-            counter = 0
-            for hfw_and_status in HFW_and_selections:
-                hfw = hfw_and_status[0]
-                status = hfw_and_status[1]
-                magnification = hfw_and_status[2]
-                print(hfw_and_status, hfw, status, magnification)
-
-                if status==True:
-
-                    self.microscope._get_current_microscope_state()
-
-                    # if not both q1 and q2 selected, then grab image only from a SIGNLE selected quadrant
-                    if not (self.checkBox_q1.isChecked() and self.checkBox_q2.isChecked()):
-                        timestamp = utils.current_timestamp()
-                        self.spinBox_horizontal_field_width.setValue(hfw)
-
-                        file_name = '%06d_' % counter + sample_name + '_' + \
-                                    str(hfw) + '_' +  timestamp + '.tif'
-
-                        """ This is a high-level procedure to acquire an image using the settings from the GUI """
-                        image = self.acquire_image(hfw=hfw*1e-6)
-
-                        utils.save_image(image, path=self.stack_dir, file_name=file_name)
-
-                        self.experiment_data = utils.populate_experiment_data_frame(
-                            data_frame=self.experiment_data,
-                            microscope_state=self.microscope.microscope_state,
-                            file_name=file_name,
-                            timestamp=utils.current_timestamp(),
-                            keys=keys)
-
-                    # if  both q1 and q2 ARE selected, then grab multiframe image
-                    elif  (self.checkBox_q1.isChecked() and self.checkBox_q2.isChecked()):
-                        timestamp = utils.current_timestamp()
-                        self.spinBox_horizontal_field_width.setValue(hfw)
-
-                        """ This is a high-level procedure to acquire an image using the settings from the GUI """
-                        images = self.acquire_multiple_frames(hfw=hfw * 1e-6)
-
-                        for ii in range(len(images)):
-                            file_name = '%06d_' % counter + sample_name + '_' + \
-                                           str(hfw) + '_' + str(ii) + '_' + timestamp + '.tif'
-                            utils.save_image(images[ii], path=self.stack_dir, file_name=file_name)
-
-                            self.experiment_data = utils.populate_experiment_data_frame(
-                                data_frame=self.experiment_data,
-                                microscope_state=self.microscope.microscope_state,
-                                file_name=file_name,
-                                timestamp=utils.current_timestamp(),
-                                keys=keys)
-
-                    counter += 1
-
-                self.repaint()  # update the GUI to show the progress
-                QtWidgets.QApplication.processEvents()
-
-                if self._abort_clicked_status == True:
-                    print('Abort clicked')
-                    self._abort_clicked_status = False  # reinitialise back to False
-                    return
-
-        _run_loop(all_settings)
-        self.pushButton_acquire.setEnabled(True)
-        self.pushButton_collect_stack.setEnabled(True)
-        self.pushButton_abort_stack_collection.setEnabled(False)
-
-        print('End of long scan, returning to the stored microscope state', stored_microscope_state)
-        utils.save_data_frame(data_frame=self.experiment_data,
-                              path=self.stack_dir,
-                              file_name='summary')
-        #self.microscope._restore_microscope_state(state=stored_microscope_state)
-
-
-    def _abort_clicked(self):
-        print('------------ abort clicked --------------')
-        self.pushButton_abort_stack_collection.setEnabled(False)
-        self._abort_clicked_status = True
-
-
-    def _open_file(self):
-        options = QFileDialog.Options()
-        options |= QFileDialog.DontUseNativeDialog
-        file_name, _ = QFileDialog.getOpenFileName(self,
-                                                   "QFileDialog.getOpenFileName()",
-                                                   "", "TIF files (*.tif);;TIFF files (*.tiff);;All Files (*)",
-                                                   options=options)
-        if file_name:
-            print(file_name)
-            if file_name.lower().endswith('.tif') or file_name.lower().endswith('.tiff'):
-                self.image = utils.load_image(file_name)
-                self.update_display(image=self.image)
-
-            # other file format, not tiff, for example numpy array data, or txt format
-            else:
-                try:
-                    self.image = np.loadtxt(file_name)
-                    self.update_image(image=self.image)
-                except:
-                    self.label_messages.setText('File or mode not supported')
-
-
-    def _save_SEM_image(self):
-        if self.current_image is not None:
-            utils.save_image(self.current_image)
-
-
-    def _apply_clahe(self):
-        if self.image is not None:
-            clipLimit = int(self.spinBox_clip_limit.value())
-            tileGridSize = int(self.spinBox_tile_grid_size.value())
-            self.image_mod = utils.enhance_contrast(self.image,
-                                                    clipLimit=clipLimit,
-                                                    tileGridSize=tileGridSize)
-            self.update_display(self.image_mod)
-
-
-    def _restore_image(self):
-        if self.image is not None:
-            self.update_display(self.image)
-
-
-    def _get_all_the_HFW_to_use(self):
-        selected_hfw = []
-        ##################################################################################################
-        field_widths = [attr for attr in dir(self) if not callable(getattr(self, attr)) and attr.startswith("doubleSpinBox_hfw")]
-        self.field_widths = ['self.'+ii for ii in field_widths]
-        print(self.field_widths)
-        ##################################################################################################
-        clicked = [attr for attr in dir(self) if not callable(getattr(self, attr)) and attr.startswith("checkBox_hfw")]
-        self.clicked = ['self.'+ii for ii in clicked]
-        print(self.clicked)
-        ##################################################################################################
-        magnifications = [attr for attr in dir(self) if
-                          not callable(getattr(self, attr)) and attr.startswith("label_hfw")]
-        self.magnifications = ['self.' + ii for ii in magnifications]
-        ##################################################################################################
-        for ii in range(len(self.field_widths)):
-            print( eval( self.field_widths[ii] + '.value()' ),
-                   ' - ',
-                   eval( self.clicked[ii] + '.isChecked()' ),
-                   ' - ',
-                   eval( self.magnifications[ii] + '.text()' ) )
-            selected_hfw.append( [eval(self.field_widths[ii] + '.value()'),
-                                  eval(self.clicked[ii] + '.isChecked()'),
-                                  eval(self.magnifications[ii] + '.text()')
-                                 ]
-                                )
-        return selected_hfw
-
-    def disconnect(self):
-        # logging.info("Running cleanup/teardown")
-        # logging.debug("Running cleanup/teardown")
-        print('closing down, cleaning...')
-        if self.microscope:
-            self.microscope.disconnect()
-
-
-
-
-
-def main(demo):
-    app = QtWidgets.QApplication([])
-    qt_app = GUIMainWindow(demo)
-    app.aboutToQuit.connect(qt_app.disconnect)  # cleanup & teardown
-    qt_app.show()
-    sys.exit(app.exec_())
-
-
-if __name__ == '__main__':
-    main(demo=False)
-
+import qtdesigner_files.main_gui as gui_main
+from PyQt5 import QtWidgets, QtGui, QtCore
+from PyQt5.QtCore import QObject, QThread, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QFileDialog
+import qimage2ndarray
+
+from importlib import reload  # Python 3.4+
+from dataclasses import dataclass
+import dataclasses
+
+import sys, time, os, glob, re
+import threading
+import numpy as np
+import SEM
+
+
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as _FigureCanvas
+from matplotlib.backends.backend_qt5agg import (
+    NavigationToolbar2QT as _NavigationToolbar,
+)
+
+import utils
+from utils import BeamType
+
+
+class LiveViewWorker(QObject):
+    """Grabs frames continuously on a background thread.
+    Only the newest frame is kept: if the display has not taken the previous frame yet,
+    it is replaced (dropped) and no new signal is queued, so a slow display never
+    builds up a backlog.
+    """
+    frame_ready = pyqtSignal()
+    finished = pyqtSignal()
+
+    def __init__(self, microscope, resolution='768x512', dwell_time=0.3e-6,
+                 quadrant=1, follow_microscope=False):
+        super(LiveViewWorker, self).__init__()
+        self.microscope = microscope
+        self.resolution = resolution
+        self.dwell_time = dwell_time
+        self.quadrant = quadrant
+        self.follow_microscope = follow_microscope
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._latest = None
+        self._running = True
+        self._paused = False
+        self._idle = threading.Event()
+
+    def run(self):
+        while self._running:
+            if self._paused:
+                self._idle.set()
+                time.sleep(0.05)
+                continue
+            self._idle.clear()
+            try:
+                frame = self.microscope.grab_live_frame(resolution=self.resolution,
+                                                        dwell_time=self.dwell_time,
+                                                        quadrant=self.quadrant,
+                                                        follow_microscope=self.follow_microscope)
+            except Exception as e:
+                print(f'live view: could not grab a frame, error {e}')
+                time.sleep(0.5)
+                continue
+            with self._lock:
+                notify = self._latest is None
+                if not notify:
+                    self.dropped += 1
+                self._latest = (frame, time.time())
+            if notify:
+                self.frame_ready.emit()
+        self._idle.set()
+        self.finished.emit()
+
+    def take_frame(self):
+        """Newest (frame, acquisition time) or None"""
+        with self._lock:
+            latest, self._latest = self._latest, None
+        return latest
+
+    def pause(self, timeout=5.0):
+        """Stop grabbing and wait until the frame in flight is finished"""
+        self._paused = True
+        self._idle.wait(timeout)
+
+    def resume(self):
+        self._paused = False
+
+    def stop(self):
+        self._running = False
+
+
+class StatePollWorker(QObject):
+    """Polls the stage position and beam state on a background thread.
+    A single-shot QTimer is restarted only after the previous read has returned, so at
+    most one request is in flight and a slow server is never asked more often than
+    every `interval` seconds. As in LiveViewWorker only the newest state is kept.
+    """
+    state_ready = pyqtSignal()
+    stop_requested = pyqtSignal()
+
+    def __init__(self, microscope, interval=1.0):
+        super(StatePollWorker, self).__init__()
+        self.microscope = microscope
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._latest = None
+        self._running = True
+        self._paused = False
+        """held while a read is in flight, pause() waits for it"""
+        self._reading = threading.Lock()
+        self._last_error = None
+        self._timer = None
+        self.stop_requested.connect(self._shutdown)
+
+    def start(self):
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.poll)
+        self.poll()
+
+    def poll(self):
+        if not self._running:
+            return
+        state = None
+        with self._reading:
+            if not self._paused:
+                try:
+                    state = self.microscope.read_state()
+                    self._last_error = None
+                except Exception as e:
+                    if str(e) != self._last_error:
+                        print(f'state polling: could not read the microscope state, error {e}')
+                    self._last_error = str(e)
+        if state is not None:
+            with self._lock:
+                notify = self._latest is None
+                self._latest = state
+            if notify:
+                self.state_ready.emit()
+        if self._running:
+            self._timer.start(int(self.interval * 1000))
+
+    def take_state(self):
+        """Newest MicroscopeState or None"""
+        with self._lock:
+            latest, self._latest = self._latest, None
+        return latest
+
+    def pause(self, timeout=5.0):
+        """Skip the reads and wait until the read in flight is finished"""
+        self._paused = True
+        if self._reading.acquire(timeout=timeout):
+            self._reading.release()
+
+    def resume(self):
+        self._paused = False
+
+    def stop(self):
+        """Stop polling, the timer is stopped and the thread quits from its own event loop"""
+        self._running = False
+        self.stop_requested.emit()
+
+    @QtCore.pyqtSlot()
+    def _shutdown(self):
+        """a decorated slot runs in the thread of the worker, which owns the timer"""
+        if self._timer is not None:
+            self._timer.stop()
+        self.thread().quit()
+
+
+def _budgeted_frame(name):
+    """GUIMainWindow frame attribute held in self.frame_budget, spilled frames are
+    reloaded when the attribute is read"""
+    return property(lambda self: self.frame_budget.get(name),
+                    lambda self, value: self.frame_budget.set(name, value))
+
+
+class GUIMainWindow(gui_main.Ui_MainWindow, QtWidgets.QMainWindow):
+    """polled MicroscopeState attribute, spin box, scale from SI units to the spin box units"""
+    POLLED_STATE = (('x', 'doubleSpinBox_stage_x', 1e6),
+                    ('y', 'doubleSpinBox_stage_y', 1e6),
+                    ('z', 'doubleSpinBox_stage_z', 1e6),
+                    ('r', 'doubleSpinBox_stage_r', 180 / np.pi),
+                    ('t', 'doubleSpinBox_stage_t', 180 / np.pi),
+                    ('working_distance', 'doubleSpinBox_working_distance', 1e3),
+                    ('hv', 'doubleSpinBox_high_voltage', 1),
+                    ('beam_current', 'doubleSpinBox_beam_current', 1e9),
+                    ('brightness', 'doubleSpinBox_brightness', 1),
+                    ('contrast', 'doubleSpinBox_contrast', 1),
+                    ('horizontal_field_width', 'spinBox_horizontal_field_width', 1e6))
+    """RAM for the frames kept by the window, older ones are spilled to disk beyond it"""
+    FRAME_BUDGET = 2 << 30
+    image = _budgeted_frame('image')
+    image_mod = _budgeted_frame('image_mod')
+    current_image = _budgeted_frame('current_image')
+    images = _budgeted_frame('images')
+
+    def __init__(self, demo):
+        super(GUIMainWindow, self).__init__()
+        self.setupUi(self)
+        self.demo = demo
+        self.frame_budget = utils.FrameBudget(max_bytes=self.FRAME_BUDGET, pool=utils.buffer_pool)
+        self.time_counter = 0
+        print('mode demo is ', demo)
+        self.setStyleSheet("""QPushButton {
+        border: 1px solid lightgray;
+        border-radius: 5px;
+        background-color: #e3e3e3;
+        }""")
+
+        self.DIR = os.getcwd()
+        self.stack_time_estimator = utils.StackTimeEstimator()
+
+        self.setup_connections()
+        self.initialise_image_frames()
+        self.initialise_hardware()
+
+        self._abort_clicked_status = False
+        self._blanked = False
+
+        self.image = None
+        self.image_mod = None
+        self.current_image = None
+        self.power_spectrum = utils.PowerSpectrum()
+        self.intensity_histogram = utils.IntensityHistogram()
+        self.live_thread = None
+        self.live_worker = None
+        self.poll_thread = None
+        self.poll_worker = None
+        """stopped pollers and live views whose last read or grab may still be in flight,
+        kept until their thread has finished: a QThread must not be destroyed while it runs"""
+        self._stopped_workers = []
+        self._polled_values = {}
+        self.sites = []
+
+        self._get_all_the_HFW_to_use()
+        self.update_stack_plan()
+
+        try:
+            self.initialise_hardware()
+        except Exception as e:
+            print(f'Could not initialise the microscope, Error {e}')
+            self.label_messages.setText('Could not initialise the microscope: ' + str(e))
+
+        """interrupted stacks are offered for resuming once the window is up"""
+        QTimer.singleShot(0, self.offer_resume)
+
+
+    def setup_connections(self):
+        self.pushButton_acquire.clicked.connect(lambda: self.acquire_image())
+        self.pushButton_select_directory.clicked.connect(lambda: self.select_directory())
+        self.pushButton_initialise_microscope.clicked.connect(lambda: self.initialise_hardware())
+        self.pushButton_last_image.clicked.connect(lambda: self.last_image())
+        self.pushButton_update_stage_position.clicked.connect(lambda: self.update_stage_position())
+        self.pushButton_move_stage.clicked.connect(lambda: self.move_stage())
+        self.pushButton_abort_stack_collection.clicked.connect(lambda: self._abort_clicked())
+        self.pushButton_collect_stack.clicked.connect(lambda: self.collect_stack())
+        self.pushButton_update_SEM_state.clicked.connect(lambda: self.update_SEM_state())
+        #
+        self.pushButton_save_file.clicked.connect(lambda: self._save_SEM_image())
+        #
+        self.pushButton_open_file.clicked.connect(lambda: self._open_file())
+        self.pushButton_apply_clahe.clicked.connect(lambda: self._apply_clahe())
+        self.pushButton_restore.clicked.connect(lambda: self._restore_image())
+        self.pushButton_live_view.clicked.connect(lambda: self.toggle_live_view())
+        self.checkBox_poll_state.stateChanged.connect(lambda: self.toggle_state_polling())
+        self.doubleSpinBox_poll_interval.valueChanged.connect(lambda: self._set_poll_interval())
+        self.pushButton_add_site.clicked.connect(lambda: self.add_site())
+        self.pushButton_clear_sites.clicked.connect(lambda: self.clear_sites())
+        self.pushButton_collect_sites.clicked.connect(lambda: self.collect_sites())
+        """the stack plan follows every setting it depends on"""
+        for number in range(1, 13):
+            getattr(self, 'checkBox_hfw_%02d' % number).stateChanged.connect(lambda: self.update_stack_plan())
+        for widget in (self.checkBox_autocontrast, self.checkBox_autofocus, self.checkBox_adaptive_dwell,
+                       self.checkBox_q1, self.checkBox_q2):
+            widget.stateChanged.connect(lambda: self.update_stack_plan())
+        for widget in (self.spinBox_dwell_time, self.spinBox_frame_integration, self.spinBox_average):
+            widget.valueChanged.connect(lambda: self.update_stack_plan())
+        for widget in (self.comboBox_resolution, self.comboBox_bit_depth):
+            widget.currentIndexChanged.connect(lambda: self.update_stack_plan())
+        self.pushButton_collect_mosaic.clicked.connect(lambda: self.collect_mosaic())
+        self.pushButton_abort_mosaic.clicked.connect(lambda: self._abort_clicked())
+        self.pushButton_calibrate_beam_shift.clicked.connect(lambda: self.calibrate_beam_shift())
+        self.pushButton_collect_rotation_series.clicked.connect(lambda: self.collect_rotation_series())
+        self.pushButton_abort_rotation_series.clicked.connect(lambda: self._abort_clicked())
+
+
+
+
+    def create_settings_dict(self) -> dict:
+        resolution = self.comboBox_resolution.currentText()
+        dwell_time = self.spinBox_dwell_time.value() * 1e-6
+        horizontal_field_width = self.spinBox_horizontal_field_width.value() * 1e-6
+        autocontrast = self.checkBox_autocontrast.isChecked()
+        beam_type = self.comboBox_beam_type.currentText()
+        if beam_type == "ELECTRON":
+            beam_type = BeamType.ELECTRON
+        elif beam_type == "ION":
+            beam_type = BeamType.ION
+        else:
+            beam_type = BeamType.ELECTRON
+
+        quadrant = int(self.comboBox_quadrant.currentText())
+        q1 = self.checkBox_q1.isChecked()
+        q2 = self.checkBox_q2.isChecked()
+
+        path = self.DIR
+        sample_name = self.plainTextEdit_sample_name.toPlainText()
+        bit_depth = int(self.comboBox_bit_depth.currentText())
+        drift_correction = self.checkBox_drift_correction.isChecked()
+        drift_tracking = self.checkBox_drift_tracking.isChecked()
+        autofocus = self.checkBox_autofocus.isChecked()
+        zoom_overlay = self.checkBox_zoom_overlay.isChecked()
+        frame_integration = self.spinBox_frame_integration.value()
+        average = self.spinBox_average.value()
+        average_registration = self.checkBox_average_registration.isChecked()
+        adaptive_dwell = self.checkBox_adaptive_dwell.isChecked()
+        target_snr = self.doubleSpinBox_target_snr.value()
+
+        self.all_settings = {
+            "imaging": {
+                "resolution": resolution,
+                "horizontal_field_width": horizontal_field_width,
+                "dwell_time": dwell_time,
+                "autocontrast": autocontrast,
+                "beam_type": beam_type,
+                "quadrant": quadrant,
+                "path": path,
+                "sample_name": sample_name,
+                "bit_depth": bit_depth,
+                "drift_correction" : drift_correction,
+                "drift_tracking" : drift_tracking,
+                "autofocus" : autofocus,
+                "zoom_overlay" : zoom_overlay,
+                'frame_integration' : frame_integration,
+                'average' : average,
+                'average_registration' : average_registration,
+                'adaptive_dwell' : adaptive_dwell,
+                'target_snr' : target_snr,
+                'q1' : q1,
+                'q2' : q2
+            }
+        }
+        return self.all_settings
+
+    ##############################################  HARDWARE ###########################################################
+
+    def initialise_hardware(self):
+        all_settings = self.create_settings_dict()
+        self.microscope = SEM.Microscope(settings=all_settings, log_path=None, demo=self.demo)
+        self.microscope.establish_connection()
+        self.label_messages.setText(str(self.microscope.microscope_state))
+        self.show_connection_stats()
+        """the background workers follow the new connection"""
+        for worker in (getattr(self, 'live_worker', None), getattr(self, 'poll_worker', None)):
+            if worker is not None:
+                worker.microscope = self.microscope
+
+
+
+    def acquire_image(self,
+                      hfw = None,
+                      dwell_time = None,
+                      all_settings : dict = None):
+        live_view_was_running = self.pause_live_view()
+        polling_was_running = self.pause_state_polling()
+        try:
+            if all_settings is None:
+                all_settings = self.create_settings_dict()
+            all_settings = dict(all_settings, imaging=dict(all_settings["imaging"]))
+            if hfw is not None:
+                all_settings["imaging"]["horizontal_field_width"] = hfw
+            if dwell_time is not None:
+                all_settings["imaging"]["dwell_time"] = dwell_time
+
+            if all_settings["imaging"]["average"] > 1:
+                """software frame integration, the running average is shown after every frame"""
+                def _preview(image, frame_number):
+                    self.label_messages.setText(f'averaging frame {frame_number}')
+                    self.update_display(image=image)
+                    QtWidgets.QApplication.processEvents()
+
+                self.image = \
+                    self.microscope.acquire_averaged_image(all_settings=all_settings,
+                                                           hfw=hfw,
+                                                           n_frames=all_settings["imaging"]["average"],
+                                                           register=all_settings["imaging"]["average_registration"],
+                                                           preview=_preview)
+            else:
+                self.image = \
+                    self.microscope.acquire_image(all_settings=all_settings,
+                                                  hfw=hfw)
+            self.pixelsize_x = self._pixel_size(self.image)
+
+            self.doubleSpinBox_pixel_size.setValue(self.pixelsize_x / 1e-9)
+            self.update_display(image=self.image)
+        finally:
+            self.resume_state_polling(polling_was_running)
+            self.resume_live_view(live_view_was_running)
+        return self.image
+
+
+    def acquire_multiple_frames(self,
+                                hfw = None,
+                                dwell_time = None,
+                                all_settings : dict = None):
+        live_view_was_running = self.pause_live_view()
+        polling_was_running = self.pause_state_polling()
+        try:
+            if all_settings is None:
+                all_settings = self.create_settings_dict()
+            all_settings = dict(all_settings, imaging=dict(all_settings["imaging"]))
+            if hfw is not None:
+                all_settings["imaging"]["horizontal_field_width"] = hfw
+            if dwell_time is not None:
+                all_settings["imaging"]["dwell_time"] = dwell_time
+
+            self.images = \
+                self.microscope.acquire_multiple_frames(all_settings=all_settings,
+                                                        hfw=hfw)
+            self.pixelsize_x = self._pixel_size(self.images[0])
+
+            self.doubleSpinBox_pixel_size.setValue(self.pixelsize_x / 1e-9)
+            self.update_display(image=self.images[0])
+        finally:
+            self.resume_state_polling(polling_was_running)
+            self.resume_live_view(live_view_was_running)
+        return self.images
+
+
+    def _pixel_size(self, image) -> float:
+        pixel_size = utils.Frame.from_image(image).pixel_size
+        if pixel_size is None:
+            print('Cannot extract pixel size from the image metadata')
+            return 1
+        return pixel_size
+
+
+    def last_image(self):
+        quadrant = int(self.comboBox_quadrant.currentText())
+        polling_was_running = self.pause_state_polling()
+        try:
+            self.image = \
+                self.microscope.last_image(quadrant=quadrant)
+        finally:
+            self.resume_state_polling(polling_was_running)
+        self.update_display(image=self.image)
+
+
+    def update_stage_position(self):
+        self.comboBox_move_type.setCurrentText("Absolute")
+        self.microscope.update_stage_position()
+        self.doubleSpinBox_stage_x.setValue(self.microscope.microscope_state.x / 1e-6)
+        self.doubleSpinBox_stage_y.setValue(self.microscope.microscope_state.y / 1e-6)
+        self.doubleSpinBox_stage_z.setValue(self.microscope.microscope_state.z / 1e-6)
+        r = np.rad2deg(self.microscope.microscope_state.r)
+        self.doubleSpinBox_stage_r.setValue(r)
+        t = np.rad2deg(self.microscope.microscope_state.t)
+        self.doubleSpinBox_stage_t.setValue(t)
+
+
+    def update_SEM_state(self):
+        self.microscope._get_current_microscope_state()
+        self.update_stage_position()
+        self.doubleSpinBox_working_distance.setValue(self.microscope.microscope_state.working_distance / 1e-3)
+
+        self.doubleSpinBox_high_voltage.setValue(self.microscope.microscope_state.hv)
+        self.doubleSpinBox_beam_current.setValue(self.microscope.microscope_state.beam_current / 1e-9)
+        self.doubleSpinBox_brightness.setValue(self.microscope.microscope_state.brightness)
+        self.doubleSpinBox_contrast.setValue(self.microscope.microscope_state.contrast)
+
+        self.spinBox_horizontal_field_width.setValue(
+            self.microscope.microscope_state.horizontal_field_width / 1e-6 )
+        self.doubleSpinBox_scan_rotation.setValue(
+            np.rad2deg(self.microscope.microscope_state.scan_rotation_angle)
+        )
+        self.doubleSpinBox_beam_shift_x.setValue(self.microscope.microscope_state.beam_shift_x / 1e-6)
+        self.doubleSpinBox_beam_shift_y.setValue(self.microscope.microscope_state.beam_shift_y / 1e-6)
+
+
+
+    def move_stage(self):
+        """Move with the stage spin boxes: x, y, z in um and r, t in deg,
+        absolute or relative as selected in comboBox_move_type"""
+        self.microscope.move_stage(x=self.doubleSpinBox_stage_x.value() * 1e-6,
+                                   y=self.doubleSpinBox_stage_y.value() * 1e-6,
+                                   z=self.doubleSpinBox_stage_z.value() * 1e-6,
+                                   r=np.deg2rad(self.doubleSpinBox_stage_r.value()),
+                                   t=np.deg2rad(self.doubleSpinBox_stage_t.value()),
+                                   move_type=self.comboBox_move_type.currentText(),
+                                   compucentric=self.checkBox_compucentric.isChecked())
+
+
+    def set_scan_rotation(self):
+        rotation_angle = self.doubleSpinBox_scan_rotation.value()
+        rotation_angle = np.deg2rad(rotation_angle)
+        self.microscope.set_scan_rotation(rotation_angle=rotation_angle)
+
+
+    def set_beam_shift(self):
+        beam_shift_x = self.doubleSpinBox_beam_shift_x.value() * 1e-6
+        beam_shift_y = self.doubleSpinBox_beam_shift_y.value() * 1e-6
+        self.microscope.set_beam_shift(beam_shift_x=beam_shift_x,
+                                       beam_shift_y=beam_shift_y)
+
+    def reset_beam_shift(self):
+        self.microscope.reset_beam_shifts()
+
+    ##############################################  SITES ##############################################################
+
+    def add_site(self):
+        """Queue the current stage position with the HFW series selected in the GUI"""
+        (x, y, z, t, r) = self.microscope.update_stage_position()
+        HFW_and_selections = [list(hfw) for hfw in self._get_all_the_HFW_to_use()]
+        site = utils.Site(x=x, y=y, z=z, r=r, t=t,
+                          hfw_and_selections=HFW_and_selections,
+                          name='site%02d' % (len(self.sites) + 1))
+        self.sites.append(site)
+        n_levels = sum(1 for hfw in HFW_and_selections if hfw[1])
+        self.listWidget_sites.addItem(f'{site.name}: x {x / 1e-6:.1f}, y {y / 1e-6:.1f} um, '
+                                      f'r {np.rad2deg(r):.1f}, t {np.rad2deg(t):.1f} deg, '
+                                      f'{n_levels} HFW')
+        self._plan_sites()
+
+
+    def clear_sites(self):
+        self.sites = []
+        self.listWidget_sites.clear()
+        self.label_sites_plan.setText('')
+
+
+    def _plan_sites(self) -> list:
+        """Visiting order from the current stage position, shortest estimated travel"""
+        start = self.microscope.microscope_state
+        start = [start.x, start.y, start.z, start.r, start.t]
+        positions = [site.get_stage_position() for site in self.sites]
+        order, travel_time = utils.plan_site_order(positions, start=start)
+        queued_time = utils.route_length(
+            list(range(len(positions) + 1)),
+            utils.stage_travel_times([start] + positions)) if positions else 0.0
+        self.label_sites_plan.setText(f'{len(self.sites)} sites, stage travel ~{travel_time:.0f} s '
+                                      f'(~{queued_time:.0f} s in the queued order)')
+        return order
+
+
+    def collect_sites(self):
+        """Visit the queued sites in the planned order and collect the HFW series of each"""
+        if not self.sites:
+            self.label_messages.setText('no sites queued, add the stage positions first')
+            return
+        self.microscope.update_stage_position()
+        order = self._plan_sites()
+        for number, index in enumerate(order):
+            site = self.sites[index]
+            self.label_messages.setText(f'site {number + 1}/{len(order)}: moving to {site.name}')
+            QtWidgets.QApplication.processEvents()
+            self.microscope.move_stage(x=site.x, y=site.y, z=site.z, r=site.r, t=site.t,
+                                       move_type="Absolute",
+                                       compucentric=self.checkBox_compucentric.isChecked())
+            aborted = self.collect_stack(HFW_and_selections=site.hfw_and_selections,
+                                         site_name='_' + site.name)
+            if aborted:
+                self.label_messages.setText(f'aborted at site {number + 1}/{len(order)}')
+                return
+        self.label_messages.setText(f'{len(order)} sites collected')
+
+    ##############################################  ROTATION SERIES ####################################################
+
+    def collect_rotation_series(self):
+        """Frames at the listed scan rotations, de-rotated to the first angle"""
+        try:
+            angles = [float(angle) for angle in
+                      re.split(r'[,;\s]+', self.lineEdit_rotation_angles.text().strip()) if angle]
+        except ValueError:
+            self.label_rotation_status.setText('angles must be numbers in degrees, e.g. 0, 15, 30')
+            return
+        if not angles:
+            return
+        live_view_was_running = self.pause_live_view()
+        polling_was_running = self.pause_state_polling()
+        self._abort_clicked_status = False
+        self.pushButton_collect_rotation_series.setEnabled(False)
+        self.pushButton_abort_stack_collection.setEnabled(True)
+        sample_name = self.plainTextEdit_sample_name.toPlainText()
+
+        def _preview(image, angle):
+            self.update_display(image)
+            self.label_rotation_status.setText(f'{angle:g} deg')
+            QtWidgets.QApplication.processEvents()
+
+        try:
+            summary = self.microscope.acquire_rotation_series(
+                self.create_settings_dict(), angles,
+                hfw=self.spinBox_horizontal_field_width.value() * 1e-6,
+                path=self.DIR, sample_name=sample_name,
+                preview=_preview, abort=lambda: self._abort_clicked_status)
+            self.label_rotation_status.setText(f'summary saved to {summary}' if summary
+                                               else 'aborted, no frames')
+        except Exception as e:
+            print(f'Could not collect the rotation series, error {e}')
+            self.label_rotation_status.setText(f'rotation series failed: {e}')
+        self._abort_clicked_status = False
+        self.pushButton_collect_rotation_series.setEnabled(True)
+        self.resume_state_polling(polling_was_running)
+        self.resume_live_view(live_view_was_running)
+
+    ##############################################  BEAM SHIFT #########################################################
+
+    def calibrate_beam_shift(self):
+        """Measure the beam shift mapping at the current HFW and scan rotation"""
+        live_view_was_running = self.pause_live_view()
+        polling_was_running = self.pause_state_polling()
+        try:
+            hfw = self.spinBox_horizontal_field_width.value() * 1e-6
+            self.microscope.set_horizontal_field_width(hfw)
+            matrix = self.microscope.calibrate_beam_shift(self.create_settings_dict(), hfw=hfw)
+            if matrix is None:
+                self.label_beam_shift_calibration.setText('calibration failed, see the log')
+            else:
+                self.label_beam_shift_calibration.setText(
+                    f'calibrated at HFW {hfw / 1e-6:g} um, rotation '
+                    f'{np.rad2deg(self.microscope.microscope_state.scan_rotation_angle):.1f} deg')
+        finally:
+            self.resume_state_polling(polling_was_running)
+            self.resume_live_view(live_view_was_running)
+
+
+    def _canvas_clicked(self, event):
+        """Double-click on the image centres the field of view on that point,
+        unless the toolbar is zooming or panning"""
+        if not (self.checkBox_click_to_centre.isChecked() and event.dblclick) or \
+                event.inaxes is None or self.toolbar_SEM.mode or self._image_shape is None:
+            return
+        """the HFW of the frame on screen, the spin box may have changed since; arrays
+        without one (live view, processed images) use the spin box"""
+        hfw = getattr(self.current_image, 'horizontal_field_width', None)
+        if not hfw:
+            hfw = self.spinBox_horizontal_field_width.value() * 1e-6
+        polling_was_running = self.pause_state_polling()
+        try:
+            moved_by = self.microscope.centre_on(event.xdata, event.ydata, self._image_shape, hfw=hfw)
+        finally:
+            self.resume_state_polling(polling_was_running)
+        self.label_messages.setText(f'centred with the {"beam shift" if moved_by == "beam" else "stage"}')
+
+    ##############################################  MOSAIC #############################################################
+
+    def collect_mosaic(self):
+        """Tile grid around the current field of view at the current HFW, stitched while acquiring"""
+        live_view_was_running = self.pause_live_view()
+        polling_was_running = self.pause_state_polling()
+        self._abort_clicked_status = False
+        self.pushButton_collect_mosaic.setEnabled(False)
+        self.pushButton_abort_stack_collection.setEnabled(True)
+        n_rows, n_cols = self.spinBox_mosaic_rows.value(), self.spinBox_mosaic_columns.value()
+        file_name = 'mosaic_' + self.plainTextEdit_sample_name.toPlainText() + '_' + \
+                    utils.current_timestamp()
+
+        tiles_done = []
+        def _preview(image, row, col):
+            tiles_done.append((row, col))
+            self.update_display(image)
+            self.label_mosaic_status.setText(f'tile {len(tiles_done)}/{n_rows * n_cols} '
+                                             f'(row {row}, column {col})')
+            QtWidgets.QApplication.processEvents()
+
+        try:
+            metadata = self.microscope.acquire_mosaic(
+                self.create_settings_dict(), n_rows=n_rows, n_cols=n_cols,
+                overlap=self.doubleSpinBox_mosaic_overlap.value() / 100,
+                hfw=self.spinBox_horizontal_field_width.value() * 1e-6,
+                mode='beam' if self.comboBox_mosaic_mode.currentText() == 'Beam shift' else 'stage',
+                path=self.DIR, file_name=file_name,
+                preview=_preview, abort=lambda: self._abort_clicked_status)
+            if metadata:
+                height, width = metadata['shape']
+                self.label_mosaic_status.setText(f'{file_name}: {width}x{height} px, '
+                                                 f'{len(metadata["levels"])} levels')
+            else:
+                self.label_mosaic_status.setText('aborted, no tiles')
+        except Exception as e:
+            print(f'Could not collect the mosaic, error {e}')
+            self.label_mosaic_status.setText(f'mosaic failed: {e}')
+        self._abort_clicked_status = False
+        self.pushButton_collect_mosaic.setEnabled(True)
+        self.resume_state_polling(polling_was_running)
+        self.resume_live_view(live_view_was_running)
+
+    ##############################################  STATE POLLING ######################################################
+
+    def toggle_state_polling(self):
+        if self.checkBox_poll_state.isChecked():
+            self.start_state_polling()
+        else:
+            self.stop_state_polling()
+
+
+    def start_state_polling(self):
+        if self.poll_worker is not None:
+            return
+        self.poll_worker = StatePollWorker(microscope=self.microscope,
+                                           interval=self.doubleSpinBox_poll_interval.value())
+        self.poll_thread = QThread()
+        self.poll_worker.moveToThread(self.poll_thread)
+        self.poll_thread.started.connect(self.poll_worker.start)
+        self.poll_worker.state_ready.connect(self._show_polled_state)
+        self._polled_values = {}
+        self.poll_thread.start()
+
+
+    def stop_state_polling(self):
+        if self.poll_worker is None:
+            return
+        self.poll_worker.stop()
+        self._keep_until_finished(self.poll_thread, self.poll_worker)
+        self.poll_worker = None
+        self.poll_thread = None
+        self.checkBox_poll_state.setChecked(False)
+
+
+    def _keep_until_finished(self, thread, worker):
+        self._stopped_workers = [(thread, worker) for thread, worker in self._stopped_workers
+                                 if not thread.isFinished()]
+        if not thread.isFinished():
+            self._stopped_workers.append((thread, worker))
+
+
+    def pause_state_polling(self) -> bool:
+        """Pause the state polling for an acquisition, returns True if it was polling"""
+        if self.poll_worker is None or self.poll_worker._paused:
+            return False
+        self.poll_worker.pause()
+        return True
+
+
+    def resume_state_polling(self, was_running : bool = True):
+        if was_running and self.poll_worker is not None:
+            self.poll_worker.resume()
+
+
+    def _set_poll_interval(self):
+        if self.poll_worker is not None:
+            self.poll_worker.interval = self.doubleSpinBox_poll_interval.value()
+
+
+    def _show_polled_state(self):
+        """Write the polled values into the spin boxes, only the values that changed on
+        the microscope since the previous poll. Spin boxes being edited are skipped, and
+        the stage spin boxes only follow the stage in the Absolute move mode"""
+        state = self.poll_worker.take_state() if self.poll_worker is not None else None
+        if state is None:
+            return
+        follow_stage = self.comboBox_move_type.currentText() == "Absolute"
+        for attribute, name, scale in self.POLLED_STATE:
+            if attribute in ('x', 'y', 'z', 'r', 't') and not follow_stage:
+                continue
+            spin_box = getattr(self, name)
+            value = round(getattr(state, attribute) * scale, spin_box.decimals())
+            if self._polled_values.get(attribute) == value or spin_box.hasFocus():
+                continue
+            self._polled_values[attribute] = value
+            spin_box.setValue(value)
+        self.show_connection_stats()
+
+
+    def show_connection_stats(self):
+        """Mean call latency and reconnects in the Settings tab, the full stats in the tooltip"""
+        if self.microscope.demo:
+            self.label_connection.setText('demo')
+            return
+        stats = self.microscope.connection.stats
+        self.label_connection.setText(f'{stats.latency_mean * 1e3:.0f} ms\n'
+                                      f'{stats.reconnects} reconnects')
+        self.label_connection.setToolTip(self.microscope.connection.summary() +
+                                         (f'\nlast error: {stats.last_error}' if stats.last_error else ''))
+
+    ##############################################  LIVE VIEW ##########################################################
+
+    def toggle_live_view(self):
+        if self.live_worker is None:
+            self.start_live_view()
+        else:
+            self.stop_live_view()
+
+
+    def start_live_view(self):
+        settings = self.create_settings_dict()["imaging"]
+        self.live_worker = LiveViewWorker(microscope=self.microscope,
+                                          resolution='768x512',
+                                          dwell_time=settings["dwell_time"],
+                                          quadrant=settings["quadrant"])
+        self.live_thread = QThread()
+        self.live_worker.moveToThread(self.live_thread)
+        self.live_thread.started.connect(self.live_worker.run)
+        self.live_worker.finished.connect(self.live_thread.quit)
+        self.live_worker.frame_ready.connect(self._show_live_frame)
+        self._live_fps = 0.0
+        self._live_last_frame_time = None
+        self.live_thread.start()
+        self.pushButton_live_view.setChecked(True)
+
+
+    def stop_live_view(self):
+        if self.live_worker is None:
+            return
+        self.live_worker.stop()
+        self.live_thread.quit()
+        self.live_thread.wait(5000)
+        """a grab longer than the wait is still in flight"""
+        self._keep_until_finished(self.live_thread, self.live_worker)
+        self.live_worker = None
+        self.live_thread = None
+        self.pushButton_live_view.setChecked(False)
+
+
+    def pause_live_view(self) -> bool:
+        """Pause the live view before using the microscope from the GUI thread,
+        returns True if the live view was running"""
+        if self.live_worker is None or self.live_worker._paused:
+            return False
+        self.live_worker.pause()
+        return True
+
+
+    def resume_live_view(self, was_running : bool = True):
+        if was_running and self.live_worker is not None:
+            self.live_worker.resume()
+
+
+    def _show_live_frame(self):
+        latest = self.live_worker.take_frame() if self.live_worker is not None else None
+        if latest is None:
+            return
+        frame, acquired = latest
+        previous, self.image = self.image, frame
+        self.update_display(image=frame)
+        if isinstance(previous, np.ndarray) and previous is not frame:
+            self.microscope.buffer_pool.release(previous)
+
+        now = time.time()
+        if self._live_last_frame_time is not None:
+            fps = 1.0 / max(now - self._live_last_frame_time, 1e-6)
+            self._live_fps = fps if self._live_fps == 0 else 0.9 * self._live_fps + 0.1 * fps
+        self._live_last_frame_time = now
+        latency = now - acquired
+        self.label_live_fps.setText(f'{self._live_fps:.1f} fps, latency {latency * 1e3:.0f} ms, '
+                                    f'dropped {self.live_worker.dropped}')
+
+    ##########################################################################################
+
+    def select_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, caption='Select a folder')
+        print(directory)
+        self.label_messages.setText(directory)
+        self.DIR = directory
+        self.offer_resume()
+
+    # def update_image(self, quadrant, image, update_current_image=True):
+    #     if update_current_image:
+    #         self.data_in_quadrant[quadrant] = image
+    #     image_to_display = qimage2ndarray.array2qimage(image.copy())
+    #     if quadrant in range(0, 4):
+    #         self.label_image_frames[quadrant].setPixmap(QtGui.QPixmap(image_to_display))
+
+
+    # TODO fix pop-up plot bugs
+    def initialise_image_frames(self):
+        self.figure_SEM = plt.figure(10)
+        plt.axis("off")
+        plt.tight_layout()
+        plt.subplots_adjust(left=0.0, right=1.0, top=1.0, bottom=0.01)
+        self.canvas_SEM = _FigureCanvas(self.figure_SEM)
+        self.toolbar_SEM = _NavigationToolbar(self.canvas_SEM, self)
+        self._image_artist = None
+        self._image_shape = None
+        self._display_buffer = None
+        #
+        self.label_image_frame1.setLayout(QtWidgets.QVBoxLayout())
+        self.label_image_frame1.layout().addWidget(self.toolbar_SEM)
+        self.label_image_frame1.layout().addWidget(self.canvas_SEM)
+        self.canvas_SEM.mpl_connect('button_press_event', self._canvas_clicked)
+
+
+    def update_display(self, image):
+        """Show the frame using a single persistent image artist. The frame is downsampled
+        to the canvas pixel size and converted to 8 bit into a reused buffer, only the
+        artist data is updated unless the frame shape changes.
+        The axes keep the full-resolution pixel coordinates (extent) for the toolbar.
+        """
+        self.current_image = image
+        image = utils.image_data(image)
+
+        ratio = self.canvas_SEM.devicePixelRatioF()
+        canvas_size = (max(1, int(self.canvas_SEM.width() * ratio)),
+                       max(1, int(self.canvas_SEM.height() * ratio)))
+        self._display_buffer = utils.display_image(image, size=canvas_size,
+                                                   out=self._display_buffer)
+
+        if self._image_artist is None or self._image_shape != image.shape:
+            self._image_shape = image.shape
+            height, width = image.shape[:2]
+            self.figure_SEM.clear()
+            self.figure_SEM.patch.set_facecolor(
+                (240 / 255, 240 / 255, 240 / 255))
+            self.ax = self.figure_SEM.add_subplot(111)
+            self.ax.get_xaxis().set_visible(False)
+            self.ax.get_yaxis().set_visible(False)
+            self._image_artist = self.ax.imshow(self._display_buffer, cmap='gray',
+                                                vmin=0, vmax=255,
+                                                interpolation='nearest',
+                                                extent=(-0.5, width - 0.5, height - 0.5, -0.5))
+            self.canvas_SEM.draw()
+        else:
+            self._image_artist.set_data(self._display_buffer)
+            self.canvas_SEM.draw_idle()
+
+        self.update_histogram(image)
+        self.update_power_spectrum(self.current_image)
+
+
+    def update_histogram(self, image):
+        """Live histogram and intensity statistics of the frame, an aid to setting
+        the brightness and contrast"""
+        histogram, stats = self.intensity_histogram.compute(image)
+        pixmap = QtGui.QPixmap.fromImage(qimage2ndarray.gray2qimage(histogram))
+        self.label_histogram.setPixmap(
+            pixmap.scaled(self.label_histogram.size(), QtCore.Qt.IgnoreAspectRatio))
+        self.label_intensity_stats.setText(
+            f"min {stats['min']:.0f}, max {stats['max']:.0f}, mean {stats['mean']:.1f}\n"
+            f"saturated {stats['saturated_low'] * 100:.1f}% low, "
+            f"{stats['saturated_high'] * 100:.1f}% high")
+
+
+    def update_power_spectrum(self, image):
+        """Live stigmation aid: log power spectrum of the frame and the astigmatism estimate"""
+        if not self.checkBox_power_spectrum.isChecked():
+            return
+        spectrum, astigmatism, angle = self.power_spectrum.compute(image)
+        pixmap = QtGui.QPixmap.fromImage(qimage2ndarray.gray2qimage(spectrum))
+        self.label_power_spectrum.setPixmap(
+            pixmap.scaled(self.label_power_spectrum.size(), QtCore.Qt.KeepAspectRatio))
+        self.label_astigmatism.setText(f'astigmatism {astigmatism * 100:.0f}%, '
+                                       f'long axis {angle:.0f} deg')
+
+
+
+    def offer_resume(self):
+        """Ask whether to resume the newest interrupted stack of the directory,
+        a declined stack is marked finished and not offered again"""
+        if not self.DIR or not self.pushButton_collect_stack.isEnabled():
+            """a stack is running"""
+            return
+        unfinished = utils.StackJournal.find_unfinished(self.DIR)
+        if not unfinished:
+            return
+        journal = utils.StackJournal.load(unfinished[0])
+        n_levels = sum(1 for level in journal.plan if level[1])
+        answer = QtWidgets.QMessageBox.question(
+            self, 'Resume stack',
+            f'The stack "{journal.data["sample_name"]}" started {journal.data["started"]} was '
+            f'interrupted after {len(journal.completed)} of {n_levels} levels.\n'
+            f'Resume it from the first incomplete level?',
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+        if answer == QtWidgets.QMessageBox.Yes:
+            self.collect_stack(journal=journal)
+        else:
+            journal.finish()
+
+
+    def _enabled_hfw_count(self) -> int:
+        return sum(getattr(self, 'checkBox_hfw_%02d' % number).isChecked() for number in range(1, 13))
+
+
+    def update_stack_plan(self) -> dict:
+        """Predicted duration and disk usage of the stack with the current settings"""
+        plan = self.stack_time_estimator.estimate(self.create_settings_dict()["imaging"],
+                                                  self._enabled_hfw_count())
+        self.label_stack_plan.setText(f'plan: {utils.format_duration(plan["total_time"])}, '
+                                      f'{utils.format_bytes(plan["total_bytes"])}')
+        return plan
+
+
+    def collect_stack(self, HFW_and_selections : list = None, site_name : str = '',
+                      journal : utils.StackJournal = None) -> bool:
+        """ Update all the settings, store the current microscope state and
+            particularly the current position. After the stack acquisition
+            it is possible to return to the original position using move_absolute
+            stored state: self.microscope.stored_state : MicroscopeState
+            stack setting are stored in self.stack_settings : StackSettings
+            HFW_and_selections: HFW series of a queued site, default from the GUI
+            site_name: appended to the sample name in the file names
+            journal: resume the interrupted stack of the journal, its settings, plan and
+                data are used and the completed levels are skipped
+            A journal (utils.StackJournal) is written to the stack directory after every level
+            Returns True if the stack was aborted
+        """
+        """the live view and the state polling pause for the whole stack and resume afterwards"""
+        live_view_was_running = self.pause_live_view()
+        polling_was_running = self.pause_state_polling()
+        if journal is not None:
+            all_settings = journal.settings()
+            sample_name = journal.data['sample_name']
+            HFW_and_selections = journal.plan
+        else:
+            all_settings = self.create_settings_dict()
+            sample_name = self.plainTextEdit_sample_name.toPlainText() + site_name
+        timestamp = utils.current_timestamp()
+
+        if HFW_and_selections is None:
+            HFW_and_selections = self._get_all_the_HFW_to_use()
+        print(HFW_and_selections)
+
+        try:
+            self.pushButton_acquire.setEnabled(False)
+            self.pushButton_collect_stack.setEnabled(False)
+            self.pushButton_abort_stack_collection.setEnabled(True)
+
+            """Store the current microscope state, including the current position,
+            a resumed stack returns to the state stored when it started"""
+            if journal is not None:
+                stored_microscope_state = journal.stored_state
+                self.microscope._restore_microscope_state(stored_microscope_state)
+            else:
+                stored_microscope_state = dataclasses.replace(self.microscope._get_current_microscope_state())
+            # x0 = stored_microscope_state.x
+
+            """Create directory for saving the stack"""
+            if self.DIR is not None:
+                self.stack_dir = self.DIR
+            else:
+                self.stack_dir = os.getcwd()
+            # if self.DIR:
+            #     self.stack_dir = os.path.join(self.DIR, 'stack_' + sample_name + '_' + timestamp)
+            # else:
+            #     self.stack_dir = os.path.join(os.getcwd(), 'stack_' + sample_name + '_' + timestamp)
+            # if not os.path.isdir(self.stack_dir):
+            #     os.mkdir(self.stack_dir)
+
+            self.label_messages.setText(f"stack save dir {self.stack_dir}")
+
+            keys = ('x', 'y', 'z', 't', 'r',
+                    'horizontal_field_width', 'scan_rotation_angle',
+                    'brightness', 'contrast',
+                    'beam_shift_x', 'beam_shift_y')
+            self.experiment_data = {element: [] for element in keys}
+            """add other data keys"""
+            self.experiment_data['file_name'] = []
+            self.experiment_data['timestamp'] = []
+            self.experiment_data['drift_x'] = []
+            self.experiment_data['drift_y'] = []
+            completed_levels, first_counter = set(), 0
+            if journal is not None:
+                self.stack_dir = os.path.dirname(journal.file_name)
+                self.experiment_data = journal.experiment_data
+                completed_levels, first_counter = journal.completed, journal.counter
+                print(f'resuming {journal.file_name}, levels {sorted(completed_levels)} are complete')
+            else:
+                journal = utils.StackJournal(path=self.stack_dir, sample_name=sample_name,
+                                             settings=all_settings, plan=HFW_and_selections,
+                                             stored_state=stored_microscope_state)
+                journal.save()
+
+            """software drift tracking: the first frame of the stack is the reference"""
+            self.microscope.drift_tracker.reset()
+
+            def _track_drift(image, hfw):
+                if all_settings["imaging"]["drift_tracking"]:
+                    drift_x, drift_y = self.microscope.correct_drift(image, hfw=hfw)
+                else:
+                    drift_x, drift_y = 0.0, 0.0
+                return {'drift_x' : drift_x, 'drift_y' : drift_y}
+
+            """place every frame inside the previous lower-magnification one"""
+            self.zoom_registration = utils.ZoomSeriesRegistration()
+            registered_files = []
+
+            def _register(image, hfw, file_name):
+                transform = self.zoom_registration.add(image, hfw=hfw)
+                registered_files.append(file_name)
+                return {'registration_scale' : transform[0, 0],
+                        'registration_offset_x' : transform[0, 2],
+                        'registration_offset_y' : transform[1, 2],
+                        'registration_peak' : self.zoom_registration.peaks[-1]}
+
+            """plan and live ETA, the measured overheads calibrate the estimator for later runs"""
+            estimator = self.stack_time_estimator
+            n_levels = sum(1 for index, hfw_and_status in enumerate(HFW_and_selections)
+                           if hfw_and_status[1] and index not in completed_levels)
+            plan = estimator.estimate(all_settings["imaging"], n_levels)
+            stack_start = time.time()
+            print(f'stack plan: {n_levels} levels, {utils.format_duration(plan["total_time"])}, '
+                  f'{utils.format_bytes(plan["total_bytes"])}')
+
+            def _timed_grab(grab, imaging):
+                start = time.time()
+                result = grab()
+                overhead = time.time() - start - estimator.scan_time(imaging)
+                if imaging["autocontrast"]:
+                    estimator.record('autocontrast', overhead - estimator.overheads['frame_overhead'])
+                else:
+                    estimator.record('frame_overhead', overhead / max(1, int(imaging["average"])))
+                return result
+
+            def _timed_save(image, file_name):
+                start = time.time()
+                utils.save_image(image, path=self.stack_dir, file_name=file_name)
+                n_bytes = utils.image_data(image).nbytes
+                estimator.record('write_per_mb', (time.time() - start) / (n_bytes / 1e6))
+
+            def _show_eta(levels_done):
+                elapsed = time.time() - stack_start
+                remaining = (n_levels - levels_done) * elapsed / levels_done
+                self.label_stack_plan.setText(f'level {levels_done}/{n_levels}, '
+                                              f'{utils.format_duration(elapsed)} elapsed, '
+                                              f'ETA {utils.format_duration(remaining)}')
+
+            def _run_loop(all_settings):
+                counter = first_counter
+                levels_done = 0
+                for level_index, hfw_and_status in enumerate(HFW_and_selections):
+                    hfw = hfw_and_status[0]
+                    status = hfw_and_status[1]
+                    magnification = hfw_and_status[2]
+                    print(hfw_and_status, hfw, status, magnification)
+
+                    if status==True and level_index not in completed_levels:
+                        level_files = []
+
+                        if all_settings["imaging"]["autofocus"]:
+                            self.label_messages.setText(f'autofocus at hfw {hfw} um')
+                            QtWidgets.QApplication.processEvents()
+                            start = time.time()
+                            working_distance = self.microscope.autofocus(hfw=hfw*1e-6)
+                            estimator.record('autofocus', time.time() - start)
+                            self.doubleSpinBox_working_distance.setValue(working_distance / 1e-3)
+
+                        """adaptive dwell: the shortest dwell time reaching the target SNR at this level"""
+                        dwell_time, level_data = None, {}
+                        level_imaging = all_settings["imaging"]
+                        if all_settings["imaging"]["adaptive_dwell"]:
+                            start = time.time()
+                            dwell_time, probe_snr = self.microscope.adaptive_dwell_time(
+                                hfw=hfw*1e-6, target_snr=all_settings["imaging"]["target_snr"])
+                            estimator.record('probe', time.time() - start)
+                            level_imaging = dict(level_imaging, dwell_time=dwell_time)
+                            level_data = {'dwell_time' : dwell_time, 'probe_snr' : probe_snr}
+                            self.label_messages.setText(f'hfw {hfw} um: dwell {dwell_time / 1e-9:g} ns '
+                                                        f'(probe snr {probe_snr:.1f})')
+
+                        start = time.time()
+                        self.microscope._get_current_microscope_state()
+                        estimator.record('state_read', time.time() - start)
+
+                        # if not both q1 and q2 selected, then grab image only from a SIGNLE selected quadrant
+                        if not (all_settings["imaging"]["q1"] and all_settings["imaging"]["q2"]):
+                            timestamp = utils.current_timestamp()
+                            self.spinBox_horizontal_field_width.setValue(hfw)
+
+                            file_name = '%06d_' % counter + sample_name + '_' + \
+                                        str(hfw) + '_' +  timestamp + '.tif'
+
+                            """ This is a high-level procedure to acquire an image using the settings from the GUI """
+                            image = _timed_grab(lambda: self.acquire_image(hfw=hfw*1e-6, dwell_time=dwell_time,
+                                                                           all_settings=all_settings),
+                                                level_imaging)
+
+                            _timed_save(image, file_name)
+                            level_files.append(file_name)
+
+                            drift = _track_drift(image, hfw=hfw*1e-6)
+                            drift.update(_register(image, hfw=hfw*1e-6, file_name=file_name))
+                            drift.update(level_data)
+
+                            self.experiment_data = utils.populate_experiment_data_frame(
+                                data_frame=self.experiment_data,
+                                microscope_state=self.microscope.microscope_state,
+                                file_name=file_name,
+                                timestamp=utils.current_timestamp(),
+                                keys=keys,
+                                extra=drift)
+                            image.release()
+
+                        # if  both q1 and q2 ARE selected, then grab multiframe image
+                        elif  (all_settings["imaging"]["q1"] and all_settings["imaging"]["q2"]):
+                            timestamp = utils.current_timestamp()
+                            self.spinBox_horizontal_field_width.setValue(hfw)
+
+                            """ This is a high-level procedure to acquire an image using the settings from the GUI """
+                            images = _timed_grab(lambda: self.acquire_multiple_frames(hfw=hfw * 1e-6,
+                                                                                      dwell_time=dwell_time,
+                                                                                      all_settings=all_settings),
+                                                 level_imaging)
+
+                            drift = _track_drift(images[0], hfw=hfw*1e-6)
+                            drift.update(level_data)
+
+                            for ii in range(len(images)):
+                                file_name = '%06d_' % counter + sample_name + '_' + \
+                                               str(hfw) + '_' + str(ii) + '_' + timestamp + '.tif'
+                                if ii == 0:
+                                    drift.update(_register(images[0], hfw=hfw*1e-6, file_name=file_name))
+                                _timed_save(images[ii], file_name)
+                                level_files.append(file_name)
+
+                                self.experiment_data = utils.populate_experiment_data_frame(
+                                    data_frame=self.experiment_data,
+                                    microscope_state=self.microscope.microscope_state,
+                                    file_name=file_name,
+                                    timestamp=utils.current_timestamp(),
+                                    keys=keys,
+                                    extra=drift)
+                            for frame in images:
+                                frame.release()
+
+                        counter += 1
+                        journal.complete_level(level_index, level_files, counter, self.experiment_data)
+                        levels_done += 1
+                        _show_eta(levels_done)
+
+                    self.repaint()  # update the GUI to show the progress
+                    QtWidgets.QApplication.processEvents()
+
+                    if self._abort_clicked_status == True:
+                        print('Abort clicked')
+                        self._abort_clicked_status = False  # reinitialise back to False
+                        return True
+                return False
+
+            aborted = _run_loop(all_settings)
+            if not aborted:
+                journal.finish()
+            """demo timings would spoil the calibration of the real microscope"""
+            if not self.microscope.demo:
+                estimator.save()
+            self.label_stack_plan.setText(f'stack took {utils.format_duration(time.time() - stack_start)}, '
+                                          f'planned {utils.format_duration(plan["total_time"])}')
+
+            print('End of long scan, returning to the stored microscope state', stored_microscope_state)
+            print(utils.buffer_pool.summary())
+            utils.save_data_frame(data_frame=self.experiment_data,
+                                  path=self.stack_dir,
+                                  file_name='summary')
+
+            if all_settings["imaging"]["zoom_overlay"] and len(registered_files) > 1:
+                self.label_messages.setText('exporting the zoom overlay...')
+                QtWidgets.QApplication.processEvents()
+                try:
+                    frames = [os.path.join(self.stack_dir, file_name) for file_name in registered_files]
+                    utils.export_zoom_overlay(frames=frames,
+                                              transforms=self.zoom_registration.transforms,
+                                              path=self.stack_dir,
+                                              file_name='overlay_' + sample_name)
+                except Exception as e:
+                    print(f'Could not export the zoom overlay, error {e}')
+            #self.microscope._restore_microscope_state(state=stored_microscope_state)
+            return aborted
+        finally:
+            """restore the GUI and keep the journal of a failed stack, it can then be resumed"""
+            self.pushButton_acquire.setEnabled(True)
+            self.pushButton_collect_stack.setEnabled(True)
+            self.pushButton_abort_stack_collection.setEnabled(False)
+            if journal is not None:
+                journal.save()
+            self.resume_state_polling(polling_was_running)
+            self.resume_live_view(live_view_was_running)
+
+
+    def _abort_clicked(self):
+        print('------------ abort clicked --------------')
+        self.pushButton_abort_stack_collection.setEnabled(False)
+        self._abort_clicked_status = True
+
+
+    def _open_file(self):
+        options = QFileDialog.Options()
+        options |= QFileDialog.DontUseNativeDialog
+        file_name, _ = QFileDialog.getOpenFileName(self,
+                                                   "QFileDialog.getOpenFileName()",
+                                                   "", "TIF files (*.tif);;TIFF files (*.tiff);;All Files (*)",
+                                                   options=options)
+        if file_name:
+            print(file_name)
+            if file_name.lower().endswith('.tif') or file_name.lower().endswith('.tiff'):
+                self.image = utils.load_image(file_name)
+                self.update_display(image=self.image)
+
+            # other file format, not tiff, for example numpy array data, or txt format
+            else:
+                try:
+                    self.image = np.loadtxt(file_name)
+                    self.update_image(image=self.image)
+                except:
+                    self.label_messages.setText('File or mode not supported')
+
+
+    def _save_SEM_image(self):
+        if self.current_image is not None:
+            utils.save_image(self.current_image)
+
+
+    def _apply_clahe(self):
+        if self.image is not None:
+            clipLimit = int(self.spinBox_clip_limit.value())
+            tileGridSize = int(self.spinBox_tile_grid_size.value())
+            self.image_mod = utils.enhance_contrast(self.image,
+                                                    clipLimit=clipLimit,
+                                                    tileGridSize=tileGridSize)
+            self.update_display(self.image_mod)
+
+
+    def _restore_image(self):
+        if self.image is not None:
+            self.update_display(self.image)
+
+
+    def _get_all_the_HFW_to_use(self):
+        selected_hfw = []
+        ##################################################################################################
+        field_widths = [attr for attr in dir(self) if not callable(getattr(self, attr)) and attr.startswith("doubleSpinBox_hfw")]
+        self.field_widths = ['self.'+ii for ii in field_widths]
+        print(self.field_widths)
+        ##################################################################################################
+        clicked = [attr for attr in dir(self) if not callable(getattr(self, attr)) and attr.startswith("checkBox_hfw")]
+        self.clicked = ['self.'+ii for ii in clicked]
+        print(self.clicked)
+        ##################################################################################################
+        magnifications = [attr for attr in dir(self) if
+                          not callable(getattr(self, attr)) and attr.startswith("label_hfw")]
+        self.magnifications = ['self.' + ii for ii in magnifications]
+        ##################################################################################################
+        for ii in range(len(self.field_widths)):
+            print( eval( self.field_widths[ii] + '.value()' ),
+                   ' - ',
+                   eval( self.clicked[ii] + '.isChecked()' ),
+                   ' - ',
+                   eval( self.magnifications[ii] + '.text()' ) )
+            selected_hfw.append( [eval(self.field_widths[ii] + '.value()'),
+                                  eval(self.clicked[ii] + '.isChecked()'),
+                                  eval(self.magnifications[ii] + '.text()')
+                                 ]
+                                )
+        return selected_hfw
+
+    def disconnect(self):
+        # logging.info("Running cleanup/teardown")
+        # logging.debug("Running cleanup/teardown")
+        print('closing down, cleaning...')
+        self.stop_live_view()
+        self.stop_state_polling()
+        for thread, _ in self._stopped_workers:
+            thread.wait()
+        self._stopped_workers = []
+        print(self.frame_budget.summary())
+        self.frame_budget.close()
+        if self.microscope:
+            self.microscope.disconnect()
+
+
+
+
+
+def main(demo):
+    app = QtWidgets.QApplication([])
+    qt_app = GUIMainWindow(demo)
+    app.aboutToQuit.connect(qt_app.disconnect)  # cleanup & teardown
+    qt_app.show()
+    sys.exit(app.exec_())
+
+
+if __name__ == '__main__':
+    main(demo=False)
+
@@ -0,0 +1,255 @@
+"""Tiled mosaic acquisition: incremental stitching of a grid of overlapping tiles
+and a chunked multi-resolution output.
+
+Tiles are placed one by one as they arrive: the border strips of the new tile are
+phase-correlated with the overlap strips of its already placed neighbours only.
+Placement and saving of the tiles run on a worker thread, so the alignment of a tile
+overlaps with the acquisition of the next one.
+
+Output layout, in <path>/<file_name>/:
+    tiles/tile_RRR_CCC.npy          raw tiles
+    level_K/<chunk_row>_<chunk_col>.tif    chunk_size x chunk_size chunks, level K is binned 2^K
+    mosaic.json                      shapes of the levels, pixel size, tile positions
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import utils
+
+
+def grid_order(n_rows : int, n_cols : int, serpentine : bool = True) -> list:
+    """(row, col) acquisition order, serpentine rows halve the stage travel"""
+    order = []
+    for row in range(n_rows):
+        cols = range(n_cols)
+        if serpentine and row % 2 == 1:
+            cols = reversed(cols)
+        order.extend((row, col) for col in cols)
+    return order
+
+
+def _strip_spectrum(strip : np.ndarray) -> tuple:
+    """FFT-friendly crop, integer binning of long strips, windowed spectrum.
+    Returns (spectrum, shape, binning)"""
+    strip = strip.astype(np.float32)
+    binning = max(1, max(strip.shape) // 1024)
+    if binning > 1:
+        strip = cv2.resize(strip, (strip.shape[1] // binning, strip.shape[0] // binning),
+                           interpolation=cv2.INTER_AREA)
+    height, width = utils._fast_fft_size(strip.shape[0]), utils._fast_fft_size(strip.shape[1])
+    strip = strip[:height, :width]
+    return utils.windowed_spectrum(strip).astype(np.complex64), (height, width), binning
+
+
+class MosaicStitcher():
+    """Incremental placement of the tiles of an n_rows x n_cols grid.
+    tile_shape: (height, width) in pixels, overlap: fraction of the tile overlapping its
+    neighbours. A tile position is accepted from a neighbour when the correlation peak
+    is at least min_peak and the correction is below half of the overlap, otherwise the
+    nominal grid step is used.
+    positions: (row, col) -> (x, y) of the tile top-left corner in mosaic pixels
+    """
+    def __init__(self, path : str, n_rows : int, n_cols : int, tile_shape : tuple,
+                 overlap : float = 0.1, file_name : str = 'mosaic',
+                 pixel_size : float = None, min_peak : float = 0.03):
+        self.path = os.path.join(path, file_name)
+        os.makedirs(os.path.join(self.path, 'tiles'), exist_ok=True)
+        self.n_rows, self.n_cols = n_rows, n_cols
+        self.tile_shape = tuple(int(size) for size in tile_shape[:2])
+        height, width = self.tile_shape
+        self.step = (int(round(width * (1 - overlap))), int(round(height * (1 - overlap))))
+        self.overlap_px = (width - self.step[0], height - self.step[1])
+        self.overlap = overlap
+        self.pixel_size = pixel_size
+        self.min_peak = min_peak
+        self.positions = {}
+        self.peaks = {}
+        self.order = []
+        self.dtype = None
+        self._spectra = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._futures = []
+
+    def add(self, image, row : int, col : int) -> None:
+        """Queue the tile for placement and saving, returns immediately"""
+        data = utils.image_data(image)
+        if data.shape[:2] != self.tile_shape:
+            raise ValueError(f'tile shape {data.shape[:2]} does not match {self.tile_shape}')
+        """the caller may release the frame at once, the worker holds its own lease"""
+        utils.buffer_pool.retain(data)
+        self._futures.append(self._executor.submit(self._place, data, row, col))
+
+    def _border_spectra(self, data) -> dict:
+        overlap_x, overlap_y = self.overlap_px
+        strips = {}
+        if self.n_cols > 1:
+            strips['left'] = data[:, :overlap_x]
+            strips['right'] = data[:, -overlap_x:]
+        if self.n_rows > 1:
+            strips['top'] = data[:overlap_y]
+            strips['bottom'] = data[-overlap_y:]
+        return {side: _strip_spectrum(strip) for side, strip in strips.items()}
+
+    def _place(self, data, row, col):
+        try:
+            self._place_tile(data, row, col)
+        finally:
+            utils.buffer_pool.release(data)
+
+    def _place_tile(self, data, row, col):
+        np.save(os.path.join(self.path, 'tiles', 'tile_%03d_%03d.npy' % (row, col)), data)
+        self.dtype = data.dtype
+        spectra = self._border_spectra(data)
+
+        """P_tile = P_neighbour + nominal offset - measured shift of the tile strip"""
+        candidates, fallback = [], None
+        for d_row, d_col, side, facing in ((0, -1, 'left', 'right'), (0, 1, 'right', 'left'),
+                                           (-1, 0, 'top', 'bottom'), (1, 0, 'bottom', 'top')):
+            neighbour = (row + d_row, col + d_col)
+            if neighbour not in self.positions:
+                continue
+            nominal = np.array(self.positions[neighbour]) - \
+                      np.array([d_col * self.step[0], d_row * self.step[1]])
+            if fallback is None:
+                fallback = nominal
+            spectrum, shape, binning = spectra[side]
+            reference, _, _ = self._spectra[neighbour][facing]
+            shift_x, shift_y, peak = utils.phase_correlation(spectrum, reference, shape)
+            shift = np.array([shift_x, shift_y]) * binning
+            if peak >= self.min_peak and np.all(np.abs(shift) < np.array(self.overlap_px) / 2):
+                candidates.append((nominal - shift, peak))
+
+        if candidates:
+            weights = np.array([peak for _, peak in candidates])
+            position = np.sum([p * w for (p, _), w in zip(candidates, weights)], axis=0) / weights.sum()
+            peak = float(weights.max())
+        elif fallback is not None:
+            position, peak = fallback, 0.0
+        else:
+            position, peak = np.array([col * self.step[0], row * self.step[1]], dtype=float), 0.0
+
+        self.positions[(row, col)] = (float(position[0]), float(position[1]))
+        self.peaks[(row, col)] = peak
+        self.order.append((row, col))
+        self._spectra[(row, col)] = spectra
+        """only the neighbours of the coming tiles are kept"""
+        for key in [key for key in self._spectra if key[0] < row - 1]:
+            del self._spectra[key]
+
+    def wait(self) -> None:
+        """Block until all the queued tiles are placed, errors of the worker are raised"""
+        for future in self._futures:
+            future.result()
+        self._futures = []
+
+    def close(self) -> None:
+        """Stop the worker once the queued tiles are placed, finish() still works after"""
+        self._executor.shutdown()
+
+    def finish(self, chunk_size : int = 1024) -> dict:
+        """Place the remaining tiles and write the chunked pyramid, returns the metadata"""
+        self.wait()
+        self._executor.shutdown()
+        metadata = write_pyramid(self, chunk_size=chunk_size)
+        with open(os.path.join(self.path, 'mosaic.json'), 'w') as file:
+            json.dump(metadata, file, indent=1)
+        return metadata
+
+
+def _downsample(band : np.ndarray) -> np.ndarray:
+    height, width = band.shape[:2]
+    return cv2.resize(band, ((width + 1) // 2, (height + 1) // 2), interpolation=cv2.INTER_AREA)
+
+
+def write_pyramid(stitcher : MosaicStitcher, chunk_size : int = 1024) -> dict:
+    """Compose the placed tiles band by band (chunk_size rows at a time, tiles read through
+    memory maps) and write the chunks of every pyramid level, so the full mosaic is never
+    held in memory. Tiles are cut near the middle of their overlaps, later tiles win the
+    remaining few pixels.
+    """
+    height, width = stitcher.tile_shape
+    keys = stitcher.order
+    corners = np.array([stitcher.positions[key] for key in keys])
+    origin = np.floor(corners.min(axis=0))
+    offsets = {key: np.round(np.array(stitcher.positions[key]) - origin).astype(int) for key in keys}
+    mosaic_width = int(max(offsets[key][0] for key in keys)) + width
+    mosaic_height = int(max(offsets[key][1] for key in keys)) + height
+
+    n_levels = 1
+    while max(mosaic_width, mosaic_height) / 2 ** (n_levels - 1) > chunk_size:
+        n_levels += 1
+    for level in range(n_levels):
+        os.makedirs(os.path.join(stitcher.path, 'level_%d' % level), exist_ok=True)
+
+    """region of every tile in the mosaic: [x0, x1) x [y0, y1) after the overlap cuts"""
+    regions = {}
+    for key in keys:
+        row, col = key
+        cut_x = max(0, stitcher.overlap_px[0] // 2 - 8)
+        cut_y = max(0, stitcher.overlap_px[1] // 2 - 8)
+        left, right = (cut_x if col > 0 else 0), (cut_x if col < stitcher.n_cols - 1 else 0)
+        top, bottom = (cut_y if row > 0 else 0), (cut_y if row < stitcher.n_rows - 1 else 0)
+        x, y = offsets[key]
+        regions[key] = (x + left, x + width - right, y + top, y + height - bottom, left, top)
+
+    tiles = {key: np.load(os.path.join(stitcher.path, 'tiles', 'tile_%03d_%03d.npy' % key),
+                          mmap_mode='r') for key in keys}
+    band_counts = [0] * n_levels
+    pending = [[] for _ in range(n_levels)]
+
+    def _write(level, band):
+        band_row = band_counts[level]
+        band_counts[level] += 1
+        for chunk_col, x0 in enumerate(range(0, band.shape[1], chunk_size)):
+            Image.fromarray(np.ascontiguousarray(band[:, x0:x0 + chunk_size])).save(
+                os.path.join(stitcher.path, 'level_%d' % level, '%d_%d.tif' % (band_row, chunk_col)))
+        if level + 1 < n_levels:
+            pending[level + 1].append(_downsample(band))
+            rows = sum(part.shape[0] for part in pending[level + 1])
+            if rows >= chunk_size:
+                merged = np.concatenate(pending[level + 1])
+                pending[level + 1] = [merged[chunk_size:]] if rows > chunk_size else []
+                _write(level + 1, merged[:chunk_size])
+
+    for band_top in range(0, mosaic_height, chunk_size):
+        band_bottom = min(band_top + chunk_size, mosaic_height)
+        band = np.zeros((band_bottom - band_top, mosaic_width), dtype=stitcher.dtype)
+        for key in keys:
+            x0, x1, y0, y1, left, top = regions[key]
+            top_row, bottom_row = max(y0, band_top), min(y1, band_bottom)
+            if top_row >= bottom_row:
+                continue
+            tile_y = top_row - (y0 - top)
+            band[top_row - band_top:bottom_row - band_top, x0:x1] = \
+                tiles[key][tile_y:tile_y + bottom_row - top_row, left:left + x1 - x0]
+        _write(0, band)
+    for level in range(1, n_levels):
+        if pending[level]:
+            merged = np.concatenate(pending[level])
+            pending[level] = []
+            _write(level, merged)
+
+    levels = []
+    for level in range(n_levels):
+        level_height = -(-mosaic_height // 2 ** level)
+        level_width = -(-mosaic_width // 2 ** level)
+        levels.append({'level' : level,
+                       'shape' : [int(level_height), int(level_width)],
+                       'chunks' : [band_counts[level], -(-level_width // chunk_size)],
+                       'pixel_size' : None if stitcher.pixel_size is None
+                                      else stitcher.pixel_size * 2 ** level})
+    return {'shape' : [int(mosaic_height), int(mosaic_width)],
+            'dtype' : str(np.dtype(stitcher.dtype)),
+            'chunk_size' : chunk_size,
+            'chunk_file' : 'level_<level>/<chunk_row>_<chunk_col>.tif',
+            'overlap' : stitcher.overlap,
+            'levels' : levels,
+            'tiles' : [{'row' : key[0], 'col' : key[1],
+                        'x' : float(stitcher.positions[key][0] - origin[0]),
+                        'y' : float(stitcher.positions[key][1] - origin[1]),
+                        'peak' : stitcher.peaks[key]} for key in keys]}
@@ -0,0 +1,310 @@
+"""Headless acquisition runner: executes a declarative recipe file (JSON or YAML)
+against SEM.Microscope, without the GUI. Qt and matplotlib are not imported.
+
+    python recipe.py my_recipe.json [--demo] [--dry-run]
+
+Lengths are in metres and times in seconds, as in the GUI settings dictionary.
+Example recipe:
+{
+    "sample_name": "sample",
+    "demo": false,
+    "ip_address": "192.168.0.1",
+    "imaging": {"resolution": "1536x1024", "dwell_time": 1e-6, "bit_depth": 16,
+                "autocontrast": true, "average": 1},
+    "horizontal_field_widths": [400e-6, 100e-6, 25e-6, 6e-6],
+    "repetitions": 2,
+    "output": {"path": "/data/stack", "backend": "tif"}
+}
+Output backends: "tif" (AdornedImage with metadata, or the plain array), "npy" (raw array,
+fastest) and "none" (nothing is saved, for test runs).
+With "adaptive_dwell": true the dwell time of every HFW is the shortest one reaching
+"target_snr", measured on a short probe frame (Microscope.adaptive_dwell_time).
+"""
+import argparse
+import json
+import os, sys, time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+import SEM
+import utils
+from utils import BeamType
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+BACKENDS = ('tif', 'npy', 'none')
+
+"""imaging settings of a recipe and their defaults, the keys of the GUI settings dictionary"""
+DEFAULT_IMAGING = {
+    "resolution": "1536x1024",
+    "horizontal_field_width": 100e-6,
+    "dwell_time": 1e-6,
+    "autocontrast": False,
+    "beam_type": "ELECTRON",
+    "quadrant": 1,
+    "bit_depth": 8,
+    "drift_correction": False,
+    "drift_tracking": False,
+    "autofocus": False,
+    "zoom_overlay": False,
+    "frame_integration": 1,
+    "average": 1,
+    "average_registration": False,
+    "adaptive_dwell": False,
+    "target_snr": 5.0,
+    "q1": True,
+    "q2": False,
+}
+
+
+@dataclass
+class Recipe:
+    horizontal_field_widths: list
+    imaging: dict = field(default_factory=dict)
+    sample_name: str = 'sample'
+    repetitions: int = 1
+    path: str = '.'
+    backend: str = 'tif'
+    demo: bool = False
+    ip_address: str = '192.168.0.1'
+
+    def settings_dict(self) -> dict:
+        """The settings dictionary in the format of GUIMainWindow.create_settings_dict"""
+        imaging = dict(DEFAULT_IMAGING, **self.imaging)
+        imaging["beam_type"] = BeamType(str(imaging["beam_type"]).upper())
+        imaging["path"] = self.path
+        imaging["sample_name"] = self.sample_name
+        return {"imaging": imaging}
+
+
+"""numeric imaging settings, converted when the recipe is parsed"""
+NUMBERS = {"horizontal_field_width": float, "dwell_time": float, "target_snr": float,
+           "quadrant": int, "bit_depth": int, "frame_integration": int, "average": int}
+
+
+def _number(value, name : str, cast=float):
+    """value as a number, ValueError with the setting name if it is not one"""
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number, got {value!r}') from None
+
+
+def parse_recipe(recipe : dict) -> Recipe:
+    """Validate the recipe dictionary, raises ValueError with the reason"""
+    recipe = dict(recipe)
+    output = recipe.pop("output", {})
+    known = {'horizontal_field_widths', 'imaging', 'sample_name', 'repetitions',
+             'demo', 'ip_address'}
+    unknown = set(recipe) - known
+    if unknown:
+        raise ValueError(f'unknown recipe keys {sorted(unknown)}')
+
+    imaging = dict(recipe.get("imaging", {}))
+    unknown = set(imaging) - set(DEFAULT_IMAGING)
+    if unknown:
+        raise ValueError(f'unknown imaging settings {sorted(unknown)}')
+    for name, cast in NUMBERS.items():
+        if name in imaging:
+            imaging[name] = _number(imaging[name], name, cast)
+    resolution = imaging.get("resolution", DEFAULT_IMAGING["resolution"])
+    if resolution not in SEM.resolution_names:
+        raise ValueError(f'resolution must be one of {SEM.resolution_names}, got {resolution}')
+    if imaging.get("bit_depth", 8) not in (8, 16):
+        raise ValueError(f'bit depth must be 8 or 16, got {imaging["bit_depth"]}')
+    if imaging.get("dwell_time", DEFAULT_IMAGING["dwell_time"]) <= 0:
+        raise ValueError('dwell time must be positive')
+    if imaging.get("target_snr", DEFAULT_IMAGING["target_snr"]) <= 0:
+        raise ValueError('target_snr must be positive')
+    if imaging.get("average", 1) < 1:
+        raise ValueError('average must be at least 1')
+
+    hfws = recipe.get("horizontal_field_widths")
+    if not isinstance(hfws, (list, tuple)) or not hfws:
+        raise ValueError('horizontal_field_widths must be a list of positive widths in metres')
+    hfws = [_number(hfw, 'horizontal_field_widths', float) for hfw in hfws]
+    if any(hfw <= 0 for hfw in hfws):
+        raise ValueError('horizontal_field_widths must be a list of positive widths in metres')
+    repetitions = _number(recipe.get("repetitions", 1), 'repetitions', int)
+    if repetitions < 1:
+        raise ValueError('repetitions must be at least 1')
+    backend = output.get("backend", 'tif')
+    if backend not in BACKENDS:
+        raise ValueError(f'output backend must be one of {BACKENDS}, got {backend}')
+
+    return Recipe(horizontal_field_widths=hfws,
+                  imaging=imaging,
+                  sample_name=recipe.get("sample_name", 'sample'),
+                  repetitions=repetitions,
+                  path=output.get("path", os.getcwd()),
+                  backend=backend,
+                  demo=bool(recipe.get("demo", False)),
+                  ip_address=recipe.get("ip_address", '192.168.0.1'))
+
+
+def load_recipe(file_path : str) -> Recipe:
+    """Read a .json, .yaml or .yml recipe file"""
+    with open(file_path, 'r') as file:
+        if os.path.splitext(file_path)[1].lower() in ('.yaml', '.yml'):
+            if yaml is None:
+                raise ValueError('YAML recipes need PyYAML (pip install pyyaml), or use JSON')
+            recipe = yaml.safe_load(file)
+        else:
+            recipe = json.load(file)
+    return parse_recipe(recipe)
+
+
+def save_frame(image, path : str, file_name : str, backend : str = 'tif',
+               bit_depth : int = 8):
+    """Save the frame with the output backend, returns the file name or None.
+    Frames without metadata (demo frames, plain arrays) of other integer types are stored
+    with the recipe bit depth."""
+    if backend == 'none':
+        return None
+    if backend == 'npy':
+        file_name = file_name + '.npy'
+        np.save(os.path.join(path, file_name), utils.image_data(image))
+        return file_name
+    data = utils.image_data(image)
+    if getattr(image, 'metadata', None) is None and data.dtype not in (np.uint8, np.uint16):
+        dtype = np.uint8 if bit_depth == 8 else np.uint16
+        image = np.clip(data, 0, np.iinfo(dtype).max).astype(dtype)
+    file_name = file_name + '.tif'
+    utils.save_image(image, path=path, file_name=file_name)
+    return file_name
+
+
+def run_recipe(recipe : Recipe, microscope=None) -> str:
+    """Acquire every horizontal field width of the recipe, repetitions times.
+    Autofocus, software averaging, drift tracking and zoom registration follow the
+    imaging settings as in GUIMainWindow.collect_stack.
+    Returns
+    -------
+    str : the summary .csv file name
+    """
+    all_settings = recipe.settings_dict()
+    imaging = all_settings["imaging"]
+    if microscope is None:
+        microscope = SEM.Microscope(settings=all_settings, ip_address=recipe.ip_address,
+                                    demo=recipe.demo)
+        if not microscope.demo:
+            microscope.establish_connection()
+    os.makedirs(recipe.path, exist_ok=True)
+
+    keys = ('x', 'y', 'z', 't', 'r',
+            'horizontal_field_width', 'scan_rotation_angle',
+            'brightness', 'contrast',
+            'beam_shift_x', 'beam_shift_y')
+    experiment_data = {element: [] for element in keys}
+    experiment_data['file_name'] = []
+    experiment_data['timestamp'] = []
+
+    counter = 0
+    start = time.time()
+    for repetition in range(recipe.repetitions):
+        microscope.drift_tracker.reset()
+        zoom_registration = utils.ZoomSeriesRegistration()
+        saved_files = []
+
+        for hfw in recipe.horizontal_field_widths:
+            print(f'repetition {repetition + 1}/{recipe.repetitions}, hfw {hfw / 1e-6:g} um')
+            if imaging["autofocus"]:
+                microscope.autofocus(hfw=hfw)
+
+            level_settings, extra = all_settings, {'repetition' : repetition}
+            if imaging["adaptive_dwell"]:
+                dwell_time, probe_snr = microscope.adaptive_dwell_time(
+                    hfw=hfw, target_snr=imaging["target_snr"])
+                level_settings = dict(all_settings, imaging=dict(imaging, dwell_time=dwell_time))
+                extra.update({'dwell_time' : dwell_time, 'probe_snr' : probe_snr})
+
+            if imaging["average"] > 1:
+                image = microscope.acquire_averaged_image(level_settings, hfw=hfw,
+                                                          n_frames=int(imaging["average"]),
+                                                          register=imaging["average_registration"])
+            else:
+                image = microscope.acquire_image(level_settings, hfw=hfw)
+            microscope._get_current_microscope_state()
+
+            timestamp = utils.current_timestamp()
+            file_name = '%06d_' % counter + recipe.sample_name + '_' + \
+                        '%g' % (hfw / 1e-6) + '_' + timestamp
+            file_name = save_frame(image, path=recipe.path, file_name=file_name,
+                                   backend=recipe.backend, bit_depth=imaging["bit_depth"])
+            saved_files.append(file_name)
+
+            if imaging["drift_tracking"]:
+                drift_x, drift_y = microscope.correct_drift(image, hfw=hfw)
+                extra.update({'drift_x' : drift_x, 'drift_y' : drift_y})
+            transform = zoom_registration.add(image, hfw=hfw)
+            extra.update({'registration_scale' : transform[0, 0],
+                          'registration_offset_x' : transform[0, 2],
+                          'registration_offset_y' : transform[1, 2],
+                          'registration_peak' : zoom_registration.peaks[-1]})
+
+            experiment_data = utils.populate_experiment_data_frame(
+                data_frame=experiment_data,
+                microscope_state=microscope.microscope_state,
+                file_name=str(file_name),
+                timestamp=timestamp,
+                keys=keys,
+                extra=extra)
+            image.release()
+            counter += 1
+
+        if imaging["zoom_overlay"] and recipe.backend != 'none' and len(saved_files) > 1:
+            try:
+                utils.export_zoom_overlay(
+                    frames=[os.path.join(recipe.path, name) for name in saved_files],
+                    transforms=zoom_registration.transforms,
+                    path=recipe.path,
+                    file_name='overlay_%03d_' % repetition + recipe.sample_name)
+            except Exception as e:
+                print(f'Could not export the zoom overlay, error {e}')
+
+    print(f'{counter} frames in {time.time() - start:.1f} s')
+    if imaging["autocontrast"]:
+        cache = microscope.autocontrast_cache
+        print(f'autocontrast: {cache.runs} auto-CB runs, {cache.hits} cached, '
+              f'{cache.invalidations} re-runs on intensity drift')
+    print(utils.buffer_pool.summary())
+    if not microscope.demo:
+        print(f'connection: {microscope.connection.summary()}')
+    return utils.save_data_frame(data_frame=experiment_data,
+                                 path=recipe.path,
+                                 file_name='summary')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Run an SEM acquisition recipe without the GUI')
+    parser.add_argument('recipe', help='recipe file, .json, .yaml or .yml')
+    parser.add_argument('--demo', action='store_true', help='use the simulated microscope')
+    parser.add_argument('--dry-run', action='store_true', help='validate the recipe and print the plan')
+    args = parser.parse_args(argv)
+
+    try:
+        recipe = load_recipe(args.recipe)
+    except (OSError, ValueError) as e:
+        print(f'Could not load the recipe {args.recipe}, error {e}')
+        return 1
+    if args.demo:
+        recipe.demo = True
+
+    if args.dry_run:
+        print(recipe)
+        print(f'{len(recipe.horizontal_field_widths) * recipe.repetitions} frames, '
+              f'output {recipe.backend} to {recipe.path}')
+        return 0
+
+    summary = run_recipe(recipe)
+    print(f'summary saved to {summary}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
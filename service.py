@@ -0,0 +1,370 @@
+"""Acquisition service: a local process owning SEM.Microscope, so the GUI, analysis
+scripts and writers can share one microscope connection.
+
+    python service.py [--socket /tmp/sem_scan.sock] [--demo] [--ip 192.168.0.1]
+
+Requests are json lines over a Unix socket, {"method": name, "params": {...}}, answered by
+{"result": ...} or {"error": "..."}, see AcquisitionService.rpc_* for the methods. The
+microscope calls are serialised by the service, any number of clients can be connected.
+
+Frames are not sent through the socket: they are written into a FrameRing, a ring of
+slots in multiprocessing.shared_memory, and the answer is a descriptor
+{"ring", "seq", "shape", "dtype", ...}. ServiceClient.frame(descriptor) returns a numpy
+view of the slot (zero-copy), valid until the ring has wrapped around, i.e. until
+n_slots newer frames are published; ask for copy=True to keep the frame longer.
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from dataclasses import asdict
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import SEM
+import recipe
+import utils
+from utils import MicroscopeState
+
+DEFAULT_SOCKET = os.path.join('/tmp', 'sem_scan.sock')
+
+_DTYPES = ('uint8', 'uint16', 'int16', 'int32', 'uint32', 'int64', 'float32', 'float64')
+"""int64 fields of the ring header and of every slot header"""
+_RING_FIELDS = 4        # magic, n_slots, slot_bytes, last published seq
+_SLOT_FIELDS = 8        # seq_begin, seq_end, height, width, channels, dtype, nbytes, time (ns)
+_MAGIC = 0x53454d52
+
+
+class FrameRing():
+    """n_slots frames of up to slot_bytes each in one shared memory block.
+    Frame seq goes to slot seq % n_slots. The writer marks the slot header with seq_begin
+    before copying and seq_end after, a reader accepts the slot only if both equal the
+    requested seq (checked again after a copy), so torn or overwritten frames are detected.
+    Create with FrameRing(n_slots=..., slot_bytes=...), attach with FrameRing(name=...).
+    """
+    def __init__(self, name : str = None, n_slots : int = 8, slot_bytes : int = 1536 * 1024 * 2):
+        header_bytes = lambda slots: (_RING_FIELDS + slots * _SLOT_FIELDS) * 8
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True,
+                                                  size=header_bytes(n_slots) + n_slots * slot_bytes)
+            self.owner = True
+            self._ring = np.ndarray((_RING_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+            self._ring[:] = (_MAGIC, n_slots, slot_bytes, -1)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+            _untrack(self.shm)
+            self._ring = np.ndarray((_RING_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+            if self._ring[0] != _MAGIC:
+                raise ValueError(f'{name} is not a frame ring')
+            n_slots, slot_bytes = int(self._ring[1]), int(self._ring[2])
+        self.name = self.shm.name
+        self.n_slots, self.slot_bytes = n_slots, slot_bytes
+        self._headers = np.ndarray((n_slots, _SLOT_FIELDS), dtype=np.int64, buffer=self.shm.buf,
+                                   offset=_RING_FIELDS * 8)
+        if self.owner:
+            self._headers[:, :2] = -1
+        self._data_offset = header_bytes(n_slots)
+
+    def _slot(self, index : int) -> memoryview:
+        start = self._data_offset + index * self.slot_bytes
+        return self.shm.buf[start:start + self.slot_bytes]
+
+    def fits(self, frame : np.ndarray) -> bool:
+        return frame.nbytes <= self.slot_bytes and frame.dtype.name in _DTYPES
+
+    def publish(self, frame : np.ndarray, seq : int) -> None:
+        """Copy the frame into slot seq % n_slots"""
+        header = self._headers[seq % self.n_slots]
+        header[0] = seq
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 0
+        target = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._slot(seq % self.n_slots))
+        target[...] = frame
+        header[2:] = (height, width, channels, _DTYPES.index(frame.dtype.name), frame.nbytes,
+                      time.time_ns())
+        header[1] = seq
+        self._ring[3] = seq
+
+    def valid(self, seq : int) -> bool:
+        header = self._headers[seq % self.n_slots]
+        return header[0] == seq and header[1] == seq
+
+    def read(self, seq : int, copy : bool = False):
+        """Frame seq as a view of the slot (or a copy), None if it has been overwritten"""
+        if seq < 0 or not self.valid(seq):
+            return None
+        header = self._headers[seq % self.n_slots]
+        height, width, channels, dtype = (int(value) for value in header[2:6])
+        shape = (height, width, channels) if channels else (height, width)
+        frame = np.ndarray(shape, dtype=_DTYPES[dtype], buffer=self._slot(seq % self.n_slots))
+        if copy:
+            frame = frame.copy()
+            if not self.valid(seq):
+                return None
+        return frame
+
+    @property
+    def last_seq(self) -> int:
+        return int(self._ring[3])
+
+    def close(self) -> None:
+        """Unmap the ring, the views handed out by read() are invalid afterwards:
+        copy (read(seq, copy=True)) the frames kept past the close"""
+        self._ring = self._headers = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _untrack(shm) -> None:
+    """The resource tracker of an attaching process would unlink the block at exit"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+class AcquisitionService():
+    """Owns the microscope and the frame ring, the rpc_* methods are the remote API"""
+    def __init__(self, demo : bool = False, ip_address : str = '192.168.0.1',
+                 n_slots : int = 8, slot_bytes : int = 1536 * 1024 * 2):
+        self.microscope = SEM.Microscope(ip_address=ip_address, demo=demo)
+        if not self.microscope.demo:
+            self.microscope.establish_connection()
+        self.n_slots = n_slots
+        self.ring = FrameRing(n_slots=n_slots, slot_bytes=slot_bytes)
+        self.seq = -1
+        self.frames_published = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.server = None
+
+    def handle(self, request : dict) -> dict:
+        method = request.get('method', '')
+        handler = getattr(self, 'rpc_' + method, None)
+        if handler is None:
+            return {'error': f'unknown method {method}'}
+        try:
+            with self._lock:
+                return {'result': handler(**request.get('params', {}))}
+        except Exception as e:
+            return {'error': f'{method}: {type(e).__name__}: {e}'}
+
+    def _settings(self, imaging : dict = None) -> dict:
+        """imaging settings of the request over the recipe defaults"""
+        return recipe.Recipe(horizontal_field_widths=[], imaging=imaging or {}).settings_dict()
+
+    def _publish(self, image, hfw : float = None) -> dict:
+        frame = np.ascontiguousarray(utils.image_data(image))
+        if not self.ring.fits(frame):
+            if frame.dtype.name not in _DTYPES:
+                raise TypeError(f'frames of type {frame.dtype} cannot be published')
+            """larger frames than the slots: a new ring, clients attach to it by name,
+            the old block is unlinked and freed once its readers let go"""
+            old, self.ring = self.ring, FrameRing(n_slots=self.n_slots, slot_bytes=frame.nbytes)
+            old.close()
+        self.seq += 1
+        self.ring.publish(frame, self.seq)
+        self.frames_published += 1
+        """the field width the frame was acquired at, then the requested one"""
+        frame_hfw = getattr(image, 'horizontal_field_width', None)
+        if not frame_hfw:
+            frame_hfw = hfw if hfw is not None else self.microscope.microscope_state.horizontal_field_width
+        return {'ring': self.ring.name, 'seq': self.seq,
+                'shape': list(frame.shape), 'dtype': frame.dtype.name,
+                'horizontal_field_width': frame_hfw,
+                'timestamp': utils.current_timestamp()}
+
+    def rpc_ping(self) -> dict:
+        return {'demo': self.microscope.demo, 'ring': self.ring.name, 'last_seq': self.seq}
+
+    def rpc_read_state(self) -> dict:
+        return asdict(self.microscope.read_state())
+
+    def rpc_acquire_image(self, imaging : dict = None, hfw : float = None) -> dict:
+        image = self.microscope.acquire_image(self._settings(imaging), hfw=hfw)
+        try:
+            return self._publish(image, hfw)
+        finally:
+            """copied into the ring, the pooled buffer can take the next grab"""
+            image.release()
+
+    def rpc_acquire_multiple_frames(self, imaging : dict = None, hfw : float = None) -> list:
+        images = self.microscope.acquire_multiple_frames(self._settings(imaging), hfw=hfw)
+        try:
+            return [self._publish(image, hfw) for image in images]
+        finally:
+            for image in images:
+                image.release()
+
+    def rpc_set_horizontal_field_width(self, hfw : float) -> float:
+        return self.microscope.set_horizontal_field_width(hfw)
+
+    def rpc_set_working_distance(self, working_distance : float) -> float:
+        return self.microscope.set_working_distance(working_distance)
+
+    def rpc_move_stage(self, x : float = 0, y : float = 0, z : float = 0, r : float = 0,
+                       t : float = 0, move_type : str = "Absolute", compucentric : bool = True):
+        return self.microscope.move_stage(x=x, y=y, z=z, r=r, t=t, move_type=move_type,
+                                          compucentric=compucentric)
+
+    def rpc_autocontrast(self, quadrant : int = 1, hfw : float = None, force : bool = False) -> bool:
+        return self.microscope.autocontrast(quadrant=quadrant, hfw=hfw, force=force)
+
+    def rpc_autofocus(self, hfw : float = None) -> float:
+        return self.microscope.autofocus(hfw=hfw)
+
+    def rpc_stats(self) -> dict:
+        return {'frames_published': self.frames_published,
+                'uptime': time.time() - self.started,
+                'ring': self.ring.name, 'n_slots': self.ring.n_slots,
+                'slot_bytes': self.ring.slot_bytes,
+                'connection': self.microscope.connection_stats(),
+                'buffer_pool': utils.buffer_pool.summary()}
+
+    def rpc_shutdown(self) -> bool:
+        if self.server is not None:
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        return True
+
+    def serve(self, socket_path : str = DEFAULT_SOCKET) -> None:
+        """Answer requests until rpc_shutdown, then free the ring and the socket"""
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        service = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        answer = service.handle(json.loads(line))
+                    except ValueError as e:
+                        answer = {'error': f'invalid request: {e}'}
+                    self.wfile.write((json.dumps(answer, default=utils._json_value) + '\n').encode())
+                    self.wfile.flush()
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        self.server = Server(socket_path, Handler)
+        print(f'acquisition service listening on {socket_path}, frames in {self.ring.name}')
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.ring.close()
+            self.microscope.disconnect()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+class ServiceClient():
+    """Connection to a running AcquisitionService, safe to share between threads"""
+    def __init__(self, socket_path : str = DEFAULT_SOCKET, timeout : float = 120):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(socket_path)
+        self._file = self.socket.makefile('rb')
+        self._lock = threading.Lock()
+        self._rings = {}
+
+    def call(self, method : str, **params):
+        """Result of the remote method, errors of the service are raised as RuntimeError"""
+        request = (json.dumps({'method': method, 'params': params},
+                              default=utils._json_value) + '\n').encode()
+        with self._lock:
+            self.socket.sendall(request)
+            line = self._file.readline()
+        if not line:
+            raise ConnectionError('the acquisition service closed the connection')
+        answer = json.loads(line)
+        if 'error' in answer:
+            raise RuntimeError(answer['error'])
+        return answer['result']
+
+    def frame(self, descriptor : dict, copy : bool = False):
+        """Pixels of a published frame, None if the ring has already overwritten it.
+        Without copy the frame is a view of the shared ring, valid until close()"""
+        name = descriptor['ring']
+        if name not in self._rings:
+            """the service has moved to a larger ring, the old ones get no more frames but
+            stay mapped for the views still held, close() unmaps them"""
+            self._rings[name] = FrameRing(name=name)
+        return self._rings[name].read(descriptor['seq'], copy=copy)
+
+    def acquire_image(self, imaging : dict = None, hfw : float = None, copy : bool = False) -> tuple:
+        """(frame, descriptor)"""
+        descriptor = self.call('acquire_image', imaging=imaging, hfw=hfw)
+        return self.frame(descriptor, copy=copy), descriptor
+
+    def acquire_multiple_frames(self, imaging : dict = None, hfw : float = None,
+                                copy : bool = False) -> list:
+        """[(frame, descriptor), ...] one per quadrant"""
+        return [(self.frame(descriptor, copy=copy), descriptor)
+                for descriptor in self.call('acquire_multiple_frames', imaging=imaging, hfw=hfw)]
+
+    def read_state(self) -> MicroscopeState:
+        return MicroscopeState(**self.call('read_state'))
+
+    def close(self) -> None:
+        """The frames read without copy are invalid afterwards"""
+        for ring in self._rings.values():
+            ring.close()
+        self._rings = {}
+        self._file.close()
+        self.socket.close()
+
+
+def _run_service(socket_path, demo, ip_address, n_slots):
+    AcquisitionService(demo=demo, ip_address=ip_address, n_slots=n_slots).serve(socket_path)
+
+
+def start_service(socket_path : str = DEFAULT_SOCKET, demo : bool = False,
+                  ip_address : str = '192.168.0.1', n_slots : int = 8, timeout : float = 60):
+    """Start the service in a child process and wait until it answers.
+    Returns the multiprocessing.Process, stop it with ServiceClient.call('shutdown')"""
+    import multiprocessing
+    process = multiprocessing.Process(target=_run_service, daemon=True,
+                                      args=(socket_path, demo, ip_address, n_slots))
+    process.start()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            client = ServiceClient(socket_path, timeout=5)
+            client.call('ping')
+            client.close()
+            return process
+        except OSError:
+            if not process.is_alive():
+                break
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'the acquisition service did not start on {socket_path}')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Serve SEM.Microscope to local clients')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket path')
+    parser.add_argument('--demo', action='store_true', help='use the simulated microscope')
+    parser.add_argument('--ip', default='192.168.0.1', help='microscope ip address')
+    parser.add_argument('--slots', type=int, default=8, help='frames kept in the shared ring')
+    args = parser.parse_args(argv)
+    _run_service(args.socket, args.demo, args.ip, args.slots)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
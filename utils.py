@@ -1,297 +1,1867 @@
-import datetime
-import time
-import os, glob
-import pandas as pd
-import numpy as np
-import re
-from PIL import Image
-import cv2
-import matplotlib.pyplot as plt
-
-from dataclasses import dataclass
-from enum import Enum
-
-try:
-    from autoscript_sdb_microscope_client import SdbMicroscopeClient
-    from autoscript_sdb_microscope_client.structures import (AdornedImage,
-                                                             GrabFrameSettings,
-                                                             Rectangle,
-                                                             RunAutoCbSettings,
-                                                             Point)
-    from autoscript_sdb_microscope_client.enumerations import (CoordinateSystem)
-except:
-    print('Autoscript module not found')
-
-
-class BeamType(Enum):
-    ION = 'ION'
-    ELECTRON = 'ELECTRON'
-
-
-@dataclass
-class MicroscopeState:
-    hv : float = 20
-    beam_current : float = 0
-    x : float = 0
-    y : float = 0
-    z : float = 0
-    t : float = 0
-    r : float = 0
-    horizontal_field_width : float = 0
-    resolution : str = '768x512'
-    detector : str = 'ETD'
-    rotate_compucentric : bool = True
-    scan_rotation_angle : float = 0
-    brightness : float = 0
-    contrast : float = 0
-    beam_shift_x : float = 0
-    beam_shift_y : float = 0
-    working_distance : float = 0
-
-    def __to__dict__(self) -> dict:
-        state_dict = {
-            "x" : self.x,
-            "y" : self.y,
-            "z" : self.z,
-            "r" : self.r,
-            "t" : self.t,
-            "rotate_compucentric" : self.rotate_compucentric,
-            "horizontal_field_width" : self.horizontal_field_width,
-            "detector" : self.detector,
-            "scan_rotation_angle" : self.scan_rotation_angle,
-            "brightness" : self.brightness,
-            "contrast" : self.contrast,
-            "beam_shift_x" : self.beam_shift_x,
-            "beam_shift_y" : self.beam_shift_y,
-            "hv" : self.hv,
-            "beam_current" : self.beam_current,
-            "working_distance" : self.working_distance
-        }
-        return state_dict
-
-    def get_stage_position(self):
-        coords_dict = {
-            "x" : self.x,
-            "y" : self.y,
-            "z" : self.z,
-            "r" : self.r,
-            "t" : self.t,
-            "rotate_compucentric" : self.rotate_compucentric
-        }
-        return coords_dict
-
-    def update_stage_position(self, x=0, y=0, z=0, r=0, t=0):
-        self.x = x
-        self.y = y
-        self.z = z
-        self.r = r
-        self.t = t
-
-
-@dataclass
-class ImageSettings:
-    resolution: str
-    dwell_time: float
-    horizontal_field_width: float
-    autocontrast: bool
-    beam_type: BeamType
-    sample_name: str
-    path : str
-    quadrant: int
-    bit_depth: int
-    drift_correction: bool
-    frame_integration: int
-
-
-
-
-
-def current_timestamp():
-    return datetime.datetime.fromtimestamp(time.time()).strftime("%y%m%d.%H%M%S")
-
-
-
-def save_image(image, path=None, file_name=None):
-    if not path:
-        path = os.getcwd()
-    if not file_name:
-        timestamp = current_timestamp()
-        file_name = "no_name_" + timestamp + '.tif'
-
-    file_name = os.path.join(path, file_name)
-
-    try:
-        """Adorned image needs only path"""
-        image.save(file_name)
-
-    except Exception as e:
-        print('error {e}, Image is not Adorned, trying to save numpy array to tiff')
-        try:
-            _im = Image.fromarray(image)
-            _im.save(file_name)
-        except Exception as e:
-            print('error {e}, Could not save the image')
-
-
-
-def load_image(file_path):
-    # image = Image.open(file_path).convert('L') # load image .tiff .png .jpg, convert to grayscale
-    # image = np.array(image, dtype=np.float64)
-    image = plt.imread(file_path)
-    return image
-
-
-
-def enhance_contrast(image, clipLimit=1.0, tileGridSize=8):
-    # if image.dtype == 'float64' or 'uint64':
-    #     pass
-
-    # the images needs to be 8bit, otherwise the algorithm does not work TODO fix 8-bit to any-bit
-    try:
-        image = image / image.max()
-    except:
-        image = image.data / image.data.max()
-
-    image = (image * 2 ** 8).astype('uint8')
-    tileGridSize = int(tileGridSize)
-    clahe = cv2.createCLAHE(clipLimit=clipLimit,
-                            tileGridSize=(tileGridSize, tileGridSize))
-    image = clahe.apply(image)
-    return image
-
-
-def equalise_histogram(image, bitdepth=8):
-    try:
-        _image = image.data
-    except:
-        _image = image
-
-    # _image = _image / _image.max()
-    # _image = (_image * 2 ** bitdepth).astype("uint8")
-
-    _image = cv2.equalizeHist(_image)
-    return _image
-
-
-def resize(image, size=(200,200)):
-    return cv2.resize(image, size)
-
-
-def populate_experiment_data_frame(data_frame : dict,
-                                   keys : list,
-                                   microscope_state : MicroscopeState,
-                                   file_name : str = "None",
-                                   timestamp: str = "None") -> dict:
-    microscope_state = microscope_state.__to__dict__()
-    for key in keys:
-        data_frame[key].append( microscope_state[key] )
-
-    data_frame['file_name'].append(file_name)
-    data_frame['timestamp'].append(timestamp)
-
-    return data_frame
-
-
-def save_data_frame(data_frame : dict,
-                    path : str,
-                    file_name : str) -> None:
-    """convert the accumulated dictionary to pandas DataFrame
-        save .cvs file in the directory as a form of metadata
-    Parameters
-    ----------
-    data_frame : dict
-        contains microscope state snippet for each acquired image and filenames.
-    path : str
-        Path of the stack where the images are stored.
-    file_name : str
-        Filename of the .cvs file
-    Returns
-    -------
-    None
-    """
-    d = pd.DataFrame(data=data_frame)
-    N = len(glob.glob(os.path.join(path, '*.csv') ) )
-    print('N = ', N)
-    file_name = os.path.join(path, file_name + '_%03d'%(N+1) + '.csv')
-    d.to_csv(file_name)
-
-
-def extract_metadata_from_tif(path_to_file):
-    from PIL import Image
-    from PIL.TiffTags import TAGS
-
-    with Image.open(path_to_file) as img:
-        #[print(key, img.tag[key]) for key in img.tag.keys()]
-        metadata_dict = {key: img.tag[key] for key in img.tag.keys()}
-
-        return metadata_dict
-
-
-def parse_metadata(path_to_file):
-    # SEM meta data key is 34682, comes as a string
-    img = Image.open(path_to_file)
-    img_metadata = img.tag[34682][0]
-
-    # parse metadata
-    parsed_metadata = img_metadata.split("\r\n")
-
-    metadata_dict = {}
-    for item in parsed_metadata:
-        if item == "":
-            # skip blank lines
-            pass
-        elif re.match("\[(.*?)\]", item):
-            # find category, dont add to dict
-            category = item
-        else:
-            # meta data point
-            datum = item.split("=")
-            # save to dictionary
-            metadata_dict[category + "." + datum[0]] = datum[1]
-
-    # add filename to metadata
-    metadata_dict["filename"] = path_to_file
-
-    # convert to pandas df
-    df = pd.DataFrame.from_dict(metadata_dict, orient="index").T
-
-    return df
-
-
-def make_copy_of_Adorned_image(image):
-    copy = AdornedImage()
-    AdornedImage._AdornedImage__construct_from_data(copy,
-                                                    data=image.data)
-    copy.metadata = image.metadata
-    return copy
-
-
-def read_data_file(file_name):
-    file_name = file_name.replace('\\', '/')
-    if os.path.isfile(file_name):
-        data = np.loadtxt(  file_name  )
-    else:
-        print('file not found')
-        data = None
-    return data
-
-
-
-
-if __name__ == '__main__':
-
-    keys = ('x', 'y', 'z', 't', 'r',
-            'horizontal_field_width', 'scan_rotation_angle',
-            'brightness', 'contrast',
-            'beam_shift_x', 'beam_shift_y')
-    experiment_data = {element: [] for element in keys}
-    """add other data keys"""
-    experiment_data['file_name'] = []
-    experiment_data['timestamp'] = []
-    print(experiment_data)
-    # experiment_data = populate_experiment_data_frame(data_frame=experiment_data,
-    #                                                  microscope_state=microscope.microscope_state,
-    #                                                  file_name='lalala', timestamp=current_timestamp(),
-    #                                                  keys=keys)
-    print(experiment_data)
-
+import datetime
+import json
+import sys
+import threading
+import time
+import os, glob
+import shutil
+import tempfile
+import weakref
+from contextlib import contextmanager
+import pandas as pd
+import numpy as np
+import re
+from PIL import Image
+import cv2
+
+from dataclasses import dataclass, asdict
+from enum import Enum
+
+try:
+    from autoscript_sdb_microscope_client import SdbMicroscopeClient
+    from autoscript_sdb_microscope_client.structures import (AdornedImage,
+                                                             GrabFrameSettings,
+                                                             Rectangle,
+                                                             RunAutoCbSettings,
+                                                             Point)
+    from autoscript_sdb_microscope_client.enumerations import (CoordinateSystem)
+except:
+    print('Autoscript module not found')
+
+
+class BeamType(Enum):
+    ION = 'ION'
+    ELECTRON = 'ELECTRON'
+
+
+@dataclass
+class MicroscopeState:
+    hv : float = 20
+    beam_current : float = 0
+    x : float = 0
+    y : float = 0
+    z : float = 0
+    t : float = 0
+    r : float = 0
+    horizontal_field_width : float = 0
+    resolution : str = '768x512'
+    detector : str = 'ETD'
+    rotate_compucentric : bool = True
+    scan_rotation_angle : float = 0
+    brightness : float = 0
+    contrast : float = 0
+    beam_shift_x : float = 0
+    beam_shift_y : float = 0
+    working_distance : float = 0
+
+    def __to__dict__(self) -> dict:
+        state_dict = {
+            "x" : self.x,
+            "y" : self.y,
+            "z" : self.z,
+            "r" : self.r,
+            "t" : self.t,
+            "rotate_compucentric" : self.rotate_compucentric,
+            "horizontal_field_width" : self.horizontal_field_width,
+            "detector" : self.detector,
+            "scan_rotation_angle" : self.scan_rotation_angle,
+            "brightness" : self.brightness,
+            "contrast" : self.contrast,
+            "beam_shift_x" : self.beam_shift_x,
+            "beam_shift_y" : self.beam_shift_y,
+            "hv" : self.hv,
+            "beam_current" : self.beam_current,
+            "working_distance" : self.working_distance
+        }
+        return state_dict
+
+    def get_stage_position(self):
+        coords_dict = {
+            "x" : self.x,
+            "y" : self.y,
+            "z" : self.z,
+            "r" : self.r,
+            "t" : self.t,
+            "rotate_compucentric" : self.rotate_compucentric
+        }
+        return coords_dict
+
+    def update_stage_position(self, x=0, y=0, z=0, r=0, t=0):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.r = r
+        self.t = t
+
+
+@dataclass
+class ImageSettings:
+    resolution: str
+    dwell_time: float
+    horizontal_field_width: float
+    autocontrast: bool
+    beam_type: BeamType
+    sample_name: str
+    path : str
+    quadrant: int
+    bit_depth: int
+    drift_correction: bool
+    frame_integration: int
+
+
+@dataclass
+class Site:
+    """Queued stage position (metres, radians) and its HFW series
+    hfw_and_selections: [[hfw in um, selected, magnification label], ...] as in the GUI"""
+    x : float
+    y : float
+    z : float
+    r : float
+    t : float
+    hfw_and_selections : list
+    name : str = ''
+
+    def get_stage_position(self) -> np.ndarray:
+        return np.array([self.x, self.y, self.z, self.r, self.t])
+
+
+"""rough stage speeds for the travel estimate: xy and z in m/s, r and t in rad/s"""
+STAGE_SPEEDS = {'xy' : 2e-3, 'z' : 0.5e-3, 'r' : np.deg2rad(15), 't' : np.deg2rad(3)}
+
+
+def peak_rss():
+    """Peak resident set size of the process in bytes, None if it cannot be read"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    except Exception:
+        return None
+
+
+class BufferPool():
+    """Reusable arrays per (shape, dtype) for grabbed frames, display buffers and scratch
+    space, so that long runs do not allocate a new full-size array for every frame.
+    lease(shape, dtype) returns a free array (contents undefined) or a new one with one
+    owner, retain(array) adds an owner (the display, a worker still reading the frame) and
+    release(array) removes one: the array is recycled when the last owner has released it.
+    Arrays not leased from the pool are ignored by retain and release. Leases are tracked
+    by weak reference, a leased array that is dropped without release is simply freed.
+    At most max_free arrays are kept per (shape, dtype), further ones are left to the
+    garbage collector.
+    """
+    def __init__(self, max_free : int = 4):
+        self.max_free = max_free
+        self._free = {}
+        """id -> [weak reference, number of owners] of the leased arrays"""
+        self._leases = {}
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+        self.allocated_bytes = 0
+
+    def _lease_of(self, array):
+        lease = self._leases.get(id(array))
+        if lease is None or lease[0]() is not array:
+            return None
+        return lease
+
+    def lease(self, shape, dtype=np.uint8) -> np.ndarray:
+        key = (tuple(int(size) for size in shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reuses += 1
+                array = free.pop()
+            else:
+                self.allocations += 1
+                self.allocated_bytes += int(np.prod(key[0])) * np.dtype(dtype).itemsize
+                self._leases = {ident: lease for ident, lease in self._leases.items()
+                                if lease[0]() is not None}
+                array = np.empty(key[0], dtype=dtype)
+            self._leases[id(array)] = [weakref.ref(array), 1]
+        return array
+
+    def retain(self, array : np.ndarray) -> None:
+        with self._lock:
+            lease = self._lease_of(array)
+            if lease is not None:
+                lease[1] += 1
+
+    def release(self, array : np.ndarray) -> None:
+        with self._lock:
+            lease = self._lease_of(array)
+            if lease is None:
+                return
+            lease[1] -= 1
+            if lease[1] > 0:
+                return
+            del self._leases[id(array)]
+            free = self._free.setdefault((array.shape, array.dtype.str), [])
+            if len(free) < self.max_free:
+                free.append(array)
+
+    @contextmanager
+    def scratch(self, shape, dtype=np.uint8):
+        """with pool.scratch(shape, dtype) as buffer: temporary array, released on exit"""
+        buffer = self.lease(shape, dtype)
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._free = {}
+
+    def summary(self) -> str:
+        with self._lock:
+            pooled = sum(buffer.nbytes for free in self._free.values() for buffer in free)
+        peak = peak_rss()
+        return (f'buffer pool: {self.allocations} allocations '
+                f'({format_bytes(self.allocated_bytes)}), {self.reuses} reuses, '
+                f'{format_bytes(pooled)} pooled, peak RSS '
+                f'{format_bytes(peak) if peak is not None else "unknown"}')
+
+
+"""grabbed frames and processing scratch space of the whole process"""
+buffer_pool = BufferPool()
+
+
+def _metadata_value(metadata, path : str):
+    """metadata.<path> of an AdornedImage, None if missing"""
+    try:
+        for name in path.split('.'):
+            metadata = getattr(metadata, name)
+        return None if metadata is None else float(metadata)
+    except Exception:
+        return None
+
+
+class Frame():
+    """One frame: the pixel array and the parsed metadata, the pixels are never copied.
+    data: numpy array, for an AdornedImage a reference to its own buffer (image.data)
+    metadata: the AdornedImage metadata, None for plain arrays (demo mode, files)
+    pixel_size, horizontal_field_width (m), dwell_time (s): from the metadata, else from
+    the acquisition settings, None if unknown
+    timestamp: current_timestamp() format, state: MicroscopeState of the acquisition or None
+    pool: the BufferPool data was leased from, see release
+    """
+    __slots__ = ('data', 'metadata', 'pixel_size', 'horizontal_field_width',
+                 'dwell_time', 'timestamp', 'state', 'pool')
+
+    def __init__(self, data : np.ndarray, metadata=None,
+                 pixel_size : float = None,
+                 horizontal_field_width : float = None,
+                 dwell_time : float = None,
+                 timestamp : str = None,
+                 state : MicroscopeState = None,
+                 pool : BufferPool = None):
+        self.data = data
+        self.pool = pool
+        self.metadata = metadata
+        width = data.shape[1] if data.ndim > 1 else 0
+        if pixel_size is None and horizontal_field_width and width:
+            pixel_size = horizontal_field_width / width
+        if horizontal_field_width is None and pixel_size and width:
+            horizontal_field_width = pixel_size * width
+        self.pixel_size = pixel_size
+        self.horizontal_field_width = horizontal_field_width
+        self.dwell_time = dwell_time
+        self.timestamp = timestamp if timestamp is not None else current_timestamp()
+        self.state = state
+
+    @classmethod
+    def from_image(cls, image, horizontal_field_width : float = None,
+                   dwell_time : float = None, state : MicroscopeState = None) -> 'Frame':
+        """Frame of an AdornedImage, an array or a Frame (returned as it is, the missing
+        values filled in). The metadata of an AdornedImage wins over the arguments."""
+        if isinstance(image, Frame):
+            frame = image
+            if frame.horizontal_field_width is None and horizontal_field_width is not None:
+                frame.horizontal_field_width = horizontal_field_width
+                frame.pixel_size = horizontal_field_width / frame.data.shape[1]
+            if frame.dwell_time is None:
+                frame.dwell_time = dwell_time
+            if frame.state is None:
+                frame.state = state
+            return frame
+        if isinstance(image, np.ndarray):
+            return cls(image, horizontal_field_width=horizontal_field_width,
+                       dwell_time=dwell_time, state=state)
+        metadata = getattr(image, 'metadata', None)
+        pixel_size = _metadata_value(metadata, 'binary_result.pixel_size.x')
+        metadata_hfw = _metadata_value(metadata, 'optics.scan_field_of_view.width')
+        metadata_dwell_time = _metadata_value(metadata, 'scan_settings.dwell_time')
+        return cls(image_data(image), metadata=metadata, pixel_size=pixel_size,
+                   horizontal_field_width=metadata_hfw if metadata_hfw else horizontal_field_width,
+                   dwell_time=metadata_dwell_time if metadata_dwell_time else dwell_time,
+                   state=state)
+
+    def to_adorned_image(self):
+        """AdornedImage around the same pixel array, for the SDK and for saving with metadata"""
+        if self.metadata is None:
+            return AdornedImage(data=self.data)
+        return AdornedImage(data=self.data, metadata=self.metadata)
+
+    def release(self) -> None:
+        """Give up the lease of the pixel array, the frame must not be read afterwards
+        unless another owner has retained the array (see BufferPool)"""
+        if self.pool is not None:
+            self.pool.release(self.data)
+            self.pool = None
+
+    @property
+    def shape(self) -> tuple:
+        return self.data.shape
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    def __array__(self, dtype=None, copy=None):
+        return self.data if dtype is None else self.data.astype(dtype)
+
+    def __repr__(self):
+        return (f'Frame({self.data.shape}, {self.data.dtype}, pixel_size={self.pixel_size}, '
+                f'hfw={self.horizontal_field_width}, dwell_time={self.dwell_time}, '
+                f'timestamp={self.timestamp})')
+
+
+class FrameBudget():
+    """Frames held by name (the image, image_mod, current_image, images of the GUI)
+    within max_bytes of RAM. A value is None, an array, a Frame or a list of them, an
+    array held under several names is counted once. When the held arrays exceed
+    max_bytes, the least recently used names are spilled: their arrays are written to
+    .npy files in a temporary directory and replaced, under every name holding them, by
+    read-only memory maps (Frames are updated in place). get() loads a spilled value back
+    into RAM, spilling other names if needed. The name being set or read is never spilled,
+    so a single frame larger than the budget stays in RAM.
+    pool: the BufferPool of the frames, the budget retains the arrays it holds in RAM, so
+    they are not recycled while the GUI shows them
+    """
+    def __init__(self, max_bytes : int = 2 << 30, spill_dir : str = None,
+                 pool : BufferPool = None):
+        self.max_bytes = max_bytes
+        self.pool = pool
+        self._spill_dir = spill_dir
+        self._own_spill_dir = False
+        self._values = {}
+        self._holders = {}
+        self._held_bytes = 0
+        self._last_used = {}
+        self._clock = 0
+        self._lock = threading.RLock()
+        self.spills = 0
+        self.reloads = 0
+        self.spilled_bytes = 0
+
+    @staticmethod
+    def _arrays(value) -> list:
+        if isinstance(value, (list, tuple)):
+            return [array for item in value for array in FrameBudget._arrays(item)]
+        if isinstance(value, Frame):
+            return [value.data]
+        if isinstance(value, np.ndarray):
+            return [value]
+        return []
+
+    @staticmethod
+    def _replace(value, mapping : dict):
+        """value with its arrays replaced through mapping (id -> array), Frames in place"""
+        if isinstance(value, (list, tuple)):
+            return type(value)(FrameBudget._replace(item, mapping) for item in value)
+        if isinstance(value, Frame):
+            value.data = mapping.get(id(value.data), value.data)
+            return value
+        if isinstance(value, np.ndarray):
+            return mapping.get(id(value), value)
+        return value
+
+    def _hold(self, value, hold : bool = True) -> None:
+        """retain (or release) the arrays of the value in RAM, once per name, the names
+        holding every array are counted to keep the running total of held_bytes"""
+        arrays = {id(array): array for array in self._arrays(value)
+                  if not isinstance(array, np.memmap)}
+        for key, array in arrays.items():
+            if hold:
+                holder = self._holders.setdefault(key, [array, 0])
+                holder[1] += 1
+                if holder[1] == 1:
+                    self._held_bytes += array.nbytes
+            elif key in self._holders:
+                holder = self._holders[key]
+                holder[1] -= 1
+                if holder[1] == 0:
+                    self._held_bytes -= array.nbytes
+                    del self._holders[key]
+            else:
+                continue
+            if self.pool is not None:
+                if hold:
+                    self.pool.retain(array)
+                else:
+                    self.pool.release(array)
+
+    def _resident(self, names=None) -> dict:
+        """id -> array of the arrays in RAM held under names (all names by default)"""
+        names = self._values if names is None else names
+        return {id(array): array for name in names for array in self._arrays(self._values[name])
+                if not isinstance(array, np.memmap)}
+
+    @property
+    def held_bytes(self) -> int:
+        with self._lock:
+            return self._held_bytes
+
+    def _touch(self, name : str) -> None:
+        self._clock += 1
+        self._last_used[name] = self._clock
+
+    def _apply(self, mapping : dict) -> None:
+        for name in self._values:
+            self._values[name] = self._replace(self._values[name], mapping)
+
+    def _spill(self, name : str) -> None:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='sem_scan_frames_')
+            self._own_spill_dir = True
+        mapping = {}
+        for key, array in self._resident([name]).items():
+            file_name = os.path.join(self._spill_dir, 'frame_%06d.npy' % self.spills)
+            spilled = np.lib.format.open_memmap(file_name, mode='w+', dtype=array.dtype,
+                                                shape=array.shape)
+            spilled[...] = array
+            spilled.flush()
+            del spilled
+            mapping[key] = np.load(file_name, mmap_mode='r')
+            self.spills += 1
+            self.spilled_bytes += array.nbytes
+        for value in self._values.values():
+            self._hold([array for array in self._arrays(value) if id(array) in mapping], False)
+        self._apply(mapping)
+
+    def _enforce(self, keep : str) -> None:
+        for name in sorted(self._values, key=lambda name: self._last_used.get(name, 0)):
+            if self._held_bytes <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            """arrays shared with the kept name cannot be freed"""
+            kept = self._resident([keep])
+            if any(key not in kept for key in self._resident([name])):
+                self._spill(name)
+
+    def _remove_files(self, spilled : list) -> None:
+        """Remove the spill files no name holds any more"""
+        held = {id(array) for value in self._values.values() for array in self._arrays(value)}
+        for array in spilled:
+            if id(array) in held:
+                continue
+            try:
+                os.remove(array.filename)
+            except (TypeError, OSError):
+                """still mapped (Windows), removed by close()"""
+                pass
+
+    def set(self, name : str, value) -> None:
+        with self._lock:
+            previous = self._values.get(name)
+            if name in self._values and previous is value:
+                self._touch(name)
+                return
+            replaced = [array for array in self._arrays(previous) if isinstance(array, np.memmap)]
+            self._hold(value)
+            self._hold(previous, False)
+            self._values[name] = value
+            self._touch(name)
+            self._remove_files(replaced)
+            self._enforce(keep=name)
+
+    def get(self, name : str):
+        """The value, spilled arrays are loaded back into RAM"""
+        with self._lock:
+            value = self._values.get(name)
+            self._touch(name)
+            spilled = list({id(array): array for array in self._arrays(value)
+                            if isinstance(array, np.memmap)}.values())
+            if not spilled:
+                return value
+            self.reloads += len(spilled)
+            mapping = {id(array): np.array(array) for array in spilled}
+            self._apply(mapping)
+            reloaded = {id(array) for array in mapping.values()}
+            for held in self._values.values():
+                self._hold([array for array in self._arrays(held) if id(array) in reloaded])
+            self._remove_files(spilled)
+            self._enforce(keep=name)
+            return self._values[name]
+
+    def summary(self) -> str:
+        return (f'frames: {format_bytes(self.held_bytes)} of {format_bytes(self.max_bytes)} '
+                f'in RAM, {self.spills} spilled ({format_bytes(self.spilled_bytes)}), '
+                f'{self.reloads} reloaded')
+
+    def close(self) -> None:
+        """Forget the values and remove the spill files"""
+        with self._lock:
+            for value in self._values.values():
+                self._hold(value, False)
+            self._values = {}
+            self._holders, self._held_bytes = {}, 0
+            if self._own_spill_dir:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir, self._own_spill_dir = None, False
+
+
+def image_data(image) -> np.ndarray:
+    """Pixel array of a Frame or an AdornedImage, numpy arrays are returned as they are
+    (ndarray.data is a memoryview, not the pixels)"""
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, Frame):
+        return image.data
+    try:
+        return image.data
+    except:
+        return np.asarray(image)
+
+
+def current_timestamp():
+    return datetime.datetime.fromtimestamp(time.time()).strftime("%y%m%d.%H%M%S")
+
+
+
+def save_image(image, path=None, file_name=None, compression=None):
+    """compression: PIL tiff compression of numpy arrays and frames without metadata
+    (None, 'packbits', 'tiff_lzw', 'tiff_adobe_deflate'), AdornedImages are saved by the SDK"""
+    if not path:
+        path = os.getcwd()
+    if not file_name:
+        timestamp = current_timestamp()
+        file_name = "no_name_" + timestamp + '.tif'
+
+    file_name = os.path.join(path, file_name)
+    if isinstance(image, Frame):
+        image = image.to_adorned_image() if image.metadata is not None else image.data
+
+    if not isinstance(image, np.ndarray):
+        try:
+            """Adorned image needs only path"""
+            image.save(file_name)
+            return
+        except Exception as e:
+            print(f'error {e}, Image is not Adorned, trying to save numpy array to tiff')
+
+    try:
+        _im = Image.fromarray(image)
+        _im.save(file_name, compression=compression)
+    except Exception as e:
+        print(f'error {e}, Could not save the image')
+
+
+
+def load_image(file_path):
+    # image = Image.open(file_path).convert('L') # load image .tiff .png .jpg, convert to grayscale
+    # image = np.array(image, dtype=np.float64)
+    """tif and npy are read without matplotlib, so that headless runs never import it"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.npy':
+        return np.load(file_path)
+    if extension in ('.tif', '.tiff'):
+        return np.asarray(Image.open(file_path))
+    import matplotlib.pyplot as plt
+    image = plt.imread(file_path)
+    return image
+
+
+
+def enhance_contrast(image, clipLimit=1.0, tileGridSize=8):
+    # if image.dtype == 'float64' or 'uint64':
+    #     pass
+
+    # the images needs to be 8bit, otherwise the algorithm does not work TODO fix 8-bit to any-bit
+    image = image_data(image)
+    if image.dtype not in (np.uint8, np.uint16, np.int16, np.int32, np.float32, np.float64):
+        image = image.astype(np.float32)
+    high = float(image.max())
+
+    tileGridSize = int(tileGridSize)
+    clahe = cv2.createCLAHE(clipLimit=clipLimit,
+                            tileGridSize=(tileGridSize, tileGridSize))
+    """8-bit scaled copy in pooled scratch space instead of float64 temporaries"""
+    with buffer_pool.scratch(image.shape[:2], np.uint8) as scaled:
+        cv2.convertScaleAbs(image, dst=scaled, alpha=2 ** 8 / high if high > 0 else 1.0)
+        image = clahe.apply(scaled)
+    return image
+
+
+def equalise_histogram(image, bitdepth=8):
+    _image = image_data(image)
+
+    # _image = _image / _image.max()
+    # _image = (_image * 2 ** bitdepth).astype("uint8")
+
+    _image = cv2.equalizeHist(_image)
+    return _image
+
+
+def resize(image, size=(200,200)):
+    return cv2.resize(image, size)
+
+
+def display_image(image, size, out=None) -> np.ndarray:
+    """8-bit copy of the image for the display, area-downsampled by an integer factor
+    to fit into size = (width, height) pixels and stretched to the full 0-255 range.
+    The out buffer is reused when its shape matches.
+    """
+    _image = image_data(image)
+    converted = None
+    if _image.dtype not in (np.uint8, np.uint16, np.float32):
+        converted = buffer_pool.lease(_image.shape, np.float32)
+        np.copyto(converted, _image, casting='unsafe')
+        _image = converted
+
+    """integer binning keeps cv2.INTER_AREA on its fast path, into pooled scratch space"""
+    height, width = _image.shape[:2]
+    binning = int(np.ceil(max(width / size[0], height / size[1])))
+    binned = None
+    if binning > 1:
+        binned_width, binned_height = max(1, width // binning), max(1, height // binning)
+        binned = buffer_pool.lease((binned_height, binned_width) + _image.shape[2:], _image.dtype)
+        _image = cv2.resize(_image, (binned_width, binned_height), dst=binned,
+                            interpolation=cv2.INTER_AREA)
+
+    low, high = float(_image.min()), float(_image.max())
+    alpha = 255.0 / (high - low) if high > low else 1.0
+    if out is None or out.shape != _image.shape:
+        out = np.empty(_image.shape, dtype=np.uint8)
+    cv2.convertScaleAbs(_image, dst=out, alpha=alpha, beta=-low * alpha)
+    buffer_pool.release(converted)
+    buffer_pool.release(binned)
+    return out
+
+
+def _fast_fft_size(n):
+    """Largest 5-smooth number <= n, FFTs of such sizes are the fastest"""
+    while n > 1:
+        m = n
+        for p in (2, 3, 5):
+            while m % p == 0:
+                m //= p
+        if m == 1:
+            return n
+        n -= 1
+    return 1
+
+
+def downsample_for_analysis(image, max_size=512):
+    """Reduce the image to at most max_size pixels along the longest side
+    using area averaging and crop the centre to an FFT-friendly shape.
+    Returns float32 array and the integer binning factor
+    """
+    _image = image_data(image)
+    if _image.dtype not in (np.uint8, np.uint16, np.float32):
+        _image = _image.astype(np.float32)
+
+    height, width = _image.shape[:2]
+    binning = max(1, int(np.ceil(max(height, width) / max_size)))
+    if binning > 1:
+        _image = cv2.resize(_image, (width // binning, height // binning),
+                            interpolation=cv2.INTER_AREA)
+
+    height, width = _image.shape[:2]
+    fft_height, fft_width = _fast_fft_size(height), _fast_fft_size(width)
+    y0, x0 = (height - fft_height) // 2, (width - fft_width) // 2
+    _image = _image[y0:y0 + fft_height, x0:x0 + fft_width]
+    return _image.astype(np.float32), binning
+
+
+def crop_to_field_width(image, ratio):
+    """Magnify the central part of the image covering ratio (<1) of its field of view
+    back to the original shape, sub-pixel accurate about the image centre
+    """
+    height, width = image.shape[:2]
+    cx, cy = (width - 1) / 2, (height - 1) / 2
+    matrix = np.float32([[1 / ratio, 0, cx * (1 - 1 / ratio)],
+                         [0, 1 / ratio, cy * (1 - 1 / ratio)]])
+    return cv2.warpAffine(image, matrix, (width, height), flags=cv2.INTER_LINEAR)
+
+
+def _subpixel_peak(surface, index):
+    """Three-point Gaussian (log-parabolic) interpolation of a peak on a periodic surface"""
+    height, width = surface.shape
+    iy, ix = index
+    c = surface[iy, ix]
+    up, down = surface[(iy - 1) % height, ix], surface[(iy + 1) % height, ix]
+    left, right = surface[iy, (ix - 1) % width], surface[iy, (ix + 1) % width]
+    if min(c, up, down, left, right) > 0:
+        c, up, down, left, right = np.log([c, up, down, left, right])
+
+    denominator_y = up - 2 * c + down
+    denominator_x = left - 2 * c + right
+    dy = 0.5 * (up - down) / denominator_y if denominator_y != 0 else 0.0
+    dx = 0.5 * (left - right) / denominator_x if denominator_x != 0 else 0.0
+
+    # wrap the peak position into the (-N/2, N/2] range
+    y = iy + dy
+    x = ix + dx
+    if y > height / 2: y -= height
+    if x > width / 2: x -= width
+    return x, y
+
+
+_hann_windows = {}
+_correlation_filters = {}
+_derotation_matrices = {}
+
+
+def hann_window(shape) -> np.ndarray:
+    """2D Hann window, cached per shape"""
+    if shape not in _hann_windows:
+        _hann_windows[shape] = np.outer(np.hanning(shape[0]),
+                                        np.hanning(shape[1])).astype(np.float32)
+    return _hann_windows[shape]
+
+
+def _correlation_lowpass(shape) -> np.ndarray:
+    """Gaussian low-pass in the rfft2 layout, turns the correlation delta-peak
+    into a ~1 pixel wide Gaussian that can be interpolated reliably"""
+    if shape not in _correlation_filters:
+        fy = np.fft.fftfreq(shape[0])[:, None]
+        fx = np.fft.rfftfreq(shape[1])[None, :]
+        _correlation_filters[shape] = np.exp(-(fx ** 2 + fy ** 2) / (2 * 0.15 ** 2))
+    return _correlation_filters[shape]
+
+
+def windowed_spectrum(image) -> np.ndarray:
+    """rfft2 of the mean-subtracted, Hann-windowed image"""
+    image = image - image.mean()
+    return np.fft.rfft2(image * hann_window(image.shape))
+
+
+def phase_correlation(spectrum, reference_spectrum, shape) -> tuple:
+    """Shift of the image features relative to the reference from their spectra
+    Returns
+    -------
+    (shift_x, shift_y, peak) shift in pixels with sub-pixel accuracy,
+    peak height (0 - 1) is a measure of the confidence
+    """
+    cross_power = spectrum * np.conj(reference_spectrum)
+    cross_power /= np.abs(cross_power) + 1e-12
+    cross_power *= _correlation_lowpass(shape)
+    surface = np.fft.irfft2(cross_power, s=shape)
+    index = np.unravel_index(np.argmax(surface), surface.shape)
+    shift_x, shift_y = _subpixel_peak(surface, index)
+    return shift_x, shift_y, float(surface[index])
+
+
+class DriftTracker():
+    """Phase-correlation drift estimator for time and HFW series.
+    Frames are downsampled, windowed and Fourier transformed once, the spectrum
+    of the last frame is cached and serves as the reference for the next one.
+    Drift is returned in metres relative to the first frame of the series:
+    +x means the features moved to the right, +y means they moved down in the image.
+    """
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self.reset()
+
+    def reset(self):
+        self._reference = None
+        self._reference_fft = None
+        self._reference_hfw = None
+        self._reference_offset = np.zeros(2)
+        self.last_peak = 0.0
+
+    def _spectrum(self, image):
+        return windowed_spectrum(image)
+
+    def _correlate(self, spectrum, reference_spectrum, shape):
+        shift_x, shift_y, self.last_peak = phase_correlation(spectrum, reference_spectrum, shape)
+        return shift_x, shift_y
+
+    def set_reference(self, image, hfw: float, offset=(0.0, 0.0)):
+        small, _ = downsample_for_analysis(image, max_size=self.max_size)
+        self._reference = small
+        self._reference_fft = self._spectrum(small)
+        self._reference_hfw = hfw
+        self._reference_offset = np.asarray(offset, dtype=float)
+
+    def shift_to_reference(self, image) -> tuple:
+        """Shift of the image features relative to the reference frame
+        in full-resolution pixels, the reference is kept unchanged"""
+        small, binning = downsample_for_analysis(image, max_size=self.max_size)
+        shift_x, shift_y = self._correlate(self._spectrum(small), self._reference_fft, small.shape)
+        return shift_x * binning, shift_y * binning
+
+    def measure(self, image, hfw: float) -> tuple:
+        """Measure the drift of the image relative to the first frame of the series,
+        the image becomes the reference for the next measurement.
+        Returns
+        -------
+        (drift_x, drift_y) in metres
+        """
+        small, binning = downsample_for_analysis(image, max_size=self.max_size)
+
+        if self._reference is None or self._reference.shape != small.shape:
+            self.set_reference(image, hfw)
+            return 0.0, 0.0
+
+        spectrum = self._spectrum(small)
+        if np.isclose(hfw, self._reference_hfw):
+            shift_x, shift_y = self._correlate(spectrum, self._reference_fft, small.shape)
+            field_width = hfw
+        elif hfw < self._reference_hfw:
+            # zooming in: compare with the matching central part of the reference
+            reference = crop_to_field_width(self._reference, hfw / self._reference_hfw)
+            shift_x, shift_y = self._correlate(spectrum, self._spectrum(reference), small.shape)
+            field_width = hfw
+        else:
+            # zooming out: compare the central part of the current frame with the reference
+            current = crop_to_field_width(small, self._reference_hfw / hfw)
+            shift_x, shift_y = self._correlate(self._spectrum(current), self._reference_fft, small.shape)
+            field_width = self._reference_hfw
+
+        full_width = image_data(image).shape[1]
+        pixel_size = field_width * binning / full_width
+        drift = np.array([shift_x, shift_y]) * pixel_size + self._reference_offset
+
+        self._reference = small
+        self._reference_fft = spectrum
+        self._reference_hfw = hfw
+        self._reference_offset = drift
+        return float(drift[0]), float(drift[1])
+
+
+class BeamShiftCalibration():
+    """Mapping from image displacements to beam shift, cached per HFW and scan rotation.
+    A matrix gives the beam shift (x, y) in metres that moves the image features by
+    (dx, dy) field widths, image y pointing down. HFWs within hfw_tolerance (relative)
+    and rotations within rotation_tolerance (rad) share a calibration. Without a
+    calibration at the HFW the closest one at the same rotation is scaled with the HFW,
+    without any the nominal mapping is used (beam shift axes along the unrotated image).
+    A non-positive HFW (an unread state) has no cached calibration.
+    """
+    def __init__(self, hfw_tolerance: float = 0.02, rotation_tolerance: float = np.deg2rad(0.5)):
+        self.hfw_tolerance = hfw_tolerance
+        self.rotation_tolerance = rotation_tolerance
+        self.matrices = {}
+
+    def _key(self, hfw, rotation):
+        """None for a non-positive or undefined HFW"""
+        if not np.isfinite(hfw) or hfw <= 0:
+            return None
+        rotation = np.mod(rotation, 2 * np.pi)
+        return (int(round(np.log(hfw) / np.log(1 + self.hfw_tolerance))),
+                int(round(rotation / self.rotation_tolerance)) % int(round(2 * np.pi / self.rotation_tolerance)))
+
+    @staticmethod
+    def nominal(hfw: float, rotation: float = 0.0) -> np.ndarray:
+        cos, sin = np.cos(rotation), np.sin(rotation)
+        return hfw * np.array([[cos, -sin], [sin, cos]]) @ np.diag([-1.0, 1.0])
+
+    def store(self, hfw: float, rotation: float, matrix) -> None:
+        key = self._key(hfw, rotation)
+        if key is None:
+            print(f'beam shift calibration at HFW {hfw} is not stored')
+            return
+        self.matrices[key] = (hfw, np.asarray(matrix, dtype=float))
+
+    def lookup(self, hfw: float, rotation: float = 0.0):
+        """(matrix, calibrated), calibrated is False for the nominal mapping"""
+        key = self._key(hfw, rotation)
+        if key is None:
+            return self.nominal(hfw, rotation), False
+        if key in self.matrices:
+            return self.matrices[key][1], True
+        same_rotation = [value for other, value in self.matrices.items() if other[1] == key[1]]
+        if same_rotation:
+            calibrated_hfw, matrix = min(same_rotation, key=lambda value: abs(np.log(value[0] / hfw)))
+            return matrix * hfw / calibrated_hfw, True
+        return self.nominal(hfw, rotation), False
+
+    def beam_shift_for(self, displacement, field_width: float, hfw: float,
+                       rotation: float = 0.0) -> np.ndarray:
+        """Beam shift change in metres that moves the image features by
+        displacement (dx, dy) pixels of an image field_width pixels wide"""
+        matrix, _ = self.lookup(hfw, rotation)
+        return matrix @ (np.asarray(displacement, dtype=float) / field_width)
+
+
+class PowerSpectrum():
+    """Log power spectrum of live frames and astigmatism estimate from its ellipticity.
+    The frame is downsampled, the central size x size square is Hann-windowed and
+    transformed with rfft2. The window, frequency grids, masks and the index map that
+    unfolds the half-plane spectrum for display are cached per shape and reused.
+    Astigmatism is estimated from the second moments of the spectral power above the
+    noise floor: magnitude = (l1 - l2) / (l1 + l2) of the moment eigenvalues (0 - round),
+    angle = direction of the long axis of the spectrum in degrees from the image x-axis.
+    """
+    def __init__(self, size: int = 256, f_min: float = 0.02, f_max: float = 0.35):
+        self.size = size
+        self.f_min = f_min
+        self.f_max = f_max
+        self._cache = {}
+
+    def _grids(self, shape):
+        if shape not in self._cache:
+            height, width = shape
+            fy = np.fft.fftfreq(height)[:, None]
+            fx = np.fft.rfftfreq(width)[None, :]
+            radius = np.sqrt(fx ** 2 + fy ** 2)
+            band = (radius >= self.f_min) & (radius <= self.f_max)
+            """display index map: full spectrum with the zero frequency in the centre"""
+            rows = np.arange(height)[:, None] - height // 2
+            cols = np.arange(width)[None, :] - width // 2
+            negative = cols < 0
+            map_rows = np.where(negative, -rows, rows) % height
+            map_cols = np.abs(cols) + np.zeros_like(rows)
+            self._cache[shape] = {
+                'window': np.outer(np.hanning(height), np.hanning(width)).astype(np.float32),
+                'fxx': (fx * fx * np.ones_like(fy))[band],
+                'fyy': (fy * fy * np.ones_like(fx))[band],
+                'fxy': (fx * fy)[band],
+                'band': band,
+                'noise': radius > self.f_max,
+                'display': (map_rows, map_cols),
+            }
+        return self._cache[shape]
+
+    def compute(self, image) -> tuple:
+        """Returns
+        -------
+        (display uint8 image of the log power spectrum, astigmatism magnitude, angle in degrees)
+        """
+        small, _ = downsample_for_analysis(image, max_size=2 * self.size)
+        height, width = small.shape
+        size = min(self.size, height, width)
+        y0, x0 = (height - size) // 2, (width - size) // 2
+        small = small[y0:y0 + size, x0:x0 + size]
+
+        grids = self._grids(small.shape)
+        spectrum = np.fft.rfft2((small - small.mean()) * grids['window'])
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+
+        noise_floor = np.median(power[grids['noise']])
+        weights = np.clip(power[grids['band']] - noise_floor, 0, None)
+        total = weights.sum()
+        if total > 0:
+            mxx = np.dot(weights, grids['fxx']) / total
+            myy = np.dot(weights, grids['fyy']) / total
+            mxy = np.dot(weights, grids['fxy']) / total
+            magnitude = float(np.hypot(mxx - myy, 2 * mxy) / (mxx + myy))
+            angle = float(np.rad2deg(0.5 * np.arctan2(2 * mxy, mxx - myy)) % 180)
+        else:
+            magnitude, angle = 0.0, 0.0
+
+        log_power = np.log1p(power[grids['display']])
+        low, high = np.percentile(log_power[::4, ::4], (1, 99.9))
+        display = np.clip((log_power - low) * (255 / max(high - low, 1e-6)), 0, 255).astype(np.uint8)
+        return display, magnitude, angle
+
+
+class IntensityHistogram():
+    """Live intensity histogram and statistics of a frame.
+    uint8/uint16 frames are counted with np.bincount over the full detector range
+    (256 or 65536 levels), other dtypes are clipped to their observed range first.
+    Frames larger than max_pixels are subsampled with a constant stride in x and y.
+    min, max, mean and the fraction of pixels at the bottom/top of the range are all
+    derived from the counts, the display image buffer is reused between frames.
+    """
+    def __init__(self, width: int = 256, height: int = 64, max_pixels: int = 1 << 20):
+        self.width = width
+        self.height = height
+        self.max_pixels = max_pixels
+        self._display = np.zeros((height, width), dtype=np.uint8)
+        self._rows = np.arange(height, 0, -1)[:, None]
+
+    def _counts(self, data):
+        if data.dtype == np.uint8 or data.dtype == np.uint16:
+            levels = 256 if data.dtype == np.uint8 else 65536
+            return np.bincount(data.ravel(), minlength=levels), 0.0, 1.0
+        low, high = float(data.min()), float(data.max())
+        scale = 255 / (high - low) if high > low else 0.0
+        levels = cv2.convertScaleAbs(data.astype(np.float32), alpha=scale, beta=-low * scale)
+        return np.bincount(levels.ravel(), minlength=256), low, 1 / scale if scale else 1.0
+
+    def compute(self, image) -> tuple:
+        """Returns
+        -------
+        (display uint8 image of the histogram, dict of min, max, mean, saturated_low, saturated_high)
+        saturation values are fractions of the counted pixels
+        """
+        data = image_data(image)
+        if data.ndim == 3:
+            data = data[..., 0]
+        stride = int(np.ceil(np.sqrt(data.size / self.max_pixels)))
+        if stride > 1:
+            data = data[::stride, ::stride]
+
+        counts, offset, step = self._counts(data)
+        total = data.size
+        occupied = np.flatnonzero(counts)
+        levels = np.arange(counts.size)
+        stats = {
+            'min': offset + step * occupied[0],
+            'max': offset + step * occupied[-1],
+            'mean': offset + step * np.dot(counts, levels) / total,
+            'saturated_low': counts[0] / total,
+            'saturated_high': counts[-1] / total,
+        }
+
+        """display: counts rebinned to the display width, square-root scaled"""
+        bins = counts[:counts.size - counts.size % self.width].reshape(self.width, -1).sum(axis=1)
+        heights = np.sqrt(bins / max(bins.max(), 1)) * self.height
+        np.multiply(self._rows <= heights[None, :], 255, out=self._display, casting='unsafe')
+        return self._display, stats
+
+
+def intensity_signature(image, max_pixels: int = 1 << 16) -> np.ndarray:
+    """Mean, standard deviation and the fractions of pixels at the bottom and top of the
+    range, intensities as fractions of the full scale of the frame (8 or 16 bit, or the
+    frame maximum for other types). Computed on a strided subsample of the frame."""
+    data = image_data(image)
+    stride = max(1, int(np.sqrt(data.shape[0] * data.shape[1] / max_pixels)))
+    sample = data[::stride, ::stride].astype(np.float32)
+    if data.dtype == np.uint8 or data.dtype == np.uint16:
+        full_scale = float(np.iinfo(data.dtype).max)
+    else:
+        full_scale = max(float(sample.max()), 1.0)
+    sample /= full_scale
+    return np.array([sample.mean(), sample.std(),
+                     np.mean(sample <= 0.0), np.mean(sample >= 1.0)])
+
+
+class AutocontrastCache():
+    """Detector brightness and contrast found by the auto-CB routine, per imaging
+    conditions: (detector, quadrant, HV to 10 V, beam current to 2 %, HFW in buckets of
+    ratio hfw_bucket). The first frame taken with cached values is the reference
+    intensity signature of the entry, a later frame whose mean or spread differ from it by
+    more than tolerance (fraction of the full scale), or with saturation_tolerance more
+    saturated pixels, invalidates the entry so that auto-CB runs again.
+    """
+    def __init__(self, tolerance: float = 0.08, saturation_tolerance: float = 0.02,
+                 hfw_bucket: float = 2.0):
+        self.tolerance = tolerance
+        self.saturation_tolerance = saturation_tolerance
+        self.hfw_bucket = hfw_bucket
+        self.entries = {}
+        self.hits = 0
+        self.runs = 0
+        self.invalidations = 0
+
+    def key(self, detector, quadrant: int, hv: float, beam_current: float, hfw: float) -> tuple:
+        return (str(detector), int(quadrant),
+                int(round(hv / 10)),
+                int(round(np.log(beam_current) / np.log(1.02))) if beam_current > 0 else 0,
+                int(round(np.log(hfw) / np.log(self.hfw_bucket))) if hfw > 0 else 0)
+
+    def get(self, key):
+        """(brightness, contrast) or None"""
+        if key not in self.entries:
+            return None
+        self.hits += 1
+        return self.entries[key][:2]
+
+    def store(self, key, brightness: float, contrast: float) -> None:
+        self.runs += 1
+        self.entries[key] = (brightness, contrast, None)
+
+    def check(self, key, image) -> bool:
+        """Compare the frame with the reference of the entry, returns True if the intensities
+        drifted beyond the tolerance (the entry is removed)"""
+        if key not in self.entries:
+            return False
+        brightness, contrast, reference = self.entries[key]
+        signature = intensity_signature(image)
+        if reference is None:
+            self.entries[key] = (brightness, contrast, signature)
+            return False
+        difference = np.abs(signature - reference)
+        if difference[0] > self.tolerance or difference[1] > self.tolerance or \
+                signature[2] - reference[2] > self.saturation_tolerance or \
+                signature[3] - reference[3] > self.saturation_tolerance:
+            del self.entries[key]
+            self.invalidations += 1
+            return True
+        return False
+
+    def clear(self) -> None:
+        self.entries = {}
+
+
+"""dwell times offered by the microscope software, used when the SDK does not list them"""
+DWELL_TIMES = (25e-9, 50e-9, 100e-9, 200e-9, 300e-9, 500e-9,
+               1e-6, 2e-6, 3e-6, 5e-6, 10e-6, 20e-6, 30e-6, 50e-6, 100e-6)
+
+_noise_kernel = np.float32([[1, -2, 1], [-2, 4, -2], [1, -2, 1]])
+
+
+def estimate_noise(image, max_size: int = 1024) -> float:
+    """Standard deviation of the pixel noise (Immerkaer 1996): the Laplacian difference
+    kernel cancels smooth structure, the mean absolute response scales to sigma.
+    Larger frames are cropped to the central max_size x max_size pixels."""
+    data = image_data(image)
+    height, width = data.shape[:2]
+    y0, x0 = max(0, (height - max_size) // 2), max(0, (width - max_size) // 2)
+    data = data[y0:y0 + max_size, x0:x0 + max_size].astype(np.float32)
+    response = cv2.filter2D(data, cv2.CV_32F, _noise_kernel)[1:-1, 1:-1]
+    return float(np.sqrt(np.pi / 2) / 6 * np.mean(np.abs(response)))
+
+
+def estimate_snr(image) -> tuple:
+    """(signal to noise ratio, noise sigma): standard deviation of the specimen signal,
+    the frame variance without the noise variance, over the noise"""
+    data = image_data(image)
+    noise = estimate_noise(data)
+    stride = max(1, int(np.sqrt(data.shape[0] * data.shape[1] / (1 << 18))))
+    variance = float(np.var(data[::stride, ::stride].astype(np.float32)))
+    signal = np.sqrt(max(variance - noise ** 2, 0.0))
+    return (signal / noise if noise > 0 else np.inf), noise
+
+
+def choose_dwell_time(snr: float, dwell_time: float, target_snr: float,
+                      dwell_times=DWELL_TIMES) -> float:
+    """Shortest of dwell_times reaching target_snr, from the snr measured at dwell_time,
+    shot noise: the snr grows with the square root of the dwell time.
+    The longest dwell time if none reaches it."""
+    dwell_times = sorted(dwell_times)
+    if snr <= 0:
+        return dwell_times[-1]
+    required = dwell_time * (target_snr / snr) ** 2
+    for candidate in dwell_times:
+        if candidate >= required * (1 - 1e-6):
+            return candidate
+    return dwell_times[-1]
+
+
+def sharpness(image) -> float:
+    """Focus metric: gradient energy (central differences) of the 2x2 binned image
+    normalised by the squared mean intensity, independent of the brightness level
+    and not rewarding the noise of out-of-focus frames"""
+    _image = image_data(image)
+    height, width = (_image.shape[0] // 2) * 2, (_image.shape[1] // 2) * 2
+    _image = _image[:height, :width].astype(np.float32)
+    _image = _image[0::2, 0::2] + _image[1::2, 0::2] + _image[0::2, 1::2] + _image[1::2, 1::2]
+    gx = _image[:, 2:] - _image[:, :-2]
+    gy = _image[2:, :] - _image[:-2, :]
+    energy = np.mean(gx * gx) + np.mean(gy * gy)
+    return float(energy / (np.mean(_image) ** 2 + 1e-12))
+
+
+def fit_parabola_vertex(x, y):
+    """Position of the extremum of the parabola through the points (x, y),
+    None if the parabola opens upwards (no maximum)"""
+    x = np.asarray(x, dtype=float)
+    x0, scale = x.mean(), np.ptp(x) or 1.0
+    a, b, _ = np.polyfit((x - x0) / scale, np.asarray(y, dtype=float), 2)
+    if a >= 0:
+        return None
+    return x0 - b / (2 * a) * scale
+
+
+def simulated_specimen(shape=(512, 768), seed=0) -> np.ndarray:
+    """Synthetic specimen texture for the demo mode: blobs of several sizes, float32 in [0, 1]"""
+    rng = np.random.default_rng(seed)
+    specimen = np.zeros(shape, dtype=np.float32)
+    for sigma in (1, 3, 8):
+        specimen += cv2.GaussianBlur(rng.random(shape).astype(np.float32), (0, 0), sigma) * sigma
+    specimen -= specimen.min()
+    return specimen / specimen.max()
+
+
+def _grid_size(height, width, size):
+    """FFT-friendly working grid with size pixels along the longest side"""
+    if width >= height:
+        return _fast_fft_size(max(8, int(round(size * height / width)))), size
+    return size, _fast_fft_size(max(8, int(round(size * width / height))))
+
+
+def register_zoom(low, low_hfw : float, high, high_hfw : float,
+                  levels : tuple = (128, 512)) -> tuple:
+    """Locate the higher-magnification frame inside the lower-magnification one.
+    The scale follows from the HFW ratio, the translation is refined by phase correlation
+    on a coarse-to-fine pyramid of working grids covering the field of the high frame
+    (levels: grid size along the longest side, sizes should be 5-smooth).
+    Both frames are area-downsampled before resampling, so no level aliases.
+    Returns
+    -------
+    (matrix, peak): 2x3 affine matrix mapping high-frame pixel coordinates (x, y)
+        to low-frame pixel coordinates, correlation peak height of the finest level
+    """
+    low = image_data(low)
+    high = image_data(high)
+    if low.dtype not in (np.uint8, np.uint16, np.float32):
+        low = low.astype(np.float32)
+    if high.dtype not in (np.uint8, np.uint16, np.float32):
+        high = high.astype(np.float32)
+    low_height, low_width = low.shape[:2]
+    high_height, high_width = high.shape[:2]
+
+    """high pixel -> low pixel: x_low = scale * x_high + offset"""
+    scale = (high_hfw / low_hfw) * (low_width / high_width)
+    offset = np.array([(low_width - 1) / 2 - scale * (high_width - 1) / 2,
+                       (low_height - 1) / 2 - scale * (high_height - 1) / 2])
+    peak = 0.0
+
+    for size in levels:
+        grid_height, grid_width = _grid_size(high_height, high_width, size)
+        kx, ky = high_width / grid_width, high_height / grid_height
+        high_grid = cv2.resize(high, (grid_width, grid_height),
+                               interpolation=cv2.INTER_AREA).astype(np.float32)
+
+        """grid -> low pixel coordinates, through an integer pre-binning of the low frame"""
+        binning = max(1, int(scale * min(kx, ky)))
+        low_binned = low if binning == 1 else \
+            cv2.resize(low, (low_width // binning, low_height // binning), interpolation=cv2.INTER_AREA)
+        to_low = np.array([[scale * kx, 0, scale * (0.5 * kx - 0.5) + offset[0]],
+                           [0, scale * ky, scale * (0.5 * ky - 0.5) + offset[1]]])
+        to_binned = to_low / binning
+        to_binned[:, 2] += 0.5 / binning - 0.5
+        low_grid = cv2.warpAffine(low_binned, to_binned, (grid_width, grid_height),
+                                  flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                                  borderMode=cv2.BORDER_REFLECT).astype(np.float32)
+
+        shift_x, shift_y, peak = phase_correlation(windowed_spectrum(high_grid),
+                                                   windowed_spectrum(low_grid),
+                                                   (grid_height, grid_width))
+        offset -= np.array([shift_x * scale * kx, shift_y * scale * ky])
+
+    matrix = np.array([[scale, 0, offset[0]],
+                       [0, scale, offset[1]]])
+    return matrix, peak
+
+
+def compose_affine(outer, inner) -> np.ndarray:
+    """2x3 affine matrix of the composition outer(inner(x))"""
+    return (np.vstack([outer, [0, 0, 1]]) @ np.vstack([inner, [0, 0, 1]]))[:2]
+
+
+class ZoomSeriesRegistration():
+    """Registers a series of decreasing HFW frames of the same spot into the common
+    coordinate frame of the first (widest) frame. Only the previous frame is kept.
+    If the HFW grows, the chain restarts with the frame as the new base.
+    """
+    def __init__(self, levels : tuple = (128, 512)):
+        self.levels = levels
+        self.reset()
+
+    def reset(self):
+        buffer_pool.release(getattr(self, '_previous', None))
+        self._previous = None
+        self._previous_hfw = None
+        self._previous_transform = None
+        self.transforms = []
+        self.peaks = []
+
+    def add(self, image, hfw : float) -> np.ndarray:
+        """Register the frame to the previous one
+        Returns
+        -------
+        2x3 affine matrix mapping the frame pixels into the base frame pixels
+        """
+        if self._previous is None or hfw > self._previous_hfw * (1 + 1e-6):
+            transform = np.array([[1.0, 0, 0], [0, 1.0, 0]])
+            peak = 1.0
+        else:
+            matrix, peak = register_zoom(self._previous, self._previous_hfw, image, hfw,
+                                         levels=self.levels)
+            transform = compose_affine(self._previous_transform, matrix)
+
+        """the previous frame is kept after its owner has released it"""
+        buffer_pool.release(self._previous)
+        self._previous = image_data(image)
+        buffer_pool.retain(self._previous)
+        self._previous_hfw = hfw
+        self._previous_transform = transform
+        self.transforms.append(transform)
+        self.peaks.append(peak)
+        return transform
+
+
+def export_zoom_overlay(frames : list, transforms : list, path : str,
+                        file_name : str = 'overlay') -> list:
+    """Correlative pyramid: for every frame of the registered series save a copy with all
+    the higher-magnification frames pasted in at their registered positions
+    frames: list of file names or images, widest field first
+    transforms: 2x3 matrices to the base frame coordinates (ZoomSeriesRegistration.transforms)
+    Returns list of saved file names
+    """
+    saved = []
+    for level in range(len(frames)):
+        canvas = frames[level]
+        canvas = load_image(canvas) if isinstance(canvas, str) else image_data(canvas)
+        dtype = canvas.dtype
+        canvas = canvas.astype(np.float32)
+        height, width = canvas.shape[:2]
+        base_to_level = cv2.invertAffineTransform(np.float64(transforms[level]))
+
+        for inner in range(level + 1, len(frames)):
+            patch = frames[inner]
+            patch = load_image(patch) if isinstance(patch, str) else image_data(patch)
+            patch = patch.astype(np.float32)
+            to_level = compose_affine(base_to_level, transforms[inner])
+            warped = cv2.warpAffine(patch, to_level, (width, height), flags=cv2.INTER_AREA)
+            mask = cv2.warpAffine(np.ones(patch.shape[:2], np.float32), to_level, (width, height),
+                                  flags=cv2.INTER_NEAREST)
+            canvas = np.where(mask > 0, warped, canvas)
+
+        if np.issubdtype(dtype, np.integer):
+            limits = np.iinfo(dtype)
+            canvas = np.clip(np.rint(canvas), limits.min, limits.max)
+        name = os.path.join(path, file_name + '_%03d.tif' % level)
+        Image.fromarray(canvas.astype(dtype)).save(name)
+        saved.append(name)
+    return saved
+
+
+def shift_image(image, shift_x, shift_y, out=None):
+    """Sub-pixel translation of the image by (shift_x, shift_y) pixels,
+    the edges are filled by replicating the border pixels"""
+    if image.dtype not in (np.uint8, np.uint16, np.float32):
+        image = image.astype(np.float32)
+    height, width = image.shape[:2]
+    matrix = np.float32([[1, 0, shift_x], [0, 1, shift_y]])
+    return cv2.warpAffine(image, matrix, (width, height), dst=out,
+                          flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def derotation_matrix(angle, shape) -> np.ndarray:
+    """Affine map (for cv2.WARP_INVERSE_MAP) from the reference orientation to a frame
+    scanned at the scan rotation angle (rad) relative to it, about the image centre.
+    The image content turns by -angle with the scan rotation. Cached per angle and shape."""
+    key = (round(float(angle), 9), tuple(shape[:2]))
+    if key not in _derotation_matrices:
+        height, width = shape[:2]
+        cos, sin = np.cos(angle), np.sin(angle)
+        rotation = np.array([[cos, -sin], [sin, cos]])
+        centre = np.array([(width - 1) / 2, (height - 1) / 2])
+        _derotation_matrices[key] = np.float32(np.column_stack([rotation, centre - rotation @ centre]))
+    return _derotation_matrices[key]
+
+
+def derotate(image, angle, out=None) -> np.ndarray:
+    """Turn a frame scanned at the relative scan rotation angle (rad) back into the
+    reference orientation, the corners outside the scanned field are zero"""
+    image = image_data(image)
+    if image.dtype not in (np.uint8, np.uint16, np.float32):
+        image = image.astype(np.float32)
+    height, width = image.shape[:2]
+    return cv2.warpAffine(image, derotation_matrix(angle, image.shape), (width, height), dst=out,
+                          flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+
+def rotation_invariant_spectrum(image, max_size=512) -> tuple:
+    """Spectrum of the central square that stays inside the field at any scan rotation,
+    for the residual shift of de-rotated frames (phase_correlation).
+    Returns (spectrum, shape, binning)"""
+    data = image_data(image)
+    height, width = data.shape[:2]
+    side = int(min(height, width) / np.sqrt(2))
+    y0, x0 = (height - side) // 2, (width - side) // 2
+    small, binning = downsample_for_analysis(data[y0:y0 + side, x0:x0 + side], max_size=max_size)
+    return windowed_spectrum(small), small.shape, binning
+
+
+class FrameAccumulator():
+    """Streaming average of repeated frames with sigma-clipping outlier rejection.
+    Only the running mean (float32), the per-pixel count of accepted samples (uint16)
+    and two float32 scratch buffers are held, regardless of the number of frames, plus
+    copies of the first SEED_FRAMES frames until the reference is taken.
+    The reference is the per-pixel median of the first SEED_FRAMES frames, so a charging
+    flash in the first frame does not become the average. The noise level is estimated
+    from the closest pair of them. Pixels deviating from the running mean by more than
+    sigma * noise are rejected, frames with more than max_rejected_fraction of rejected
+    pixels (charging flashes) are discarded entirely.
+    """
+    SEED_FRAMES = 3
+
+    def __init__(self, shape, sigma: float = 4.0, max_rejected_fraction: float = 0.2):
+        self.sigma = sigma
+        self.max_rejected_fraction = max_rejected_fraction
+        self.mean = np.zeros(shape, dtype=np.float32)
+        self.count = np.zeros(shape, dtype=np.uint16)
+        self._diff = np.empty(shape, dtype=np.float32)
+        self._abs_diff = np.empty(shape, dtype=np.float32)
+        self._accepted = np.empty(shape, dtype=bool)
+        self.noise = None
+        self.n_frames = 0
+        self.n_rejected_frames = 0
+        self._seed = []
+
+    def add(self, frame) -> bool:
+        """Add the frame to the average, returns False if the frame was rejected.
+        The first SEED_FRAMES frames are judged together once the last of them arrives,
+        add() returns True for the earlier ones"""
+        frame = image_data(frame)
+        if self._seed is None:
+            return self._accumulate(frame)
+        """the frame may be a reused buffer, the seed keeps its own copy"""
+        self._seed.append(np.array(frame))
+        self._set_reference()
+        if len(self._seed) < self.SEED_FRAMES:
+            return True
+        return self._start()[-1]
+
+    def _set_reference(self) -> None:
+        """mean = per-pixel median of the seed frames (the mean of two)"""
+        seed = self._seed
+        if len(seed) == 1:
+            self.mean[...] = seed[0]
+        elif len(seed) == 2:
+            np.add(seed[0], seed[1], out=self.mean, dtype=np.float32)
+            self.mean *= 0.5
+        else:
+            a, b, c = seed
+            np.minimum(a, b, out=self._diff, dtype=np.float32)
+            np.maximum(a, b, out=self._abs_diff, dtype=np.float32)
+            np.minimum(self._abs_diff, c, out=self._abs_diff)
+            np.maximum(self._diff, self._abs_diff, out=self.mean)
+
+    def _start(self) -> list:
+        """Noise from the closest pair of seed frames, then the seed frames are clipped
+        against their median like the later ones, returns which of them were accepted"""
+        seed, self._seed = self._seed, None
+        if len(seed) == 1:
+            self.count[...] = 1
+            self.n_frames = 1
+            return [True]
+        noise = []
+        for ii in range(len(seed)):
+            for jj in range(ii + 1, len(seed)):
+                """robust noise of a single frame from the difference of two frames"""
+                sample = seed[ii][::4, ::4].astype(np.float32) - seed[jj][::4, ::4]
+                mad = np.median(np.abs(sample - np.median(sample)))
+                noise.append(1.4826 * mad / np.sqrt(2) or float(np.std(sample)) / np.sqrt(2))
+        self.noise = min(noise) or 1.0
+        """the accepted pixels of the first accepted frame replace the reference"""
+        return [self._accumulate(frame) for frame in seed]
+
+    def _accumulate(self, frame) -> bool:
+        np.subtract(frame, self.mean, out=self._diff, casting='unsafe')
+
+        threshold = self.sigma * self.noise * np.sqrt(1 + 1 / max(1, self.n_frames))
+        np.abs(self._diff, out=self._abs_diff)
+        np.less_equal(self._abs_diff, threshold, out=self._accepted)
+
+        rejected_fraction = 1 - np.count_nonzero(self._accepted) / self._accepted.size
+        if rejected_fraction > self.max_rejected_fraction:
+            print(f'frame rejected, {rejected_fraction * 100:.1f}% outlier pixels')
+            self.n_rejected_frames += 1
+            return False
+
+        """incremental mean update of the accepted pixels"""
+        self.count += self._accepted
+        np.multiply(self._diff, self._accepted, out=self._diff)
+        """pixels rejected so far have no samples, their diff is zero"""
+        np.divide(self._diff, self.count, out=self._diff, where=self._accepted)
+        self.mean += self._diff
+        self.n_frames += 1
+        return True
+
+    def result(self, dtype=None) -> np.ndarray:
+        """Averaged image, rounded and clipped to the integer dtype if given.
+        Pixels rejected in every frame keep the median of the first frames"""
+        if self._seed:
+            self._start()
+        if dtype is None or np.issubdtype(dtype, np.floating):
+            return self.mean.copy()
+        limits = np.iinfo(dtype)
+        return np.clip(np.rint(self.mean), limits.min, limits.max).astype(dtype)
+
+
+def stage_travel_times(positions, speeds : dict = None) -> np.ndarray:
+    """Matrix of estimated move times between stage positions, rows of [x, y, z, r, t].
+    The axes are assumed to move one after another (compucentric rotation and tilt),
+    x and y together; rotation takes the shorter way round"""
+    speeds = STAGE_SPEEDS if speeds is None else speeds
+    positions = np.asarray(positions, dtype=np.float64)
+    delta = positions[:, None, :] - positions[None, :, :]
+    rotation = np.abs((delta[..., 3] + np.pi) % (2 * np.pi) - np.pi)
+    return (np.hypot(delta[..., 0], delta[..., 1]) / speeds['xy']
+            + np.abs(delta[..., 2]) / speeds['z']
+            + rotation / speeds['r']
+            + np.abs(delta[..., 4]) / speeds['t'])
+
+
+def route_length(route, times) -> float:
+    return float(sum(times[a, b] for a, b in zip(route[:-1], route[1:])))
+
+
+def plan_site_order(positions, start=None, speeds : dict = None) -> tuple:
+    """Visiting order of the stage positions that keeps the total travel time short:
+    nearest-neighbour path from the start position, improved by 2-opt segment reversals
+    until no reversal shortens it. The path is open (no return to the start).
+    positions: rows of [x, y, z, r, t], start: [x, y, z, r, t] or None (free start)
+    Returns
+    -------
+    (order as a list of indices into positions, estimated travel time in s)
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 5)
+    n_sites = len(positions)
+    if n_sites == 0:
+        return [], 0.0
+    """node 0 is the start, without a start position it is a node at zero distance from all"""
+    times = np.zeros((n_sites + 1, n_sites + 1))
+    if start is not None:
+        times = stage_travel_times(np.vstack([np.asarray(start, dtype=np.float64), positions]),
+                                   speeds=speeds)
+    else:
+        times[1:, 1:] = stage_travel_times(positions, speeds=speeds)
+
+    route = [0]
+    unvisited = np.ones(n_sites + 1, dtype=bool)
+    unvisited[0] = False
+    for _ in range(n_sites):
+        candidates = np.flatnonzero(unvisited)
+        nearest = candidates[np.argmin(times[route[-1], candidates])]
+        route.append(nearest)
+        unvisited[nearest] = False
+
+    """2-opt: reverse route[i:j+1], the best j for every i is found at once"""
+    route = np.array(route)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n_sites):
+            before, first = route[i - 1], route[i]
+            last = route[i + 1:]
+            after = np.append(route[i + 2:], -1)
+            removed = times[before, first] + np.where(after >= 0, times[last, after], 0)
+            added = times[before, last] + np.where(after >= 0, times[first, after], 0)
+            gain = removed - added
+            j = int(np.argmax(gain))
+            if gain[j] > 1e-9:
+                route[i:i + j + 2] = route[i:i + j + 2][::-1].copy()
+                improved = True
+    return [int(node) - 1 for node in route[1:]], route_length(route, times)
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f'{seconds} s'
+    if seconds < 3600:
+        return f'{seconds // 60} min {seconds % 60:02d} s'
+    return f'{seconds // 3600} h {seconds % 3600 // 60:02d} min'
+
+
+def format_bytes(n_bytes: float) -> str:
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if n_bytes < 1000:
+            return f'{n_bytes:.0f} {unit}' if unit == 'B' else f'{n_bytes:.1f} {unit}'
+        n_bytes /= 1000
+    return f'{n_bytes:.1f} TB'
+
+
+class StackTimeEstimator():
+    """Duration and disk usage of a stack: scan time (resolution x dwell x frame integration
+    x software average) plus modelled overheads, in seconds:
+        frame_overhead   HFW change and grab set-up, per frame
+        autocontrast     auto-CB or applying the cached values, per frame with autocontrast
+        autofocus        per level with autofocus
+        probe            adaptive dwell probe frame, per level
+        state_read       microscope state read, per level
+        write_per_mb     saving, per megabyte
+    The overheads are running averages (weight of a new measurement: rate) of the timings
+    recorded during previous runs, kept in file_name between sessions.
+    """
+    DEFAULTS = {'frame_overhead' : 0.5, 'autocontrast' : 3.0, 'autofocus' : 20.0,
+                'probe' : 0.5, 'state_read' : 0.2, 'write_per_mb' : 0.02}
+
+    def __init__(self, file_name: str = None, rate: float = 0.3):
+        if file_name is None:
+            file_name = os.path.join(os.path.expanduser('~'), '.sem_stack_timings.json')
+        self.file_name = file_name
+        self.rate = rate
+        self.overheads = dict(self.DEFAULTS)
+        try:
+            with open(file_name, 'r') as file:
+                self.overheads.update({key: float(value) for key, value in json.load(file).items()
+                                       if key in self.DEFAULTS})
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def scan_time(imaging: dict) -> float:
+        [width, height] = np.array(imaging["resolution"].split("x")).astype(int)
+        return width * height * imaging["dwell_time"] * \
+            max(1, int(imaging.get("frame_integration", 1))) * max(1, int(imaging.get("average", 1)))
+
+    @staticmethod
+    def frame_bytes(imaging: dict) -> int:
+        """one saved frame, 8 or 16 bit plus about 16 kB of tif header and metadata"""
+        [width, height] = np.array(imaging["resolution"].split("x")).astype(int)
+        return int(width * height * int(imaging.get("bit_depth", 8)) // 8 + 16384)
+
+    def level_estimate(self, imaging: dict) -> tuple:
+        """(seconds, bytes) of one HFW level"""
+        n_frames = 2 if imaging.get("q1") and imaging.get("q2") else 1
+        n_grabs = max(1, int(imaging.get("average", 1)))
+        seconds = self.scan_time(imaging) + self.overheads['state_read'] + \
+            n_grabs * self.overheads['frame_overhead']
+        if imaging.get("autocontrast"):
+            seconds += self.overheads['autocontrast']
+        if imaging.get("autofocus"):
+            seconds += self.overheads['autofocus']
+        if imaging.get("adaptive_dwell"):
+            seconds += self.overheads['probe']
+        n_bytes = n_frames * self.frame_bytes(imaging)
+        seconds += self.overheads['write_per_mb'] * n_bytes / 1e6
+        return seconds, n_bytes
+
+    def estimate(self, imaging: dict, n_levels: int) -> dict:
+        """Plan of a stack of n_levels HFW levels with the imaging settings.
+        With adaptive dwell the dwell time of the settings is assumed."""
+        seconds, n_bytes = self.level_estimate(imaging)
+        return {'levels' : [seconds] * n_levels,
+                'total_time' : seconds * n_levels,
+                'total_bytes' : n_bytes * n_levels,
+                'level_bytes' : n_bytes}
+
+    def record(self, name: str, seconds: float) -> None:
+        """Add a measured overhead to the running average"""
+        if name in self.overheads and np.isfinite(seconds):
+            seconds = max(0.0, seconds)
+            self.overheads[name] += self.rate * (seconds - self.overheads[name])
+
+    def save(self) -> None:
+        try:
+            with open(self.file_name, 'w') as file:
+                json.dump(self.overheads, file, indent=1)
+        except OSError as e:
+            print(f'Could not save the acquisition timings, error {e}')
+
+
+def _json_value(value):
+    """numpy scalars and enums of the settings and data frames as plain json values"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+class StackJournal():
+    """Checkpoint of a running stack, <path>/stack_journal_<sample_name>.json, rewritten
+    (atomically, through a temporary file) after every completed HFW level: the settings,
+    the plan (HFW_and_selections), the stored MicroscopeState, the completed level indices
+    with their file names, the frame counter and the experiment data so far.
+    A journal that is not finished marks an interrupted stack which can be resumed.
+    """
+    def __init__(self, path: str, sample_name: str, settings: dict, plan: list,
+                 stored_state: MicroscopeState):
+        self.file_name = os.path.join(path, 'stack_journal_' + re.sub(r'[^\w.-]', '_', sample_name) + '.json')
+        self.data = {'sample_name' : sample_name,
+                     'started' : current_timestamp(),
+                     'settings' : settings,
+                     'plan' : [list(level) for level in plan],
+                     'stored_state' : asdict(stored_state),
+                     'completed' : {},
+                     'counter' : 0,
+                     'experiment_data' : {},
+                     'finished' : False}
+
+    @classmethod
+    def load(cls, file_name: str) -> 'StackJournal':
+        journal = cls.__new__(cls)
+        journal.file_name = file_name
+        with open(file_name, 'r') as file:
+            journal.data = json.load(file)
+        return journal
+
+    @staticmethod
+    def find_unfinished(path: str) -> list:
+        """Journals of interrupted stacks in the directory, newest first"""
+        file_names = sorted(glob.glob(os.path.join(path, 'stack_journal_*.json')),
+                            key=os.path.getmtime, reverse=True)
+        unfinished = []
+        for file_name in file_names:
+            try:
+                if not StackJournal.load(file_name).data['finished']:
+                    unfinished.append(file_name)
+            except (OSError, ValueError, KeyError) as e:
+                print(f'Could not read the stack journal {file_name}, error {e}')
+        return unfinished
+
+    @property
+    def completed(self) -> set:
+        return {int(index) for index in self.data['completed']}
+
+    @property
+    def counter(self) -> int:
+        return self.data['counter']
+
+    @property
+    def plan(self) -> list:
+        return self.data['plan']
+
+    @property
+    def experiment_data(self) -> dict:
+        return {key: list(values) for key, values in self.data['experiment_data'].items()}
+
+    @property
+    def stored_state(self) -> MicroscopeState:
+        return MicroscopeState(**self.data['stored_state'])
+
+    def settings(self) -> dict:
+        """all_settings with the beam type restored"""
+        imaging = dict(self.data['settings']['imaging'])
+        imaging['beam_type'] = BeamType(imaging['beam_type'])
+        return {'imaging' : imaging}
+
+    def complete_level(self, index: int, file_names: list, counter: int,
+                       experiment_data: dict) -> None:
+        self.data['completed'][str(index)] = list(file_names)
+        self.data['counter'] = counter
+        self.data['experiment_data'] = experiment_data
+        self.save()
+
+    def finish(self) -> None:
+        self.data['finished'] = True
+        self.save()
+
+    def save(self) -> None:
+        temporary = self.file_name + '.tmp'
+        try:
+            with open(temporary, 'w') as file:
+                json.dump(self.data, file, default=_json_value)
+            os.replace(temporary, self.file_name)
+        except OSError as e:
+            print(f'Could not write the stack journal, error {e}')
+
+
+def populate_experiment_data_frame(data_frame : dict,
+                                   keys : list,
+                                   microscope_state : MicroscopeState,
+                                   file_name : str = "None",
+                                   timestamp: str = "None",
+                                   extra : dict = None) -> dict:
+    microscope_state = microscope_state.__to__dict__()
+    for key in keys:
+        data_frame[key].append( microscope_state[key] )
+
+    data_frame['file_name'].append(file_name)
+    data_frame['timestamp'].append(timestamp)
+
+    """per-frame values which are not part of the microscope state, e.g. measured drift"""
+    if extra is not None:
+        for key, value in extra.items():
+            data_frame.setdefault(key, []).append(value)
+
+    return data_frame
+
+
+def save_data_frame(data_frame : dict,
+                    path : str,
+                    file_name : str) -> None:
+    """convert the accumulated dictionary to pandas DataFrame
+        save .cvs file in the directory as a form of metadata
+    Parameters
+    ----------
+    data_frame : dict
+        contains microscope state snippet for each acquired image and filenames.
+    path : str
+        Path of the stack where the images are stored.
+    file_name : str
+        Filename of the .cvs file
+    Returns
+    -------
+    str : the full name of the saved file
+    """
+    d = pd.DataFrame(data=data_frame)
+    N = len(glob.glob(os.path.join(path, '*.csv') ) )
+    print('N = ', N)
+    file_name = os.path.join(path, file_name + '_%03d'%(N+1) + '.csv')
+    d.to_csv(file_name)
+    return file_name
+
+
+def extract_metadata_from_tif(path_to_file):
+    from PIL import Image
+    from PIL.TiffTags import TAGS
+
+    with Image.open(path_to_file) as img:
+        #[print(key, img.tag[key]) for key in img.tag.keys()]
+        metadata_dict = {key: img.tag[key] for key in img.tag.keys()}
+
+        return metadata_dict
+
+
+def parse_metadata(path_to_file):
+    # SEM meta data key is 34682, comes as a string
+    img = Image.open(path_to_file)
+    img_metadata = img.tag[34682][0]
+
+    # parse metadata
+    parsed_metadata = img_metadata.split("\r\n")
+
+    metadata_dict = {}
+    for item in parsed_metadata:
+        if item == "":
+            # skip blank lines
+            pass
+        elif re.match("\[(.*?)\]", item):
+            # find category, dont add to dict
+            category = item
+        else:
+            # meta data point
+            datum = item.split("=")
+            # save to dictionary
+            metadata_dict[category + "." + datum[0]] = datum[1]
+
+    # add filename to metadata
+    metadata_dict["filename"] = path_to_file
+
+    # convert to pandas df
+    df = pd.DataFrame.from_dict(metadata_dict, orient="index").T
+
+    return df
+
+
+def make_copy_of_Adorned_image(image):
+    """Independent AdornedImage copy of an AdornedImage or a Frame, the only place the
+    pixels are copied: frames are passed around as they are, see Frame"""
+    frame = Frame.from_image(image)
+    return AdornedImage(data=frame.data.copy(), metadata=frame.metadata)
+
+
+def read_data_file(file_name):
+    file_name = file_name.replace('\\', '/')
+    if os.path.isfile(file_name):
+        data = np.loadtxt(  file_name  )
+    else:
+        print('file not found')
+        data = None
+    return data
+
+
+
+
+if __name__ == '__main__':
+
+    keys = ('x', 'y', 'z', 't', 'r',
+            'horizontal_field_width', 'scan_rotation_angle',
+            'brightness', 'contrast',
+            'beam_shift_x', 'beam_shift_y')
+    experiment_data = {element: [] for element in keys}
+    """add other data keys"""
+    experiment_data['file_name'] = []
+    experiment_data['timestamp'] = []
+    print(experiment_data)
+    # experiment_data = populate_experiment_data_frame(data_frame=experiment_data,
+    #                                                  microscope_state=microscope.microscope_state,
+    #                                                  file_name='lalala', timestamp=current_timestamp(),
+    #                                                  keys=keys)
+    print(experiment_data)
+